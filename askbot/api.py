@@ -4,7 +4,8 @@ in the askbot.models module, but
 api must become a place to manupulate the data in the askbot application
 so that other implementations of the data storage could be possible
 """
-from django.db.models import Q
+from django.core import cache
+from django.db.models import Q, Count
 from askbot import models
 from askbot import const
 
@@ -12,33 +13,42 @@ def get_info_on_moderation_items(user):
     """returns a dictionary with 
     counts of new and seen moderation items for a given user
     if user is not a moderator or admin, returns None
+
+    the counts are cached until the audit records
+    of the user are changed
     """
     if user.is_anonymous():
         return None
     if not(user.is_moderator() or user.is_administrator()):
         return None
 
+    cache_key = models.ActivityAuditStatus.MODERATION_ITEMS_CACHE_KEY_TPL % user.id
+    info = cache.cache.get(cache_key)
+    if info is not None:
+        return info
+
     content_types = (
         const.TYPE_ACTIVITY_MARK_OFFENSIVE,
         const.TYPE_ACTIVITY_MODERATED_NEW_POST,
         const.TYPE_ACTIVITY_MODERATED_POST_EDIT,
     )
 
-    messages = models.ActivityAuditStatus.objects.filter(
+    status_counts = models.ActivityAuditStatus.objects.filter(
         activity__activity_type__in = content_types,
         user = user
-    )
+    ).values_list('status').annotate(Count('id')).order_by()
+    status_counts = dict(status_counts)
 
-    seen_count = messages.filter(
-                    status = models.ActivityAuditStatus.STATUS_SEEN
-                ).count()
-    new_count = messages.filter(
-                    status = models.ActivityAuditStatus.STATUS_NEW
-                ).count()
-    return {
-        'seen_count': seen_count,
-        'new_count': new_count
+    info = {
+        'seen_count': status_counts.get(
+                            models.ActivityAuditStatus.STATUS_SEEN, 0
+                        ),
+        'new_count': status_counts.get(
+                            models.ActivityAuditStatus.STATUS_NEW, 0
+                        )
     }
+    cache.cache.set(cache_key, info)
+    return info
 
 def get_admin(seed_user_id = None):
     """returns user objects with id == seed_user_id
@@ -9,7 +9,7 @@ User.assert_can...
 """
 import datetime
 from django.db import transaction
-from askbot.models import Repute
+from askbot.models import Repute, DailyUpvoteReputation
 #from askbot.models import Answer
 from askbot.models import signals
 from askbot.conf import settings as askbot_settings
@@ -289,6 +289,12 @@ def onUpVoted(vote, post, user, timestamp=None):
                        reputation=author.reputation)
             reputation.save()
 
+            DailyUpvoteReputation.objects.add_reputation(
+                author,
+                askbot_settings.REP_GAIN_FOR_RECEIVING_UPVOTE,
+                timestamp.date()
+            )
+
 @transaction.commit_on_success
 def onUpVotedCanceled(vote, post, user, timestamp=None):
     if timestamp is None:
@@ -326,6 +332,12 @@ def onUpVotedCanceled(vote, post, user, timestamp=None):
         )
         reputation.save()
 
+        DailyUpvoteReputation.objects.add_reputation(
+            author,
+            askbot_settings.REP_LOSS_FOR_RECEIVING_UPVOTE_CANCELATION,
+            timestamp.date()
+        )
+
 @transaction.commit_on_success
 def onDownVoted(vote, post, user, timestamp=None):
     if timestamp is None:
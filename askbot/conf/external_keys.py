@@ -29,6 +29,20 @@ settings.register(
     )
 )
 
+settings.register(
+    livesettings.IntegerValue(
+        EXTERNAL_KEYS,
+        'GOOGLE_SITEMAP_PING_INTERVAL',
+        default = 600,
+        description = _('Minimum interval between sitemap pings (in seconds)'),
+        help_text = _(
+            'Google is notified about the sitemap update at most once '
+            'per this interval, updates within the interval are '
+            'announced with a single ping'
+        )
+    )
+)
+
 settings.register(
     livesettings.StringValue(
         EXTERNAL_KEYS,
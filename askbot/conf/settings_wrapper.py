@@ -19,8 +19,18 @@ for the most part, so actual values are reliably available only
 at run time
 
 askbot.deps.livesettings is a module developed for satchmo project
+
+values read through the wrapper are kept in a per-process
+snapshot, which is dropped whenever the version token stored
+in the cache under ``askbot-livesettings-version`` changes -
+the token is replaced each time a setting is updated,
+so a request pays at most one cache hit to validate all
+the settings it reads
 """
+import threading
+import uuid
 from django.core.cache import cache
+from django.core import signals as django_signals
 from askbot.deps.livesettings import SortedDotDict, config_register
 from askbot.deps.livesettings.functions import config_get
 from askbot.deps.livesettings import signals
@@ -33,6 +43,11 @@ class ConfigSettings(object):
     """
     __instance = None
     __group_map = {}
+    __snapshot = {}
+    __snapshot_version = None
+    __request_state = threading.local()
+    snapshot_reloads = 0
+    VERSION_CACHE_KEY = 'askbot-livesettings-version'
 
     def __init__(self):
         """assigns SortedDotDict to self.__instance if not set"""
@@ -46,8 +61,77 @@ class ConfigSettings(object):
         not the object - this way only very minimal modifications
         will be required in code to convert an app
         depending on django.conf.settings to askbot.deps.livesettings
+
+        values are served from the in-process snapshot
         """
-        return getattr(self.__instance, key).value
+        self.validate_snapshot()
+        snapshot = ConfigSettings.__snapshot
+        try:
+            return snapshot[key]
+        except KeyError:
+            value = getattr(self.__instance, key).value
+            snapshot[key] = value
+            return value
+
+    @classmethod
+    def validate_snapshot(cls):
+        """drops the snapshot of settings values if the version
+        token in the cache differs from the one the snapshot
+        was taken with.
+
+        within a request the token is looked up only once,
+        outside of requests (management commands, celery tasks)
+        it is looked up on every access
+        """
+        state = cls.__request_state
+        if getattr(state, 'version_checked', False):
+            return
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        if version is None:
+            #token was never set or got evicted
+            cache.add(cls.VERSION_CACHE_KEY, uuid.uuid4().hex)
+            version = cache.get(cls.VERSION_CACHE_KEY)
+        if version != cls.__snapshot_version:
+            cls.reload_snapshot(version)
+        if getattr(state, 'in_request', False):
+            state.version_checked = True
+
+    @classmethod
+    def reload_snapshot(cls, version = None):
+        """starts a new empty snapshot, which will be filled
+        lazily as the settings are read"""
+        cls.__snapshot = {}
+        cls.__snapshot_version = version
+        cls.snapshot_reloads += 1
+
+    @classmethod
+    def bump_version(cls, **kwargs):
+        """replaces the version token in the cache, so that
+        all processes drop their snapshots, and
+        drops the snapshot in the current process
+        """
+        cls.__request_state.version_checked = False
+        cls.__snapshot = {}
+        cls.__snapshot_version = None
+        cache.set(cls.VERSION_CACHE_KEY, uuid.uuid4().hex)
+
+    @classmethod
+    def get_snapshot_reload_count(cls):
+        """number of times the snapshot was reloaded
+        in this process, for the monitoring purposes"""
+        return cls.snapshot_reloads
+
+    @classmethod
+    def start_request(cls, **kwargs):
+        """validate the snapshot once on the first
+        setting read within the request"""
+        cls.__request_state.in_request = True
+        cls.__request_state.version_checked = False
+
+    @classmethod
+    def finish_request(cls, **kwargs):
+        cls.__request_state.in_request = False
+        cls.__request_state.version_checked = False
 
     def get_default(self, key):
         """return the defalut value for the setting"""
@@ -66,6 +150,8 @@ class ConfigSettings(object):
             setting = Setting.objects.get(key=key)
             setting.value = value
             setting.save()
+            #signal is not sent for the direct save
+            self.bump_version()
         #self.prime_cache()
 
     def register(self, value):
@@ -108,5 +194,8 @@ class ConfigSettings(object):
 
 
 signals.configuration_value_changed.connect(ConfigSettings.prime_cache)
+signals.configuration_value_changed.connect(ConfigSettings.bump_version)
+django_signals.request_started.connect(ConfigSettings.start_request)
+django_signals.request_finished.connect(ConfigSettings.finish_request)
 #settings instance to be used elsewhere in the project
 settings = ConfigSettings()
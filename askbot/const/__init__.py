@@ -147,6 +147,8 @@ TAG_SPLIT_REGEX = r'[ ,]+'
 TAG_SEP = ',' # has to be valid TAG_SPLIT_REGEX char and MUST NOT be in const.TAG_CHARS
 #!!! see const.message_keys.TAG_WRONG_CHARS_MESSAGE
 EMAIL_REGEX = re.compile(r'\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,4}\b', re.I)
+EMAIL_BATCH_SIZE = 100 #messages sent over one connection between the throughput reports
+EMAIL_SEND_RETRIES = 2
 
 TYPE_ACTIVITY_ASK_QUESTION = 1
 TYPE_ACTIVITY_ANSWER = 2
@@ -268,6 +270,18 @@ RESPONSE_ACTIVITY_TYPES_FOR_DISPLAY = (
 )
 
 
+#activities shown on the "recent activity" tab of the user profile
+USER_RECENT_ACTIVITY_TYPES = (
+    TYPE_ACTIVITY_ASK_QUESTION,
+    TYPE_ACTIVITY_ANSWER,
+    TYPE_ACTIVITY_COMMENT_QUESTION,
+    TYPE_ACTIVITY_COMMENT_ANSWER,
+    TYPE_ACTIVITY_UPDATE_QUESTION,
+    TYPE_ACTIVITY_UPDATE_ANSWER,
+    TYPE_ACTIVITY_MARK_ANSWER,
+    TYPE_ACTIVITY_PRIZE,
+)
+
 RESPONSE_ACTIVITY_TYPE_MAP_FOR_TEMPLATES = {
         TYPE_ACTIVITY_COMMENT_QUESTION: 'question_comment',
         TYPE_ACTIVITY_COMMENT_ANSWER: 'answer_comment',
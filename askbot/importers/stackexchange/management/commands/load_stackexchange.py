@@ -3,6 +3,8 @@ DEBUGME = False
 import os
 import re
 import sys
+import time
+from optparse import make_option
 from unidecode import unidecode
 import zipfile
 from datetime import datetime
@@ -12,6 +14,8 @@ from xml.etree import ElementTree as et
 from django.db.models import fields
 from django.db.utils import IntegrityError
 from django.db import models
+from django.db import connection
+from django.utils import simplejson
 import askbot.models as askbot
 import askbot.deps.django_authopenid.models as askbot_openid
 import askbot.importers.stackexchange.models as se
@@ -53,6 +57,108 @@ ANSWER = {}
 COMMENT = {}
 NUMBERED_NAME_RE = re.compile(r'^(.*)\*(\d+)\*$')
 
+DEFAULT_BATCH_SIZE = 1000
+#checkpoint entry recording that the transfer into the askbot tables
+#has started, the transfer cannot be resumed
+TRANSFER_CHECKPOINT_KEY = '__transfer__'
+
+#SE model --> set of ids of the saved records,
+#used to create the missing records referred to by the foreign keys
+KNOWN_IDS = {}
+
+def get_related_id(related_model, input):
+    """returns id of the related record, when the record does
+    not exist, saves fake empty object - the same thing
+    as :func:`se_parser.parse_value` does, but the existing ids
+    are loaded once per model, instead of a query per value
+    """
+    try:
+        id = int(input)
+    except:
+        raise Exception('non-numeric foreign key %s' % input)
+    if related_model not in KNOWN_IDS:
+        KNOWN_IDS[related_model] = set(
+            related_model.objects.values_list('id', flat = True)
+        )
+    known_ids = KNOWN_IDS[related_model]
+    if id not in known_ids:
+        obj = related_model(id = id)
+        obj.save()#save fake empty object
+        known_ids.add(id)
+    return id
+
+def get_column_parser(model, column_name):
+    """returns pair (attribute name, parser function)
+    for the xml column or ``None`` if the model does
+    not have matching field"""
+    field_name = se_parser.parse_field_name(column_name)
+    try:
+        field = model._meta.get_field(field_name)
+    except fields.FieldDoesNotExist, e:
+        print u"Warning: %s" % unicode(e)
+        return None
+    if isinstance(field, models.ForeignKey):
+        related_model = field.rel.to
+        parser = lambda input: get_related_id(related_model, input)
+    else:
+        parser = lambda input: se_parser.parse_value(input, field)
+    return field.attname, parser
+
+class ColumnParserMap(dict):
+    """xml column name --> (attribute name, parser function)
+    for one model, the parsers are created at the first use
+    of the column name"""
+    def __init__(self, model):
+        super(ColumnParserMap, self).__init__()
+        self.model = model
+
+    def __missing__(self, column_name):
+        parser = get_column_parser(self.model, column_name)
+        self[column_name] = parser
+        return parser
+
+def insert_rows(model, entries):
+    """saves the model entries - records that do not exist
+    yet are inserted with one statement, the existing ones
+    (e.g. fake empty objects created for the foreign keys)
+    are updated one by one
+    """
+    ids = [entry.id for entry in entries if entry.id is not None]
+    existing_ids = set(
+        model.objects.filter(id__in = ids).values_list('id', flat = True)
+    )
+    new_entries = list()
+    for entry in entries:
+        if entry.id is None or entry.id in existing_ids:
+            entry.save()
+        else:
+            new_entries.append(entry)
+
+    if new_entries:
+        opts = model._meta
+        qn = connection.ops.quote_name
+        columns = [field.column for field in opts.local_fields]
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            qn(opts.db_table),
+            ', '.join([qn(column) for column in columns]),
+            ', '.join(['%s'] * len(columns))
+        )
+        params = [
+            [
+                field.get_db_prep_save(
+                    field.pre_save(entry, True),
+                    connection = connection
+                )
+                for field in opts.local_fields
+            ]
+            for entry in new_entries
+        ]
+        connection.cursor().executemany(sql, params)
+
+    if model in KNOWN_IDS:
+        KNOWN_IDS[model].update(ids)
+
+
 class X(object):#
     """class with methods for handling some details
     of SE --> ASKBOT mapping
@@ -282,6 +388,26 @@ class X(object):#
 class Command(BaseCommand):
     help = 'Loads StackExchange data from unzipped directory of XML files into the ASKBOT database'
     args = 'se_dump_dir'
+    option_list = BaseCommand.option_list + (
+            make_option('--batch-size',
+                action='store',
+                type='int',
+                dest='batch_size',
+                default=DEFAULT_BATCH_SIZE,
+                help='Number of rows saved in one transaction'
+                ),
+            make_option('--checkpoint',
+                action='store',
+                type='string',
+                dest='checkpoint',
+                default=None,
+                help='File recording the loaded rows of each XML file, '
+                    'to resume the interrupted load, by default '
+                    '<dump file>.checkpoint, the file is deleted '
+                    'when the load completes and ignored when '
+                    'the loaded rows are gone from the database'
+                ),
+        )
 
     @transaction.commit_manually
     def handle(self, *arg, **kwarg):
@@ -300,6 +426,10 @@ class Command(BaseCommand):
             raise CommandError('Error: first argument must be a zip file with the SE forum data')
 
         self.zipfile = self.open_dump(arg[0]) 
+        self.batch_size = kwarg.get('batch_size') or DEFAULT_BATCH_SIZE
+        self.checkpoint_path = kwarg.get('checkpoint') or arg[0] + '.checkpoint'
+        self.checkpoint = self.read_checkpoint()
+        self.validate_checkpoint()
         #read the data into SE tables
         for item in xml_read_order:
             time_before = datetime.now()
@@ -320,6 +450,7 @@ class Command(BaseCommand):
         self.save_askbot_message_id_list()
 
         #transfer data into ASKBOT tables
+        self.mark_transfer_started()
         print 'Transferring users...',
         self.transfer_users()
         transaction.commit()
@@ -366,6 +497,8 @@ class Command(BaseCommand):
         transaction.commit()
         self.transfer_meta_pages()
         transaction.commit()
+        #the load is complete, next run starts from the beginning
+        self.remove_checkpoint()
         print 'done.'
 
     def open_dump(self, path):
@@ -813,33 +946,131 @@ class Command(BaseCommand):
         #so we can't do this
         pass
 
+    def read_checkpoint(self):
+        """returns dictionary xml file name --> info
+        about the loaded rows: {'rows': <number>, 'done': <bool>}
+        """
+        if os.path.isfile(self.checkpoint_path):
+            return simplejson.loads(open(self.checkpoint_path).read())
+        return {}
+
+    def write_checkpoint(self):
+        checkpoint_file = open(self.checkpoint_path, 'w')
+        checkpoint_file.write(simplejson.dumps(self.checkpoint))
+        checkpoint_file.close()
+
+    def save_checkpoint(self, item, rows, done = False):
+        """called after the transaction with the rows is committed"""
+        self.checkpoint[item] = {'rows': rows, 'done': done}
+        self.write_checkpoint()
+
+    def mark_transfer_started(self):
+        self.checkpoint[TRANSFER_CHECKPOINT_KEY] = {'started': True}
+        self.write_checkpoint()
+
+    def validate_checkpoint(self):
+        """starts the load from the beginning if the loaded rows
+        are gone - e.g. the database was flushed after a failed run,
+
+        raises CommandError if the transfer into the askbot tables
+        was interrupted and the database still has its results -
+        the transfer cannot be resumed and repeating it would
+        duplicate the users and posts
+        """
+        for item, item_checkpoint in self.checkpoint.items():
+            if item == TRANSFER_CHECKPOINT_KEY:
+                continue
+            if item_checkpoint.get('rows', 0) == 0:
+                continue
+            model = models.get_model('stackexchange', self.get_table_name(item))
+            if not model.objects.exists():
+                print 'rows loaded from %s are gone, ' \
+                    'loading all files again' % self.get_xml_path(item)
+                self.remove_checkpoint()
+                return
+
+        if TRANSFER_CHECKPOINT_KEY in self.checkpoint:
+            raise CommandError(
+                'Previous load was interrupted while transferring the data '
+                'into the askbot tables.\n'
+                'Please, run command: \npython manage.py flush\n'
+                'then run this command again.'
+            )
+
+    def remove_checkpoint(self):
+        if os.path.isfile(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.checkpoint = {}
+
     def load_xml_file(self, item):
         """read data from the zip file for the item
+
+        the file is parsed as a stream and the parsed rows are
+        discarded, the rows are saved in batches, one transaction
+        per batch, after each batch the checkpoint is updated,
+        so that an interrupted load continues from the last batch
         """
         xml_path = self.get_xml_path(item)
         table_name = self.get_table_name(item)
 
-        xml_data = self.zipfile.read(xml_path)
+        item_checkpoint = self.checkpoint.get(item, {})
+        if item_checkpoint.get('done'):
+            print 'skipping %s - loaded already' % xml_path
+            return
+        skip_rows = item_checkpoint.get('rows', 0)
 
-        tree = et.fromstring(xml_data)
-        print 'loading from %s to %s' % (xml_path, table_name) ,
+        print 'loading from %s to %s' % (xml_path, table_name)
         model = models.get_model('stackexchange', table_name)
+        column_parsers = ColumnParserMap(model)
+
+        start_time = time.time()
         i = 0
-        for row in tree.findall('.//row'):
-            model_entry = model()
+        batch = list()
+        root = None
+        xml_file = self.zipfile.open(xml_path)
+        for event, element in et.iterparse(xml_file, events = ('start', 'end')):
+            if root is None:
+                root = element
+            if event != 'end' or element.tag != 'row':
+                continue
             i += 1
-            for col in row.getchildren():
-                field_name = se_parser.parse_field_name(col.tag)
-                try:
-                    field_type = model._meta.get_field(field_name)
-                except fields.FieldDoesNotExist, e:
-                    print u"Warning: %s" % unicode(e)
-                    continue
-                field_value = se_parser.parse_value(col.text, field_type)
-                setattr(model_entry, field_name, field_value)
-            model_entry.save()
-            #transaction.commit()
-        print '... %d objects saved' % i
+            if i > skip_rows:
+                model_entry = model()
+                for col in element.getchildren():
+                    parser = column_parsers[col.tag]
+                    if parser is None:
+                        continue
+                    attname, parse = parser
+                    setattr(model_entry, attname, parse(col.text))
+                batch.append(model_entry)
+            #free memory taken by the parsed rows
+            element.clear()
+            root.clear()
+
+            if len(batch) >= self.batch_size:
+                self.save_batch(item, model, batch, i, skip_rows, start_time)
+                batch = list()
+
+        self.save_batch(item, model, batch, i, skip_rows, start_time)
+        self.save_checkpoint(item, i, done = True)
+        xml_file.close()
+        print '\n... %d objects saved' % i
+        sys.stdout.flush()
+
+    def save_batch(self, item, model, batch, row_count, skip_rows, start_time):
+        """saves the batch, commits and reports the progress"""
+        if len(batch) == 0:
+            return
+        insert_rows(model, batch)
+        transaction.commit()
+        self.save_checkpoint(item, row_count)
+        elapsed = time.time() - start_time
+        loaded_rows = row_count - skip_rows
+        sys.stdout.write(
+            '\r%d rows (%.0f rows/s)' % (
+                row_count, loaded_rows / max(elapsed, 0.001)
+            )
+        )
         sys.stdout.flush()
 
     def get_table_name(self, xml_file_basename):
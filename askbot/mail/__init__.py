@@ -4,6 +4,7 @@ these automatically catch email-related exceptions
 import os
 import smtplib
 import logging
+import time
 from django.core import mail
 from django.conf import settings as django_settings
 from django.core.exceptions import PermissionDenied
@@ -77,6 +78,96 @@ def thread_headers(post, orig_post, update):
 
     return headers
 
+def create_message(
+            subject_line = None,
+            body_text = None,
+            from_email = django_settings.DEFAULT_FROM_EMAIL,
+            recipient_list = None,
+            headers = None,
+        ):
+    """returns html email message with the prefixed
+    subject line, ready to be sent with :func:`send_messages`
+    """
+    assert(subject_line is not None)
+    subject_line = prefix_the_subject_line(subject_line)
+    msg = mail.EmailMessage(
+                    subject_line,
+                    body_text,
+                    from_email,
+                    recipient_list,
+                    headers = headers
+                )
+    msg.content_subtype = 'html'
+    return msg
+
+def send_messages(
+            messages,
+            batch_size = const.EMAIL_BATCH_SIZE,
+            max_retries = const.EMAIL_SEND_RETRIES,
+            raise_on_failure = False
+        ):
+    """sends prepared email messages in batches
+    over one reused connection to the mail server
+
+    messages that failed are sent again over a new connection,
+    up to ``max_retries`` times, then the errors are reported
+    as critical in the main log file, and if
+    ``raise_on_failure`` is True, exceptions.EmailNotSent is raised
+
+    throughput of each batch is logged,
+    returns number of the sent messages
+    """
+    sent_count = 0
+    pending = list(messages)
+    attempt = 0
+    while pending:
+        failed = list()
+        errors = list()
+        connection = mail.get_connection()
+        try:
+            connection.open()
+        except Exception, error:
+            #all messages will be retried over the next connection
+            failed = pending
+            errors.append(error)
+        else:
+            try:
+                for start in range(0, len(pending), batch_size):
+                    batch = pending[start:start + batch_size]
+                    batch_start_time = time.time()
+                    batch_sent_count = 0
+                    for message in batch:
+                        try:
+                            connection.send_messages([message])
+                            batch_sent_count += 1
+                        except Exception, error:
+                            failed.append(message)
+                            errors.append(error)
+                    elapsed = time.time() - batch_start_time
+                    logging.info(
+                        'email batch: sent %d of %d messages in %.3fs '
+                        '(%.1f messages/s)' % (
+                            batch_sent_count,
+                            len(batch),
+                            elapsed,
+                            batch_sent_count / max(elapsed, 0.001)
+                        )
+                    )
+                    sent_count += batch_sent_count
+            finally:
+                connection.close()
+
+        pending = failed
+        if pending:
+            attempt += 1
+            if attempt > max_retries:
+                for error in errors:
+                    logging.critical(unicode(error))
+                if raise_on_failure == True:
+                    raise exceptions.EmailNotSent(unicode(errors[-1]))
+                break
+    return sent_count
+
 def send_mail(
             subject_line = None,
             body_text = None,
@@ -101,16 +192,13 @@ def send_mail(
     if raise_on_failure is True, exceptions.EmailNotSent is raised
     """
     try:
-        assert(subject_line is not None)
-        subject_line = prefix_the_subject_line(subject_line)
-        msg = mail.EmailMessage(
-                        subject_line, 
-                        body_text, 
-                        from_email,
-                        recipient_list,
+        msg = create_message(
+                        subject_line = subject_line,
+                        body_text = body_text,
+                        from_email = from_email,
+                        recipient_list = recipient_list,
                         headers = headers
                     )
-        msg.content_subtype = 'html'
         msg.send()
         if related_object is not None:
             assert(activity_type is not None)
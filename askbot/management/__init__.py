@@ -1,17 +1,92 @@
+import logging
+import multiprocessing
+import os
+import Queue
 import sys
-from django.core.management.base import NoArgsCommand
-from django.db import transaction
+import time
+import traceback
+from optparse import make_option
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
 from askbot.models import signals
 from askbot.utils import console
 
 FORMAT_STRING = '%6.2f%%'#to print progress in percent
+DEFAULT_CHUNK_SIZE = 500
+WORKER_POLL_TIMEOUT = 5#seconds between checks of the worker processes
+
+def get_pk_ranges(query_set, workers):
+    """splits the range of primary keys of the items
+    into ``workers`` contiguous (min_pk, max_pk) ranges"""
+    pk_bounds = query_set.aggregate(Min('pk'), Max('pk'))
+    min_pk = pk_bounds['pk__min']
+    max_pk = pk_bounds['pk__max']
+    if min_pk is None:
+        return list()
+    step = (max_pk - min_pk) / workers + 1
+    return [
+        (start_pk, min(start_pk + step - 1, max_pk))
+        for start_pk in range(min_pk, max_pk + 1, step)
+    ]
+
+def read_checkpoint(path):
+    """returns primary key of the last processed item
+    stored in the file, or None"""
+    if path is None or not os.path.exists(path):
+        return None
+    return int(open(path).read())
+
+def write_checkpoint(path, pk):
+    if path is None:
+        return
+    checkpoint_file = open(path + '.tmp', 'w')
+    checkpoint_file.write(str(pk))
+    checkpoint_file.close()
+    os.rename(path + '.tmp', path)
+
+def remove_checkpoint(path):
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+def read_pk_ranges(path):
+    """returns list of the (min_pk, max_pk) ranges
+    of the workers stored in the file, or None"""
+    if path is None or not os.path.exists(path):
+        return None
+    pk_ranges = list()
+    for line in open(path):
+        min_pk, max_pk = line.split()
+        pk_ranges.append((int(min_pk), int(max_pk)))
+    return pk_ranges
+
+def write_pk_ranges(path, pk_ranges):
+    if path is None:
+        return
+    ranges_file = open(path + '.tmp', 'w')
+    for pk_range in pk_ranges:
+        ranges_file.write('%d %d\n' % pk_range)
+    ranges_file.close()
+    os.rename(path + '.tmp', path)
 
 class NoArgsJob(NoArgsCommand):
     """Base class for a job command -
-    the one that runs the same operation on 
-    sets of items - each item operation in its own 
-    transaction and prints progress in % of items
-    completed
+    the one that runs the same operation on
+    sets of items - items are processed in chunks
+    of ``--chunk-size``, each chunk in its own transaction,
+    and prints progress in % of items completed
+
+    With ``--workers N`` the items are split by the primary key
+    into N ranges processed by separate processes, the job
+    fails with ``CommandError`` if any of the workers fails.
+    With ``--checkpoint <path>`` the primary key of the last
+    processed item is saved in the files starting with <path>,
+    so that an interrupted job continues where it has stopped.
+    The ranges of the workers are saved too and are reused
+    by the resumed job, the last range is extended
+    to the items added in the meantime. The checkpoints of the
+    workers that have completed their ranges are kept until all
+    workers complete, so the resumed job skips those ranges.
 
     The subclass must implement __init__() method
     where self.batches data structure must be defined as follows
@@ -22,7 +97,7 @@ class NoArgsJob(NoArgsCommand):
         'function': <function or callable that performs
                      an operation on a single item
                      and returns True if item was changed
-                     False otherwise 
+                     False otherwise
                      item is given as argument
                      >,
         'items_changed_message': <string with one %d placeholder>,
@@ -33,21 +108,141 @@ class NoArgsJob(NoArgsCommand):
     """
     batches = ()
 
+    option_list = NoArgsCommand.option_list + (
+            make_option('--chunk-size',
+                action='store',
+                type='int',
+                dest='chunk_size',
+                default=DEFAULT_CHUNK_SIZE,
+                help='Number of items processed in one transaction'
+                ),
+            make_option('--workers',
+                action='store',
+                type='int',
+                dest='workers',
+                default=1,
+                help='Number of processes to run the job'
+                ),
+            make_option('--checkpoint',
+                action='store',
+                type='str',
+                dest='checkpoint',
+                default=None,
+                help='Path prefix of the files saving the job progress'
+                ),
+            )
+
     def handle_noargs(self, **options):
         """handler function that removes all signal listeners
         then runs the job and finally restores the listerers
         """
         signal_data = signals.pop_all_db_signal_receivers()
-        self.run_command(**options)
-        signals.set_all_db_signal_receivers(signal_data)
+        try:
+            self.run_command(**options)
+        finally:
+            signals.set_all_db_signal_receivers(signal_data)
 
     def run_command(self, **options):
         """runs the batches"""
-        for batch in self.batches:
-            self.run_batch(batch)
+        self.chunk_size = options.get('chunk_size') or DEFAULT_CHUNK_SIZE
+        self.workers = options.get('workers') or 1
+        self.checkpoint = options.get('checkpoint')
+        for batch_number, batch in enumerate(self.batches):
+            self.run_batch(batch, batch_number)
 
-    @transaction.commit_manually
-    def run_batch(self, batch):
+    def get_checkpoint_path(self, batch_number, suffix = None):
+        """returns path of the checkpoint file of the batch,
+        ``suffix`` is the worker index or 'ranges'"""
+        if self.checkpoint is None:
+            return None
+        path = '%s.%d' % (self.checkpoint, batch_number)
+        if suffix is not None:
+            path += '.%s' % suffix
+        return path
+
+    def get_pk_ranges(self, batch, batch_number):
+        """returns the pk ranges of the workers,
+        saved by the interrupted run if there is one"""
+        ranges_path = self.get_checkpoint_path(batch_number, 'ranges')
+        pk_ranges = read_pk_ranges(ranges_path)
+        if pk_ranges:
+            max_pk = batch['query_set'].aggregate(Max('pk'))['pk__max']
+            if max_pk > pk_ranges[-1][1]:
+                pk_ranges[-1] = (pk_ranges[-1][0], max_pk)
+        else:
+            pk_ranges = get_pk_ranges(batch['query_set'], self.workers)
+        write_pk_ranges(ranges_path, pk_ranges)
+        return pk_ranges
+
+    def run_workers(self, batch, batch_number):
+        """runs the batch in the worker processes,
+        returns tuple (checked count, changed count)
+        raises ``CommandError`` if any of the workers has failed
+        """
+        pk_ranges = self.get_pk_ranges(batch, batch_number)
+        #child processes must open their own connections
+        connection.close()
+        results = multiprocessing.Queue()
+        processes = list()
+        for worker_index, pk_range in enumerate(pk_ranges):
+            process = multiprocessing.Process(
+                                target = self.run_worker,
+                                args = (
+                                    batch, batch_number, worker_index,
+                                    pk_range, results
+                                )
+                            )
+            process.start()
+            processes.append(process)
+
+        reports = dict()#worker index --> (counts, error)
+        while len(reports) < len(processes):
+            try:
+                worker_index, counts, error = results.get(
+                                            timeout = WORKER_POLL_TIMEOUT
+                                        )
+                reports[worker_index] = (counts, error)
+            except Queue.Empty:
+                #a killed worker does not report
+                for worker_index, process in enumerate(processes):
+                    if worker_index in reports or process.is_alive():
+                        continue
+                    #give the report possibly sent before the exit a chance
+                    try:
+                        index, counts, error = results.get(timeout = 1)
+                        reports[index] = (counts, error)
+                    except Queue.Empty:
+                        reports[worker_index] = (
+                            (0, 0),
+                            'exited with code %s' % process.exitcode
+                        )
+        for process in processes:
+            process.join()
+
+        errors = [
+            'worker %d: %s' % (worker_index, error)
+            for worker_index, (counts, error) in sorted(reports.items())
+            if error
+        ]
+        if errors:
+            raise CommandError(
+                '%d of %d workers failed, run the job again '
+                'to continue:\n%s' % (
+                    len(errors), len(processes), '\n'.join(errors)
+                )
+            )
+        #the job is complete, next run starts from the beginning
+        for worker_index in range(len(pk_ranges)):
+            remove_checkpoint(
+                self.get_checkpoint_path(batch_number, worker_index)
+            )
+        remove_checkpoint(self.get_checkpoint_path(batch_number, 'ranges'))
+
+        checked_count = sum([counts[0] for counts, error in reports.values()])
+        changed_count = sum([counts[1] for counts, error in reports.values()])
+        return checked_count, changed_count
+
+    def run_batch(self, batch, batch_number = 0):
         """runs the single batch
         prints batch title
         then loops through the query set
@@ -56,28 +251,98 @@ class NoArgsJob(NoArgsCommand):
         """
 
         sys.stdout.write(batch['title'])
-        changed_count = 0
-        checked_count = 0
         total_count = batch['query_set'].count()
 
         if total_count == 0:
-            transaction.commit()
+            print 'nothing to do'
             return
 
-        for item in batch['query_set'].all():
-
-            item_changed = batch['function'](item)
-            transaction.commit()
-
-            if item_changed:
-                changed_count += 1
-            checked_count += 1
-
-            progress = 100*float(checked_count)/float(total_count)
-            console.print_progress(FORMAT_STRING, progress)
+        start_time = time.time()
+        if self.workers > 1:
+            checked_count, changed_count = self.run_workers(batch, batch_number)
+        else:
+            checked_count, changed_count = self.run_items(
+                                                    batch,
+                                                    batch_number,
+                                                    total_count = total_count
+                                                )
         print FORMAT_STRING % 100
 
+        elapsed = max(time.time() - start_time, 0.001)
+        print '%d items in %.1f seconds, %.1f items per second' % (
+                            checked_count, elapsed, checked_count / elapsed
+                        )
         if changed_count:
             print batch['changed_count_message'] % changed_count
         else:
             print batch['nothing_changed_message']
+
+    def run_worker(self, batch, batch_number, worker_index, pk_range, results):
+        """runs the items in the ``pk_range`` in the child
+        process and puts tuple (worker index, (checked, changed) counts,
+        error text or None) into the ``results`` queue"""
+        try:
+            try:
+                counts = self.run_items(
+                                    batch, batch_number, pk_range,
+                                    worker_index = worker_index
+                                )
+                results.put((worker_index, counts, None))
+            except Exception:
+                logging.exception('job worker %d has failed' % worker_index)
+                results.put((worker_index, (0, 0), traceback.format_exc()))
+        finally:
+            connection.close()
+
+    @transaction.commit_manually
+    def run_items(
+        self, batch, batch_number,
+        pk_range = None, total_count = None, worker_index = None
+    ):
+        """processes items of the batch, optionally only
+        those with primary keys within the ``pk_range``,
+        in chunks ordered by the primary key,
+        returns tuple (checked count, changed count)
+        """
+        checkpoint = self.get_checkpoint_path(batch_number, worker_index)
+        last_pk = read_checkpoint(checkpoint)
+
+        query_set = batch['query_set'].order_by('pk')
+        if pk_range:
+            query_set = query_set.filter(pk__gte = pk_range[0], pk__lte = pk_range[1])
+
+        changed_count = 0
+        checked_count = 0
+        while True:
+            chunk = query_set
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt = last_pk)
+            items = list(chunk[:self.chunk_size])
+            if len(items) == 0:
+                break
+
+            try:
+                for item in items:
+                    if batch['function'](item):
+                        changed_count += 1
+                    checked_count += 1
+            except Exception:
+                #the failed chunk is repeated by the next run
+                transaction.rollback()
+                raise
+            transaction.commit()
+
+            last_pk = items[-1].pk
+            write_checkpoint(checkpoint, last_pk)
+            if total_count:
+                console.print_progress(min(checked_count, total_count), total_count)
+
+        transaction.commit()
+        if worker_index is None:
+            #the job is complete, next run starts from the beginning
+            remove_checkpoint(checkpoint)
+        elif pk_range:
+            #the whole range is done, the checkpoint is removed
+            #by run_workers when all the workers are done
+            write_checkpoint(checkpoint, pk_range[1])
+        return checked_count, changed_count
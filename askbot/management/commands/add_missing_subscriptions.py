@@ -1,12 +1,22 @@
-from django.core.management.base import NoArgsCommand
-from django.db.models import Count
-from django.db import transaction
+"""add_missing_subscriptions management command
+adds email feed settings with the default frequencies
+to the users who do not have all of them
+
+python manage.py add_missing_subscriptions --workers=4
+"""
+from askbot.management import NoArgsJob
 from askbot.models import User
-from askbot import forms
 
-class Command(NoArgsCommand):
-    @transaction.commit_manually
-    def handle_noargs(self, **options):
-        for user in User.objects.all():
-            user.add_missing_askbot_subscriptions()
-            transaction.commit()
+def add_missing_subscriptions(user):
+    return user.add_missing_askbot_subscriptions()
+
+class Command(NoArgsJob):
+    def __init__(self, *args, **kwargs):
+        self.batches = ({
+            'title': 'Adding missing email subscriptions: ',
+            'query_set': User.objects.all(),
+            'function': add_missing_subscriptions,
+            'changed_count_message': 'Added subscriptions for %d users',
+            'nothing_changed_message': 'No missing subscriptions found'
+        },)
+        super(Command, self).__init__(*args, **kwargs)
@@ -0,0 +1,76 @@
+"""benchmark_markup management command
+compares time of converting post texts to html
+with a new markdown parser per post (the way it was done before
+the parser was cached) and with the cached parser
+
+python manage.py benchmark_markup --limit=1000 --repeat=3
+"""
+import re
+import time
+from django.core.management.base import NoArgsCommand
+from optparse import make_option
+from askbot.models import Post
+from askbot.utils import markup
+
+def create_uncached_parser():
+    """creates the parser the way it was done before the
+    caching - with the link patterns compiled again"""
+    markup._LINK_PATTERNS.clear()
+    re.purge()#the re module keeps its own cache of patterns
+    return markup.create_parser()
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+            make_option('--limit',
+                action='store',
+                type='int',
+                dest='limit',
+                default=1000,
+                help='Number of posts to use as the corpus'
+                ),
+            make_option('--repeat',
+                action='store',
+                type='int',
+                dest='repeat',
+                default=3,
+                help='Number of passes over the corpus'
+                ),
+            )
+
+    def time_conversion(self, texts, get_parser, repeat):
+        """returns best time of ``repeat`` passes
+        over the texts"""
+        best_time = None
+        for i in range(repeat):
+            start = time.time()
+            for text in texts:
+                get_parser().convert(text)
+            elapsed = time.time() - start
+            if best_time is None or elapsed < best_time:
+                best_time = elapsed
+        return best_time
+
+    def handle_noargs(self, **options):
+        texts = list(
+            Post.objects.order_by('-id').values_list(
+                                        'text', flat = True
+                                    )[:options['limit']]
+        )
+        if len(texts) == 0:
+            print 'There are no posts to convert'
+            return
+
+        repeat = options['repeat']
+        new_parser_time = self.time_conversion(
+                                    texts, create_uncached_parser, repeat
+                                )
+        cached_parser_time = self.time_conversion(
+                                    texts, markup.get_parser, repeat
+                                )
+        print 'Converted %d posts, best of %d passes:' % (len(texts), repeat)
+        print 'new parser per post: %.3fs (%.2fms per post)' % \
+                (new_parser_time, 1000 * new_parser_time / len(texts))
+        print 'cached parser:       %.3fs (%.2fms per post)' % \
+                (cached_parser_time, 1000 * cached_parser_time / len(texts))
+        if cached_parser_time > 0:
+            print 'speedup: %.2fx' % (new_parser_time / cached_parser_time)
@@ -0,0 +1,114 @@
+"""benchmark_post_fanout management command
+counts database queries made by the ``record_post_update``
+(inbox notifications and response counts of the thread participants)
+for a new answer posted into synthetic threads of growing size:
+
+python manage.py benchmark_post_fanout --sizes=1,10,100,500
+
+number of queries per post should stay flat as the thread grows
+
+do not run this on a production database - synthetic users
+and threads are not deleted afterwards
+"""
+import datetime
+import time
+from django.conf import settings as django_settings
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from optparse import make_option
+from askbot.models import Post, PostRevision, Thread, User
+from askbot.tasks import record_post_update
+from askbot.utils.console import ProgressBar
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+            make_option('--sizes',
+                action='store',
+                type='str',
+                dest='sizes',
+                default='1,10,100',
+                help='Comma separated numbers of answers in the threads'
+                ),
+            )
+
+    def create_post(self, thread, author, post_type, text):
+        post = Post.objects.get_query_set().create(
+                                post_type = post_type,
+                                thread = thread,
+                                author = author,
+                                text = text,
+                                html = text,
+                                summary = text[:180]
+                            )
+        PostRevision.objects.get_query_set().create(
+                                post = post,
+                                author = author,
+                                revision = 1,
+                                revised_at = datetime.datetime.now(),
+                                text = text,
+                                approved = True
+                            )
+        return post
+
+    def create_user(self, name):
+        return User.objects.create_user(name, name + '@example.com')
+
+    @transaction.commit_manually
+    def create_thread(self, size):
+        """creates thread with a question and ``size``
+        answers, each by a different user"""
+        prefix = 'fanout%d_%d_' % (size, int(time.time()))
+        asker = self.create_user(prefix + 'asker')
+        thread = Thread.objects.get_query_set().create(
+                                title = 'fanout benchmark %d' % size,
+                                tagnames = 'benchmark',
+                                last_activity_by = asker
+                            )
+        self.create_post(thread, asker, 'question', 'question text')
+        message = 'Creating thread with %d answers' % size
+        for i in ProgressBar(iter(xrange(size)), size, message):
+            answerer = self.create_user(prefix + str(i))
+            self.create_post(thread, answerer, 'answer', 'answer text')
+            if i % 100 == 0:
+                transaction.commit()
+        transaction.commit()
+        return thread, self.create_user(prefix + 'poster')
+
+    def count_queries(self, thread, poster):
+        """returns number of queries and time in milliseconds
+        to record a new answer by the ``poster``"""
+        answer = self.create_post(thread, poster, 'answer', 'one more answer')
+        reset_queries()
+        start = time.time()
+        record_post_update(
+                    post = answer,
+                    updated_by = poster,
+                    newly_mentioned_users = [],
+                    timestamp = datetime.datetime.now(),
+                    created = True,
+                    diff = None
+                )
+        elapsed = 1000 * (time.time() - start)
+        return len(connection.queries), elapsed
+
+    def handle_noargs(self, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a list of numbers')
+
+        #queries are logged by django only in the debug mode
+        debug_backup = django_settings.DEBUG
+        django_settings.DEBUG = True
+        results = list()
+        try:
+            for size in sizes:
+                thread, poster = self.create_thread(size)
+                results.append((size,) + self.count_queries(thread, poster))
+        finally:
+            django_settings.DEBUG = debug_backup
+
+        for size, num_queries, elapsed in results:
+            print 'answers: %6d, queries per post: %5d, %.2fms' % (
+                                            size, num_queries, elapsed
+                                        )
@@ -0,0 +1,110 @@
+"""benchmark_search management command
+compares the text search with the ``icontains`` filters
+against the search with the inverted index
+(setting ``ASKBOT_USE_SEARCH_INDEX``) on the threads in the database,
+optionally creates a synthetic forum first:
+
+python manage.py benchmark_search --create-threads=100000
+
+do not run this on a production database - synthetic threads
+are not deleted afterwards
+"""
+import random
+import time
+from django.conf import settings as django_settings
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from optparse import make_option
+from askbot.models import Post, SearchToken, Thread, User
+from askbot.utils.console import ProgressBar
+
+VOCABULARY_SIZE = 20000
+
+def make_vocabulary(size):
+    """returns list of random pronounceable-ish words"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    random.seed(size)
+    words = set()
+    while len(words) < size:
+        length = random.randint(3, 10)
+        words.add(''.join([random.choice(letters) for i in range(length)]))
+    return list(words)
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+            make_option('--create-threads',
+                action='store',
+                type='int',
+                dest='create_threads',
+                default=0,
+                help='Number of synthetic threads to create before the run'
+                ),
+            make_option('--queries',
+                action='store',
+                type='int',
+                dest='queries',
+                default=50,
+                help='Number of search queries to time'
+                ),
+            )
+
+    @transaction.commit_manually
+    def create_threads(self, count, vocabulary):
+        author = User.objects.all()[0]
+        message = 'Creating %d synthetic threads' % count
+        for i in ProgressBar(iter(xrange(count)), count, message):
+            title = ' '.join(random.sample(vocabulary, 8))
+            text = ' '.join(random.sample(vocabulary, 80))
+            thread = Thread.objects.get_query_set().create(
+                                    title = title,
+                                    tagnames = ' '.join(
+                                                random.sample(vocabulary, 3)
+                                            ),
+                                    last_activity_by = author
+                                )
+            Post.objects.get_query_set().create(
+                                    post_type = 'question',
+                                    thread = thread,
+                                    author = author,
+                                    text = text,
+                                    html = text,
+                                    summary = text[:180]
+                                )
+            SearchToken.objects.index_thread(thread)
+            if i % 100 == 0:
+                transaction.commit()
+        transaction.commit()
+
+    def time_queries(self, queries, use_index):
+        """returns average time per query in milliseconds"""
+        django_settings.ASKBOT_USE_SEARCH_INDEX = use_index
+        start = time.time()
+        for query in queries:
+            #emulate retrieval of the first page of the results
+            threads = Thread.objects.get_for_query(query)
+            list(threads.values_list('id', flat = True)[:30])
+        return 1000 * (time.time() - start) / len(queries)
+
+    def handle_noargs(self, **options):
+        vocabulary = make_vocabulary(VOCABULARY_SIZE)
+        if options['create_threads']:
+            self.create_threads(options['create_threads'], vocabulary)
+
+        queries = random.sample(vocabulary, options['queries'] // 2)
+        queries += [
+            ' '.join(random.sample(vocabulary, 2))
+            for i in range(options['queries'] - len(queries))
+        ]
+
+        use_index_backup = getattr(
+                            django_settings, 'ASKBOT_USE_SEARCH_INDEX', False
+                        )
+        icontains_time = self.time_queries(queries, False)
+        index_time = self.time_queries(queries, True)
+        django_settings.ASKBOT_USE_SEARCH_INDEX = use_index_backup
+
+        print 'Threads: %d, queries: %d' % (
+                                Thread.objects.count(), len(queries)
+                            )
+        print 'icontains search: %.2fms per query' % icontains_time
+        print 'index search:     %.2fms per query' % index_time
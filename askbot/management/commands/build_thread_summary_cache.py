@@ -1,10 +1,22 @@
-from django.core.management.base import NoArgsCommand
+"""build_thread_summary_cache management command
+renders summaries of all threads into the cache
+
+python manage.py build_thread_summary_cache --workers=4
+"""
+from askbot.management import NoArgsJob
 from askbot.models import Thread
-from askbot.utils.console import ProgressBar
 
-class Command(NoArgsCommand):
-    def handle_noargs(self, **options):
-        message = "Rebuilding thread summary cache"
-        count = Thread.objects.count()
-        for thread in ProgressBar(Thread.objects.iterator(), count, message):
-            thread.update_summary_html()
+def update_summary_html(thread):
+    thread.update_summary_html()
+    return True
+
+class Command(NoArgsJob):
+    def __init__(self, *args, **kwargs):
+        self.batches = ({
+            'title': 'Rebuilding thread summary cache: ',
+            'query_set': Thread.objects.all(),
+            'function': update_summary_html,
+            'changed_count_message': 'Rendered summaries of %d threads',
+            'nothing_changed_message': 'No threads found'
+        },)
+        super(Command, self).__init__(*args, **kwargs)
@@ -0,0 +1,98 @@
+"""dump_view_stats management command
+prints the views sampled by the InstrumentationMiddleware -
+the slowest ones by the mean wall time and the ones
+making most sql queries per request:
+
+python manage.py dump_view_stats --top=20
+
+with ``--reset`` the collected statistics are deleted
+after printing
+"""
+from django.core.management.base import NoArgsCommand
+from optparse import make_option
+from askbot.utils import instrumentation
+
+def format_seconds(seconds):
+    if seconds is None:
+        return '>%.1fs' % instrumentation.TIME_BUCKETS[-1]
+    return '%.3fs' % seconds
+
+def get_mean(stats, key):
+    return stats[key] / float(stats['count'])
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+            make_option('--top',
+                action='store',
+                type='int',
+                dest='top',
+                default=10,
+                help='Number of views to print in each list'
+                ),
+            make_option('--reset',
+                action='store_true',
+                dest='reset',
+                default=False,
+                help='Delete the statistics after printing'
+                ),
+            )
+
+    def print_slowest(self, all_stats, top):
+        print 'Slowest views by the mean time:'
+        print '%-50s %8s %9s %9s %9s %9s %9s' % (
+            'view', 'samples', 'mean', 'p90', 'max', 'sql', 'template'
+        )
+        all_stats.sort(key = lambda stats: get_mean(stats, 'time'), reverse = True)
+        for stats in all_stats[:top]:
+            print '%-50s %8d %9s %9s %9s %9s %9s' % (
+                stats['view_name'],
+                stats['count'],
+                format_seconds(get_mean(stats, 'time')),
+                format_seconds(instrumentation.get_time_percentile(stats, 0.9)),
+                format_seconds(stats['max_time']),
+                format_seconds(get_mean(stats, 'query_time')),
+                format_seconds(get_mean(stats, 'template_time'))
+            )
+
+    def print_query_heaviest(self, all_stats, top):
+        print 'Views with most sql queries per request:'
+        print '%-50s %8s %9s %9s %9s %9s %9s' % (
+            'view', 'samples', 'queries', 'max', 'sql', 'cache get', 'hits'
+        )
+        all_stats.sort(
+            key = lambda stats: get_mean(stats, 'query_count'),
+            reverse = True
+        )
+        for stats in all_stats[:top]:
+            if stats['cache_gets']:
+                hit_ratio = '%.0f%%' % \
+                    (100.0 * stats['cache_hits'] / stats['cache_gets'])
+            else:
+                hit_ratio = '-'
+            print '%-50s %8d %9.1f %9d %9s %9.1f %9s' % (
+                stats['view_name'],
+                stats['count'],
+                get_mean(stats, 'query_count'),
+                stats['max_query_count'],
+                format_seconds(get_mean(stats, 'query_time')),
+                get_mean(stats, 'cache_gets'),
+                hit_ratio
+            )
+
+    def handle_noargs(self, **options):
+        all_stats = [
+            stats for stats in instrumentation.get_all_stats()
+            if stats['count'] > 0
+        ]
+        if len(all_stats) == 0:
+            print 'No requests were sampled'
+            return
+
+        self.print_slowest(all_stats, options['top'])
+        print ''
+        self.print_query_heaviest(all_stats, options['top'])
+
+        if options['reset']:
+            instrumentation.reset_stats()
+            print ''
+            print 'Statistics were deleted'
@@ -4,24 +4,14 @@ to run type (on the command line:)
 python manage.py fix_answer_counts
 """
 from django.core.management.base import NoArgsCommand
-from django.db.models import signals
-from askbot import models
+from askbot.models import recount
 
 class Command(NoArgsCommand):
-    """Command class for "fix_answer_counts" 
+    """Command class for "fix_answer_counts"
     """
-
-    def remove_save_signals(self):
-        """removes signals on model pre-save and
-        post-save, so that there are no side-effects
-        besides actually updating the answer counts
-        """
-        signals.pre_save.receivers = []
-        signals.post_save.receivers = []
-
-    def handle(self, *arguments, **options):
-        """function that handles the command job
-        """
-        self.remove_save_signals()
-        for thread in models.Thread.objects.all():
-            thread.update_answer_count()
+    def handle_noargs(self, **options):
+        changed_count = recount.recount_answer_counts()
+        if changed_count:
+            print 'Corrected answer counts of %d threads' % changed_count
+        else:
+            print 'No problems found'
@@ -1,33 +1,15 @@
-from askbot.management import NoArgsJob
-from askbot import models
-
-def fix_inbox_counts(user):
-    """a unit of job - returns True if change was made
-    and False otherwise
-    """
-    old_new_count = user.new_response_count
-    old_seen_count = user.seen_response_count
-
-    user.update_response_counts()
-
-    (changed1, changed2) = (False, False)
-    if user.new_response_count != old_new_count:
-        changed1 = True
-    if user.seen_response_count != old_seen_count:
-        changed2 = True
-
-    return (changed1 or changed2)
-
-class Command(NoArgsJob):
-    """definition of the job that fixes response counts
-    destined for the user inboxes
-    """
-    def __init__(self, *args, **kwargs):
-        self.batches = ({
-            'title': 'Checking inbox item counts for all users: ',
-            'query_set': models.User.objects.all(),
-            'function': fix_inbox_counts,
-            'changed_count_message': 'Corrected records for %d users',
-            'nothing_changed_message': 'No problems found'
-        },)
-        super(Command, self).__init__(*args, **kwargs)
+"""fix_inbox_counts management command
+recounts response counts destined for the user inboxes
+
+python manage.py fix_inbox_counts
+"""
+from django.core.management.base import NoArgsCommand
+from askbot.models import recount
+
+class Command(NoArgsCommand):
+    def handle_noargs(self, **options):
+        changed_count = recount.recount_response_counts()
+        if changed_count:
+            print 'Corrected %d inbox item counts' % changed_count
+        else:
+            print 'No problems found'
@@ -0,0 +1,36 @@
+"""flush_view_counts management command
+writes question view counts buffered in the cache
+to the database, when setting ``ASKBOT_BUFFER_VIEW_COUNTS``
+is ``True``, must be run periodically, e.g. from the cron job
+
+python manage.py flush_view_counts
+"""
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from optparse import make_option
+from askbot.models import Thread
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+            make_option('--batch-size',
+                action='store',
+                type='int',
+                dest='batch_size',
+                default=100,
+                help='Number of threads updated per batch'
+                ),
+            make_option('--quiet',
+                action='store_true',
+                dest='quiet',
+                default=False,
+                help="Do not print anything when called."
+                ),
+            )
+
+    @transaction.commit_on_success
+    def handle_noargs(self, **options):
+        updated_count = Thread.objects.flush_buffered_view_counts(
+                                        batch_size = options['batch_size']
+                                    )
+        if not options['quiet']:
+            print 'Updated view counts of %d threads' % updated_count
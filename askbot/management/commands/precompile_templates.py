@@ -0,0 +1,57 @@
+"""precompile_templates management command
+compiles all jinja2 templates of the active skin
+(and of the skins it falls back to) and stores them in the
+bytecode cache, selected by setting ``ASKBOT_JINJA_BYTECODE_CACHE``,
+so that the worker processes do not compile templates on the first use:
+
+python manage.py precompile_templates
+
+run this at the deploy time, after the templates are updated
+"""
+import os
+from django.conf import settings as django_settings
+from django.core.management.base import NoArgsCommand, CommandError
+from jinja2.exceptions import TemplateSyntaxError
+from askbot.conf import settings as askbot_settings
+from askbot.skins import loaders
+from askbot.skins import utils
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+def get_template_names(skin_name):
+    """returns sorted list of names of templates in the skin
+    and in the skins used as a fallback"""
+    names = set()
+    skin_dirs = utils.get_available_skins(selected = skin_name).values()
+    for skin_dir in skin_dirs:
+        template_dir = os.path.join(skin_dir, 'templates')
+        for dir_path, dir_names, file_names in os.walk(template_dir):
+            for file_name in file_names:
+                if os.path.splitext(file_name)[1] not in TEMPLATE_EXTENSIONS:
+                    continue
+                path = os.path.join(dir_path, file_name)
+                name = os.path.relpath(path, template_dir)
+                names.add(name.replace(os.path.sep, '/'))
+    return sorted(names)
+
+class Command(NoArgsCommand):
+    def handle_noargs(self, **options):
+        if getattr(django_settings, 'ASKBOT_JINJA_BYTECODE_CACHE', None) is None:
+            raise CommandError(
+                'set ASKBOT_JINJA_BYTECODE_CACHE to "filesystem" or "cache", '
+                'otherwise compiled templates are not kept between restarts'
+            )
+        skin_name = askbot_settings.ASKBOT_DEFAULT_SKIN
+        #compiled templates do not depend on the language
+        skin = loaders.get_skin_environment(
+                                skin_name, django_settings.LANGUAGE_CODE
+                            )
+        compiled = 0
+        for name in get_template_names(skin_name):
+            try:
+                skin.get_template(name)
+                compiled += 1
+            except TemplateSyntaxError, e:
+                print 'skipped %s: %s' % (name, e)
+        if int(options.get('verbosity', 1)) > 0:
+            print 'Compiled %d templates of skin %s' % (compiled, skin_name)
@@ -0,0 +1,19 @@
+"""rebuild_search_index management command
+rebuilds the inverted index of words in the threads,
+used by the text search when ``ASKBOT_USE_SEARCH_INDEX = True``
+
+python manage.py rebuild_search_index
+"""
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from askbot.models import SearchToken, Thread
+from askbot.utils.console import ProgressBar
+
+class Command(NoArgsCommand):
+    @transaction.commit_manually
+    def handle_noargs(self, **options):
+        message = "Rebuilding search index"
+        count = Thread.objects.count()
+        for thread in ProgressBar(Thread.objects.iterator(), count, message):
+            SearchToken.objects.index_thread(thread)
+            transaction.commit()
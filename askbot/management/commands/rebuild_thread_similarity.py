@@ -0,0 +1,23 @@
+"""rebuild_thread_similarity management command
+recalculates the precomputed similar threads, used on the question
+page when ``ASKBOT_USE_THREAD_SIMILARITY_INDEX = True``
+
+the records are updated when the tags are changed,
+but the weights of tags drift as the tags get used,
+so it may be worthwhile to run this command once in a while
+
+python manage.py rebuild_thread_similarity
+"""
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from askbot.models import ThreadSimilarity, Thread
+from askbot.utils.console import ProgressBar
+
+class Command(NoArgsCommand):
+    @transaction.commit_manually
+    def handle_noargs(self, **options):
+        message = "Rebuilding similar threads"
+        count = Thread.objects.count()
+        for thread in ProgressBar(Thread.objects.iterator(), count, message):
+            ThreadSimilarity.objects.update_thread(thread)
+            transaction.commit()
@@ -0,0 +1,33 @@
+"""reconcile_daily_reputation management command
+rewrites the ledger of the daily reputation gained from the upvotes
+(used to enforce ``MAX_REP_GAIN_PER_USER_PER_DAY``)
+from the reputation history for the last ``--days`` days:
+
+python manage.py reconcile_daily_reputation --days=7
+"""
+import datetime
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from optparse import make_option
+from askbot.models import DailyUpvoteReputation
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+            make_option('--days',
+                action='store',
+                type='int',
+                dest='days',
+                default=1,
+                help='Number of days to reconcile, including today'
+                ),
+            )
+
+    @transaction.commit_manually
+    def handle_noargs(self, **options):
+        today = datetime.date.today()
+        for days_ago in range(options['days']):
+            day = today - datetime.timedelta(days_ago)
+            changed = DailyUpvoteReputation.objects.reconcile(day)
+            transaction.commit()
+            if int(options.get('verbosity', 1)) > 0:
+                print '%s: %d records fixed' % (day.isoformat(), changed)
@@ -0,0 +1,37 @@
+"""recount_denormalized management command
+recounts the denormalized counters - answer and favourite
+counts of threads, use counts of tags, comment counts of posts
+and response counts of users, optionally only some of them:
+
+python manage.py recount_denormalized --counters=answer_count,used_count
+"""
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import transaction
+from optparse import make_option
+from askbot.models import recount
+
+class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+            make_option('--counters',
+                action='store',
+                type='str',
+                dest='counters',
+                default=None,
+                help='Comma separated names of the counters: %s' % \
+                        ', '.join(recount.COUNTERS.keys())
+                ),
+            )
+
+    @transaction.commit_on_success
+    def handle_noargs(self, **options):
+        counter_names = None
+        if options['counters']:
+            counter_names = options['counters'].split(',')
+            for name in counter_names:
+                if name not in recount.COUNTERS:
+                    raise CommandError('unknown counter %s' % name)
+
+        results = recount.recount_all(counter_names)
+        if int(options.get('verbosity', 1)) > 0:
+            for name, changed_count in results.items():
+                print '%s: %d corrected' % (name, changed_count)
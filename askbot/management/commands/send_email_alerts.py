@@ -1,10 +1,28 @@
+"""sends email digests about the updated questions
+
+users are processed in chunks ordered by id, feed settings
+of the whole chunk are loaded at once and users without
+any feed due for a report are skipped without further queries
+
+candidate questions of the feeds "q_sel", "q_ask" and "q_ans"
+are selected for the whole chunk with one grouped query per feed
+type, the questions and the views of them by the users
+of the chunk are then loaded with one query each
+
+with ``--workers N`` the range of user ids is split into
+N parts, each processed by a separate process
+"""
 import datetime
+import multiprocessing
+import time
+from collections import defaultdict
+from optparse import make_option
 from django.core.management.base import NoArgsCommand
 from django.core.urlresolvers import reverse
 from django.db import connection
-from django.db.models import Q, F
+from django.db.models import Q, F, Max, Min
 from askbot.models import User, Post, PostRevision, Thread
-from askbot.models import Activity, EmailFeedSetting
+from askbot.models import Activity, EmailFeedSetting, QuestionView
 from django.utils.translation import ugettext as _
 from django.utils.translation import ungettext
 from django.conf import settings as django_settings
@@ -16,6 +34,9 @@ from askbot import mail
 from askbot.utils.slug import slugify
 
 DEBUG_THIS_COMMAND = False
+DEFAULT_CHUNK_SIZE = 500
+#feed types, whose candidate questions are selected for all users at once
+GROUPED_FEED_TYPES = ('q_sel', 'q_ask', 'q_ans')
 
 def get_all_origin_posts(mentions):
     origin_posts = set()
@@ -73,29 +94,275 @@ def format_action_count(string, number, output):
     if number > 0:
         output.append(_(string) % {'num':number})
 
+def get_user_id_ranges(workers):
+    """splits the range of user ids into
+    ``workers`` contiguous (min_id, max_id) ranges"""
+    id_bounds = User.objects.aggregate(Min('id'), Max('id'))
+    min_id = id_bounds['id__min']
+    max_id = id_bounds['id__max']
+    if min_id is None:
+        return list()
+    step = (max_id - min_id) / workers + 1
+    return [
+        (start_id, min(start_id + step - 1, max_id))
+        for start_id in range(min_id, max_id + 1, step)
+    ]
+
+def get_user_chunks(id_range = None, chunk_size = DEFAULT_CHUNK_SIZE):
+    """yields lists of users ordered by id,
+    at most ``chunk_size`` users per list
+    """
+    users = User.objects.order_by('id')
+    if id_range is not None:
+        users = users.filter(id__gte = id_range[0], id__lte = id_range[1])
+    last_id = None
+    while True:
+        if last_id is None:
+            chunk = list(users[:chunk_size])
+        else:
+            chunk = list(users.filter(id__gt = last_id)[:chunk_size])
+        if len(chunk) == 0:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+def add_missing_subscriptions(users):
+    """adds default email feed settings to the users
+    that do not have them, existing settings of all users
+    are checked in one query"""
+    from askbot import forms#need to avoid circular dependency
+    form = forms.EditUserEmailFeedsForm()
+    need_feed_types = set(form.get_db_model_subscription_type_names())
+    have_feed_types = defaultdict(set)
+    feed_types = EmailFeedSetting.objects.filter(
+                                    subscriber__in = users
+                                ).values_list('subscriber', 'feed_type')
+    for user_id, feed_type in feed_types:
+        have_feed_types[user_id].add(feed_type)
+    for user in users:
+        if need_feed_types - have_feed_types[user.id]:
+            user.add_missing_askbot_subscriptions()
+
+def get_delayed_feeds_by_user(users):
+    """returns dictionary of user ids to lists
+    of the users' delayed email feed settings"""
+    user_map = dict([(user.id, user) for user in users])
+    feeds_by_user = defaultdict(list)
+    feeds = EmailFeedSetting.objects.filter(
+                                subscriber__in = users
+                            ).exclude(
+                                frequency__in = ('n', 'i')
+                            )
+    for feed in feeds:
+        feed.subscriber = user_map[feed.subscriber_id]
+        feeds_by_user[feed.subscriber_id].append(feed)
+    return feeds_by_user
+
+def get_feed_active_since(feed):
+    """returns time after which the threads must have been active
+    to be reported in the feed - the time of the previous report
+    or when the user has joined, if the feed was not reported yet"""
+    if feed.reported_at is None:
+        return feed.subscriber.date_joined
+    return max(feed.reported_at, feed.subscriber.date_joined)
+
+def get_feed_thread_ids(feed_type, user_ids, active_since):
+    """returns list of (user id, thread id) pairs of the
+    threads in the feeds of the given type of all the users,
+    which were active since the ``active_since`` time"""
+    if feed_type == 'q_sel':
+        pairs = Thread.followed_by.through.objects.filter(
+                                user__in = user_ids,
+                                thread__last_activity_at__gte = active_since
+                            ).values_list('user', 'thread')
+    elif feed_type == 'q_ask':
+        pairs = Post.objects.get_questions().filter(
+                                author__in = user_ids,
+                                thread__last_activity_at__gte = active_since
+                            ).values_list('author', 'thread')
+    elif feed_type == 'q_ans':
+        pairs = Post.objects.get_answers().filter(
+                                author__in = user_ids,
+                                thread__last_activity_at__gte = active_since
+                            ).values_list(
+                                'author', 'thread'
+                            ).distinct()
+    else:
+        raise ValueError('unsupported feed type %s' % feed_type)
+    return list(pairs)
+
+def get_feed_candidates(users, feeds_by_user):
+    """returns dictionary by user id of dictionaries by feed type
+    of lists of candidate questions for the feeds due for the report,
+    the most recently active first
+
+    questions that are not deleted or closed, active since the previous
+    report of the feed (or since the user has joined) and not last
+    by the user, which the user has not seen or has seen before
+    the last activity
+
+    the threads are selected with one query per feed type,
+    limited by the earliest of the users' report times
+    """
+    user_map = dict([(user.id, user) for user in users])
+    thread_ids_by_feed = dict()
+    #(user id, feed type) -> time since which the threads are reported
+    active_since_map = dict()
+    all_thread_ids = set()
+    for feed_type in GROUPED_FEED_TYPES:
+        for user_id, feeds in feeds_by_user.items():
+            if user_id not in user_map:
+                continue
+            for feed in feeds:
+                if feed.feed_type == feed_type and feed.should_send_now():
+                    active_since_map[(user_id, feed_type)] = \
+                                            get_feed_active_since(feed)
+        user_ids = [
+            user_id for user_id, user_feed_type in active_since_map.keys()
+            if user_feed_type == feed_type
+        ]
+        if len(user_ids) == 0:
+            continue
+        active_since = min([
+            active_since_map[(user_id, feed_type)] for user_id in user_ids
+        ])
+        pairs = get_feed_thread_ids(feed_type, user_ids, active_since)
+        thread_ids_by_feed[feed_type] = pairs
+        all_thread_ids.update([thread_id for user_id, thread_id in pairs])
+
+    if len(all_thread_ids) == 0:
+        return dict()
+
+    questions = Post.objects.get_questions().filter(
+                                    thread__in = all_thread_ids,
+                                    deleted = False,
+                                    thread__closed = False
+                                ).select_related(
+                                    'thread'
+                                ).defer(
+                                    'text', 'html'
+                                )
+    if askbot_settings.ENABLE_CONTENT_MODERATION:
+        questions = questions.filter(approved = True)
+    question_map = dict([(q.thread_id, q) for q in questions])
+
+    #earliest view of the question by each user,
+    #the question is skipped if it was not viewed before the last activity
+    first_views = QuestionView.objects.filter(
+                                    who__in = user_map.keys(),
+                                    question__in = question_map.values()
+                                ).values_list(
+                                    'who', 'question'
+                                ).annotate(
+                                    Min('when')
+                                ).order_by()
+    first_view_map = dict([
+        ((user_id, question_id), viewed_at)
+        for user_id, question_id, viewed_at in first_views
+    ])
+
+    candidates = defaultdict(dict)
+    for feed_type, pairs in thread_ids_by_feed.items():
+        questions_by_user = defaultdict(list)
+        for user_id, thread_id in pairs:
+            question = question_map.get(thread_id)
+            if question is None:
+                continue
+            user = user_map[user_id]
+            thread = question.thread
+            if thread.last_activity_by_id == user_id:
+                continue
+            if thread.last_activity_at < active_since_map[(user_id, feed_type)]:
+                continue
+            viewed_at = first_view_map.get((user_id, question.id))
+            if viewed_at and viewed_at >= thread.last_activity_at:
+                continue
+            questions_by_user[user_id].append(question)
+
+        for user_id, user_questions in questions_by_user.items():
+            user_questions.sort(
+                key = lambda q: q.thread.last_activity_at,
+                reverse = True
+            )
+            if feed_type == 'q_ans':
+                user_questions = user_questions[:askbot_settings.MAX_ALERTS_PER_EMAIL]
+            candidates[user_id][feed_type] = user_questions
+    return candidates
+
+
 class Command(NoArgsCommand):
+    option_list = NoArgsCommand.option_list + (
+            make_option('--workers',
+                action='store',
+                type='int',
+                dest='workers',
+                default=1,
+                help='Number of processes sharing the range of user ids'
+                ),
+            make_option('--chunk-size',
+                action='store',
+                type='int',
+                dest='chunk_size',
+                default=DEFAULT_CHUNK_SIZE,
+                help='Number of users loaded at once'
+                ),
+        )
+
     def handle_noargs(self, **options):
         if askbot_settings.ENABLE_EMAIL_ALERTS:
-            try:
-                try:
-                    self.send_email_alerts()
-                except Exception, e:
-                    print e
-            finally:
+            self.chunk_size = options.get('chunk_size', DEFAULT_CHUNK_SIZE)
+            self.verbosity = int(options.get('verbosity', 1))
+            workers = options.get('workers', 1)
+            if workers > 1:
+                id_ranges = get_user_id_ranges(workers)
+                #each process must open its own database connection
                 connection.close()
+                processes = list()
+                for id_range in id_ranges:
+                    process = multiprocessing.Process(
+                                            target = self.run_worker,
+                                            args = (id_range,)
+                                        )
+                    process.start()
+                    processes.append(process)
+                for process in processes:
+                    process.join()
+            else:
+                self.run_worker()
 
-    def get_updated_questions_for_user(self, user):
+    def run_worker(self, id_range = None):
+        try:
+            try:
+                self.send_email_alerts(id_range)
+            except Exception, e:
+                print e
+        finally:
+            connection.close()
+
+    def get_updated_questions_for_user(
+                                self, user, user_feeds = None, candidates = None
+                            ):
         """
         retreive relevant question updates for the user
         according to their subscriptions and recorded question
         views
+
+        ``user_feeds`` - list of the user's delayed email feed settings,
+        if not given, they are loaded from the database
+
+        ``candidates`` - dictionary by feed type of the user's
+        candidate questions, see ``get_feed_candidates()``,
+        if not given, they are selected for this user
         """
 
-        user_feeds = EmailFeedSetting.objects.filter(
-                                                subscriber=user
-                                            ).exclude(
-                                                frequency__in=('n', 'i')
-                                            )
+        if user_feeds is None:
+            user_feeds = list(
+                EmailFeedSetting.objects.filter(
+                                        subscriber=user
+                                    ).exclude(
+                                        frequency__in=('n', 'i')
+                                    )
+            )
 
         should_proceed = False
         for feed in user_feeds:
@@ -107,19 +374,18 @@ class Command(NoArgsCommand):
         if should_proceed == False:
             return {}
 
-        #these are placeholders for separate query sets per question group
-        #there are four groups - one for each EmailFeedSetting.feed_type
-        #and each group has subtypes A and B
+        if candidates is None:
+            candidates = get_feed_candidates(
+                                    [user], {user.id: user_feeds}
+                                ).get(user.id, {})
+
+        #these are placeholders for the questions per feed type,
+        #"q_all" query sets have subtypes A and B
         #that's because of the strange thing commented below
         #see note on Q and F objects marked with todo tag
-        q_sel_A = None
-        q_sel_B = None
-
-        q_ask_A = None
-        q_ask_B = None
-
-        q_ans_A = None
-        q_ans_B = None
+        q_sel = None
+        q_ask = None
+        q_ans = None
 
         q_all_A = None
         q_all_B = None
@@ -181,26 +447,17 @@ class Command(NoArgsCommand):
                     feed.mark_reported_now()
                 cutoff_time = feed.get_previous_report_cutoff_time() 
 
-                if feed.feed_type == 'q_sel':
-                    q_sel_A = Q_set_A.filter(thread__followed_by=user)
-                    q_sel_A.cutoff_time = cutoff_time #store cutoff time per query set
-                    q_sel_B = Q_set_B.filter(thread__followed_by=user)
-                    q_sel_B.cutoff_time = cutoff_time #store cutoff time per query set
-
-                elif feed.feed_type == 'q_ask':
-                    q_ask_A = Q_set_A.filter(author=user)
-                    q_ask_A.cutoff_time = cutoff_time
-                    q_ask_B = Q_set_B.filter(author=user)
-                    q_ask_B.cutoff_time = cutoff_time
-
-                elif feed.feed_type == 'q_ans':
-                    q_ans_A = Q_set_A.filter(thread__posts__author=user, thread__posts__post_type='answer')
-                    q_ans_A = q_ans_A[:askbot_settings.MAX_ALERTS_PER_EMAIL]
-                    q_ans_A.cutoff_time = cutoff_time
-
-                    q_ans_B = Q_set_B.filter(thread__posts__author=user, thread__posts__post_type='answer')
-                    q_ans_B = q_ans_B[:askbot_settings.MAX_ALERTS_PER_EMAIL]
-                    q_ans_B.cutoff_time = cutoff_time
+                if feed.feed_type in GROUPED_FEED_TYPES:
+                    #(questions, cutoff time) of the feed
+                    feed_questions = (
+                        candidates.get(feed.feed_type, []), cutoff_time
+                    )
+                    if feed.feed_type == 'q_sel':
+                        q_sel = feed_questions
+                    elif feed.feed_type == 'q_ask':
+                        q_ask = feed_questions
+                    else:
+                        q_ans = feed_questions
 
                 elif feed.feed_type == 'q_all':
                     q_all_A = user.get_tag_filtered_questions(Q_set_A)
@@ -215,8 +472,8 @@ class Command(NoArgsCommand):
         q_list = SortedDict()
 
         #todo: refactor q_list into a separate class?
-        extend_question_list(q_sel_A, q_list)
-        extend_question_list(q_sel_B, q_list)
+        if q_sel:
+            extend_question_list(q_sel[0], q_list, cutoff_time = q_sel[1])
 
         #build list of comment and mention responses here
         #it is separate because posts are not marked as changed
@@ -224,24 +481,31 @@ class Command(NoArgsCommand):
         #mention responses could be collected in the loop above, but
         #it is inconvenient, because feed_type m_and_c bundles the two
         #also we collect metadata for these here
-        try:
-            feed = user_feeds.get(feed_type='m_and_c')
+        m_and_c_feeds = [
+            feed for feed in user_feeds if feed.feed_type == 'm_and_c'
+        ]
+        if m_and_c_feeds:
+            feed = m_and_c_feeds[0]
             if feed.should_send_now():
                 cutoff_time = feed.get_previous_report_cutoff_time()
-                comments = Post.objects.get_comments().filter(
+                #comments by others to the posts of the user,
+                #one question per comment
+                commented_thread_ids = Post.objects.get_comments().filter(
                                             added_at__lt = cutoff_time,
+                                            parent__author = user
                                         ).exclude(
                                             author = user
-                                        )
-                q_commented = list() 
-                for c in comments:
-                    post = c.parent
-                    if post.author != user:
-                        continue
-
-                    #skip is post was seen by the user after
-                    #the comment posting time
-                    q_commented.append(post.get_origin_post())
+                                        ).values_list('thread', flat = True)
+                commented_thread_ids = list(commented_thread_ids)
+                questions = Post.objects.get_questions().filter(
+                                        thread__in = set(commented_thread_ids)
+                                    )
+                question_map = dict([(q.thread_id, q) for q in questions])
+                q_commented = [
+                    question_map[thread_id]
+                    for thread_id in commented_thread_ids
+                    if thread_id in question_map
+                ]
 
                 extend_question_list(
                                 q_commented,
@@ -271,18 +535,19 @@ class Command(NoArgsCommand):
                 q_mentions_B = Q_set_B.filter(id__in = q_mentions_id)
                 q_mentions_B.cutoff_time = cutoff_time
                 extend_question_list(q_mentions_B, q_list, add_mention=True)
-        except EmailFeedSetting.DoesNotExist:
-            pass
 
         if user.email_tag_filter_strategy == const.INCLUDE_INTERESTING:
             extend_question_list(q_all_A, q_list)
             extend_question_list(q_all_B, q_list)
 
-        extend_question_list(q_ask_A, q_list, limit=True)
-        extend_question_list(q_ask_B, q_list, limit=True)
-
-        extend_question_list(q_ans_A, q_list, limit=True)
-        extend_question_list(q_ans_B, q_list, limit=True)
+        if q_ask:
+            extend_question_list(
+                        q_ask[0], q_list, cutoff_time = q_ask[1], limit = True
+                    )
+        if q_ans:
+            extend_question_list(
+                        q_ans[0], q_list, cutoff_time = q_ans[1], limit = True
+                    )
 
         if user.email_tag_filter_strategy == const.EXCLUDE_IGNORED:
             extend_question_list(q_all_A, q_list, limit=True)
@@ -297,6 +562,24 @@ class Command(NoArgsCommand):
         #for each question, whether it needs to be included or not
         #into the report
 
+        #records of the latest email activity per question
+        #are loaded for all the collected questions at once
+        update_infos = dict()
+        if len(q_list) > 0:
+            emailed_activities = Activity.objects.filter(
+                                    user=user,
+                                    content_type=ctype,
+                                    object_id__in=[q.id for q in q_list.keys()],
+                                    activity_type=EMAIL_UPDATE_ACTIVITY
+                                )
+            for activity in emailed_activities:
+                if activity.object_id in update_infos:
+                    raise Exception(
+                                'server error - multiple question email activities '
+                                'found per user-question pair'
+                                )
+                update_infos[activity.object_id] = activity
+
         for q, meta_data in q_list.items():
             #this loop edits meta_data for each question
             #so that user will receive counts on new edits new answers, etc
@@ -304,28 +587,16 @@ class Command(NoArgsCommand):
             #because an email about them was sent recently enough
 
             #also it keeps a record of latest email activity per question per user
-            try:
-                #todo: is it possible to use content_object here, instead of
-                #content type and object_id pair?
-                update_info = Activity.objects.get(
-                                            user=user,
-                                            content_type=ctype,
-                                            object_id=q.id,
-                                            activity_type=EMAIL_UPDATE_ACTIVITY
-                                        )
+            if q.id in update_infos:
+                update_info = update_infos[q.id]
                 emailed_at = update_info.active_at
-            except Activity.DoesNotExist:
+            else:
                 update_info = Activity(
                                         user=user, 
                                         content_object=q, 
                                         activity_type=EMAIL_UPDATE_ACTIVITY
                                     )
                 emailed_at = datetime.datetime(1970, 1, 1)#long time ago
-            except Activity.MultipleObjectsReturned:
-                raise Exception(
-                                'server error - multiple question email activities '
-                                'found per user-question pair'
-                                )
 
             cutoff_time = meta_data['cutoff_time']#cutoff time for the question
 
@@ -387,107 +658,136 @@ class Command(NoArgsCommand):
         #todo: sort question list by update time
         return q_list 
 
-    def send_email_alerts(self):
-        #does not change the database, only sends the email
+    def send_email_alerts(self, id_range = None):
+        """sends the digests to users with ids within
+        ``id_range`` - a (min_id, max_id) tuple, or to all users
+        """
+        chunk_size = getattr(self, 'chunk_size', DEFAULT_CHUNK_SIZE)
+        start_time = time.time()
+        user_count = 0
+        for users in get_user_chunks(id_range, chunk_size):
+            add_missing_subscriptions(users)
+            feeds_by_user = get_delayed_feeds_by_user(users)
+            candidates = get_feed_candidates(users, feeds_by_user)
+            for user in users:
+                user_feeds = feeds_by_user.get(user.id, [])
+                #skip users having no feeds due for the report
+                for feed in user_feeds:
+                    if feed.should_send_now():
+                        self.send_email_alert_to_user(
+                                        user,
+                                        user_feeds,
+                                        candidates.get(user.id, {})
+                                    )
+                        break
+            user_count += len(users)
+
+        if getattr(self, 'verbosity', 1) > 1:
+            elapsed = time.time() - start_time
+            print 'processed %d users in %.1fs (%.1f users/s)' % (
+                user_count, elapsed, user_count / max(elapsed, 0.001)
+            )
+
+    def send_email_alert_to_user(self, user, user_feeds = None, candidates = None):
         #todo: move this to template
-        for user in User.objects.all():
-            user.add_missing_askbot_subscriptions()
-            #todo: q_list is a dictionary, not a list
-            q_list = self.get_updated_questions_for_user(user)
-            if len(q_list.keys()) == 0:
-                continue
-            num_q = 0
-            for question, meta_data in q_list.items():
+        #todo: q_list is a dictionary, not a list
+        q_list = self.get_updated_questions_for_user(
+                                        user, user_feeds, candidates
+                                    )
+        if len(q_list.keys()) == 0:
+            return
+        num_q = 0
+        for question, meta_data in q_list.items():
+            if meta_data['skip']:
+                del q_list[question]
+            else:
+                num_q += 1
+        if num_q > 0:
+            url_prefix = askbot_settings.APP_URL
+
+            threads = Thread.objects.filter(id__in=[qq.thread_id for qq in q_list.keys()])
+            tag_summary = Thread.objects.get_tag_summary_from_threads(threads)
+
+            question_count = len(q_list.keys())
+
+            subject_line = ungettext(
+                '%(question_count)d updated question about %(topics)s',
+                '%(question_count)d updated questions about %(topics)s',
+                question_count
+            ) % {
+                'question_count': question_count,
+                'topics': tag_summary
+            }
+
+            #todo: send this to special log
+            #print 'have %d updated questions for %s' % (num_q, user.username)
+            text = ungettext(
+                '<p>Dear %(name)s,</p><p>The following question has been updated '
+                '%(sitename)s</p>',
+                '<p>Dear %(name)s,</p><p>The following %(num)d questions have been '
+                'updated on %(sitename)s:</p>',
+                num_q
+            ) % {
+                'num':num_q,
+                'name':user.username,
+                'sitename': askbot_settings.APP_SHORT_NAME
+            }
+
+            text += '<ul>'
+            items_added = 0
+            items_unreported = 0
+            for q, meta_data in q_list.items():
+                act_list = []
                 if meta_data['skip']:
-                    del q_list[question]
+                    continue
+                if items_added >= askbot_settings.MAX_ALERTS_PER_EMAIL:
+                    items_unreported = num_q - items_added #may be inaccurate actually, but it's ok
+                    
                 else:
-                    num_q += 1
-            if num_q > 0:
-                url_prefix = askbot_settings.APP_URL
-
-                threads = Thread.objects.filter(id__in=[qq.thread_id for qq in q_list.keys()])
-                tag_summary = Thread.objects.get_tag_summary_from_threads(threads)
-
-                question_count = len(q_list.keys())
-
-                subject_line = ungettext(
-                    '%(question_count)d updated question about %(topics)s',
-                    '%(question_count)d updated questions about %(topics)s',
-                    question_count
-                ) % {
-                    'question_count': question_count,
-                    'topics': tag_summary
-                }
-
-                #todo: send this to special log
-                #print 'have %d updated questions for %s' % (num_q, user.username)
-                text = ungettext(
-                    '<p>Dear %(name)s,</p><p>The following question has been updated '
-                    '%(sitename)s</p>',
-                    '<p>Dear %(name)s,</p><p>The following %(num)d questions have been '
-                    'updated on %(sitename)s:</p>',
-                    num_q
-                ) % {
-                    'num':num_q,
-                    'name':user.username,
-                    'sitename': askbot_settings.APP_SHORT_NAME
-                }
-
-                text += '<ul>'
-                items_added = 0
-                items_unreported = 0
-                for q, meta_data in q_list.items():
-                    act_list = []
-                    if meta_data['skip']:
-                        continue
-                    if items_added >= askbot_settings.MAX_ALERTS_PER_EMAIL:
-                        items_unreported = num_q - items_added #may be inaccurate actually, but it's ok
-                        
-                    else:
-                        items_added += 1
-                        if meta_data['new_q']:
-                            act_list.append(_('new question'))
-                        format_action_count('%(num)d rev', meta_data['q_rev'],act_list)
-                        format_action_count('%(num)d ans', meta_data['new_ans'],act_list)
-                        format_action_count('%(num)d ans rev',meta_data['ans_rev'],act_list)
-                        act_token = ', '.join(act_list)
-                        text += '<li><a href="%s?sort=latest">%s</a> <font color="#777777">(%s)</font></li>' \
-                                    % (url_prefix + q.get_absolute_url(), q.thread.title, act_token)
-                text += '</ul>'
-                text += '<p></p>'
-                #if len(q_list.keys()) >= askbot_settings.MAX_ALERTS_PER_EMAIL:
-                #    text += _('There may be more questions updated since '
-                #                'you have logged in last time as this list is '
-                #                'abridged for your convinience. Please visit '
-                #                'the askbot and see what\'s new!<br>'
-                #              )
-
-                link = url_prefix + reverse(
-                                        'user_subscriptions', 
-                                        kwargs = {
-                                            'id': user.id,
-                                            'slug': slugify(user.username)
-                                        }
-                                    )
+                    items_added += 1
+                    if meta_data['new_q']:
+                        act_list.append(_('new question'))
+                    format_action_count('%(num)d rev', meta_data['q_rev'],act_list)
+                    format_action_count('%(num)d ans', meta_data['new_ans'],act_list)
+                    format_action_count('%(num)d ans rev',meta_data['ans_rev'],act_list)
+                    act_token = ', '.join(act_list)
+                    text += '<li><a href="%s?sort=latest">%s</a> <font color="#777777">(%s)</font></li>' \
+                                % (url_prefix + q.get_absolute_url(), q.thread.title, act_token)
+            text += '</ul>'
+            text += '<p></p>'
+            #if len(q_list.keys()) >= askbot_settings.MAX_ALERTS_PER_EMAIL:
+            #    text += _('There may be more questions updated since '
+            #                'you have logged in last time as this list is '
+            #                'abridged for your convinience. Please visit '
+            #                'the askbot and see what\'s new!<br>'
+            #              )
+
+            link = url_prefix + reverse(
+                                    'user_subscriptions', 
+                                    kwargs = {
+                                        'id': user.id,
+                                        'slug': slugify(user.username)
+                                    }
+                                )
 
-                text += _(
-                    '<p>Please remember that you can always <a '
-                    'href="%(email_settings_link)s">adjust</a> frequency of the email updates or '
-                    'turn them off entirely.<br/>If you believe that this message was sent in an '
-                    'error, please email about it the forum administrator at %(admin_email)s.</'
-                    'p><p>Sincerely,</p><p>Your friendly %(sitename)s server.</p>'
-                ) % {
-                    'email_settings_link': link,
-                    'admin_email': django_settings.ADMINS[0][1],
-                    'sitename': askbot_settings.APP_SHORT_NAME
-                }
-                if DEBUG_THIS_COMMAND == True:
-                    recipient_email = django_settings.ADMINS[0][1]
-                else:
-                    recipient_email = user.email
+            text += _(
+                '<p>Please remember that you can always <a '
+                'href="%(email_settings_link)s">adjust</a> frequency of the email updates or '
+                'turn them off entirely.<br/>If you believe that this message was sent in an '
+                'error, please email about it the forum administrator at %(admin_email)s.</'
+                'p><p>Sincerely,</p><p>Your friendly %(sitename)s server.</p>'
+            ) % {
+                'email_settings_link': link,
+                'admin_email': django_settings.ADMINS[0][1],
+                'sitename': askbot_settings.APP_SHORT_NAME
+            }
+            if DEBUG_THIS_COMMAND == True:
+                recipient_email = django_settings.ADMINS[0][1]
+            else:
+                recipient_email = user.email
 
-                mail.send_mail(
-                    subject_line = subject_line,
-                    body_text = text,
-                    recipient_list = [recipient_email]
-                )
+            mail.send_mail(
+                subject_line = subject_line,
+                body_text = text,
+                recipient_list = [recipient_email]
+            )
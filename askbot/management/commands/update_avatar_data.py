@@ -1,27 +1,68 @@
+from optparse import make_option
+from django.conf import settings as django_settings
 from django.core.management.base import NoArgsCommand
 from django.contrib.auth.models import User
 from django.db import transaction
-from askbot.utils.console import print_action
+from askbot.utils import gravatar as gravatar_utils
+
+UPDATE_CHUNK_SIZE = 500
 
 class Command(NoArgsCommand):
     help = 'updates data about currently used avatars, ' + \
         'necessary for display of avatars on the front page'
 
+    option_list = NoArgsCommand.option_list + (
+            make_option('--workers',
+                action='store',
+                type='int',
+                dest='workers',
+                default=gravatar_utils.DEFAULT_WORKERS,
+                help='Number of concurrent requests to gravatar.com'
+                ),
+            )
+
+    def get_uploaded_avatar_user_ids(self):
+        if 'avatar' not in django_settings.INSTALLED_APPS:
+            return set()
+        from avatar.models import Avatar
+        return set(Avatar.objects.values_list('user', flat = True))
+
     @transaction.commit_manually
     def handle_noargs(self, **options):
-        users = User.objects.all()
+        total_users = User.objects.count()
         has_avatar = User.objects.exclude(avatar_type='n').count()
-        total_users = users.count()
         print '%s users in total, %s have valid avatar' \
-           % (total_users, has_avatar) 
+           % (total_users, has_avatar)
 
-        for count, user in enumerate(users):
-            users_left = total_users - count
-            print_action(
-                'Updating %s (%d users left)' % (user.username, users_left)
-            )
-            user.update_avatar_type()
-            transaction.commit()
+        uploaded_ids = self.get_uploaded_avatar_user_ids()
+        users = list(
+            User.objects.values_list('id', 'gravatar', 'avatar_type')
+        )
+        gravatars = [
+            gravatar for user_id, gravatar, avatar_type in users
+            if user_id not in uploaded_ids
+        ]
+        print 'Probing %d gravatars' % len(set(gravatars))
+        #recently probed gravatars are taken from the cache
+        found = gravatar_utils.probe_gravatars(gravatars, options['workers'])
+
+        #group users by the new avatar type, to update them together
+        new_types = {'a': list(), 'g': list(), 'n': list()}
+        for user_id, gravatar, avatar_type in users:
+            if user_id in uploaded_ids:
+                new_type = 'a'
+            else:
+                #unreachable gravatars keep the old value
+                new_type = found.get(gravatar, avatar_type)
+            if new_type != avatar_type:
+                new_types[new_type].append(user_id)
+
+        for avatar_type, user_ids in new_types.items():
+            for start in range(0, len(user_ids), UPDATE_CHUNK_SIZE):
+                User.objects.filter(
+                    id__in = user_ids[start:start + UPDATE_CHUNK_SIZE]
+                ).update(avatar_type = avatar_type)
+                transaction.commit()
 
         print 'Updated all the users'
         has_avatar = User.objects.exclude(avatar_type='n').count()
@@ -0,0 +1,48 @@
+"""
+Middleware that samples requests and records per-view
+wall time, sql queries, cache use and template render time,
+see ``askbot.utils.instrumentation``
+
+To use, put it first into the ``MIDDLEWARE_CLASSES``
+and set ``ASKBOT_INSTRUMENTATION_SAMPLE_RATE`` - the fraction
+of requests to sample, e.g. 0.01. Collected data is printed
+by the management command ``dump_view_stats``.
+"""
+import logging
+import random
+from django.conf import settings as django_settings
+from django.core.exceptions import MiddlewareNotUsed
+from askbot.utils import instrumentation
+
+DEFAULT_SAMPLE_RATE = 0.01
+
+class InstrumentationMiddleware(object):
+    def __init__(self):
+        self.sample_rate = getattr(
+                                django_settings,
+                                'ASKBOT_INSTRUMENTATION_SAMPLE_RATE',
+                                DEFAULT_SAMPLE_RATE
+                            )
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed()
+        instrumentation.install_cache_counter()
+
+    def process_request(self, request):
+        #discard the sample left by a request that did not complete
+        instrumentation.stop()
+        if random.random() < self.sample_rate:
+            instrumentation.start()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = instrumentation.get_view_name(view_func)
+        instrumentation.set_view_name(view_name)
+
+    def process_response(self, request, response):
+        sample = instrumentation.stop()
+        #requests not resolved to a view are not recorded
+        if sample and sample['view_name']:
+            try:
+                instrumentation.record_sample(sample)
+            except Exception, e:
+                logging.warning('could not record view stats: %s' % e)
+        return response
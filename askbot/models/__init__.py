@@ -15,6 +15,7 @@ from django.contrib.auth.models import User
 from django.utils.safestring import mark_safe
 from django.utils.html import escape
 from django.db import models
+from django.db.models import F
 from django.conf import settings as django_settings
 from django.contrib.contenttypes.models import ContentType
 from django.core import cache
@@ -29,18 +30,26 @@ from askbot.skins import utils as skin_utils
 from askbot.mail import messages
 from askbot.models.question import QuestionView, AnonymousQuestion
 from askbot.models.question import FavoriteQuestion
+from askbot.models.question import ThreadSimilarity
+from askbot.models.question import update_thread_similarity
+from askbot.models.question import invalidate_similar_threads_on_post_delete
 from askbot.models.tag import Tag, MarkedTag
 from askbot.models.tag import get_group_names, get_groups
 from askbot.models.user import EmailFeedSetting, ActivityAuditStatus, Activity
 from askbot.models.user import GroupMembership, GroupProfile
 from askbot.models.post import Post, PostRevision, PostFlagReason, AnonymousAnswer
 from askbot.models.reply_by_email import ReplyAddress
+from askbot.models import search_index
+from askbot.models.search_index import SearchToken
+from askbot.models import subscriber_index
+from askbot.models import tag_index
 from askbot.models import signals
 from askbot.models.badges import award_badges_signal, get_badge, BadgeData
-from askbot.models.repute import Award, Repute, Vote
+from askbot.models.repute import Award, Repute, Vote, DailyUpvoteReputation
 from askbot import auth
 from askbot.utils.decorators import auto_now_timestamp
 from askbot.utils.slug import slugify
+from askbot.utils import gravatar as gravatar_utils
 from askbot.utils.html import sanitize_html
 from askbot.utils.diff import textDiff as htmldiff
 from askbot.utils.url_utils import strip_path
@@ -196,6 +205,21 @@ def user_get_avatar_url(self, size):
         else:
             return self.get_default_avatar_url(size)
 
+def user_get_avatar_type(self, gravatar_type = None):
+    """returns 'a' if the user has uploaded avatars,
+    otherwise probes the gravatar and returns 'g' or 'n',
+    or the current avatar type if the probe has failed
+
+    the gravatar is not probed if its type is
+    given as the ``gravatar_type``
+    """
+    if 'avatar' in django_settings.INSTALLED_APPS:
+        if self.avatar_set.count() > 0:
+            return 'a'
+    if gravatar_type is not None:
+        return gravatar_type
+    return _check_gravatar(self.gravatar, self.avatar_type)
+
 def user_update_avatar_type(self):
     """counts number of custom avatars
     and if zero, sets avatar_type to False,
@@ -203,14 +227,7 @@ def user_update_avatar_type(self):
     avatar application is installed.
     Saves the object.
     """
-
-    if 'avatar' in django_settings.INSTALLED_APPS:
-        if self.avatar_set.count() > 0:
-            self.avatar_type = 'a'
-        else:
-            self.avatar_type = _check_gravatar(self.gravatar)
-    else:
-            self.avatar_type = _check_gravatar(self.gravatar)
+    self.avatar_type = self.get_avatar_type()
     self.save()
 
 def user_strip_email_signature(self, text):
@@ -223,13 +240,14 @@ def user_strip_email_signature(self, text):
         text = text[0:-len(self.email_signature)]
     return text
 
-def _check_gravatar(gravatar):
-    gravatar_url = "http://www.gravatar.com/avatar/%s?d=404" % gravatar
-    code = urllib.urlopen(gravatar_url).getcode()
-    if urllib.urlopen(gravatar_url).getcode() != 404:
-        return 'g' #gravatar
-    else:
-        return 'n' #none
+def _check_gravatar(gravatar, default = 'n'):
+    """returns 'g' if gravatar exists, 'n' if not,
+    or the ``default`` if gravatar server could not be reached
+    """
+    avatar_type = gravatar_utils.probe_gravatar(gravatar)
+    if avatar_type is None:
+        return default
+    return avatar_type
 
 def user_get_old_vote_for_post(self, post):
     """returns previous vote for this post
@@ -1229,6 +1247,9 @@ def user_mark_tags(
                 marked_ts.update(reason=reason)
             cleaned_tagnames = tagnames
 
+    #bulk updates and deletes above bypass the model signals
+    subscriber_index.invalidate_index()
+
     return cleaned_tagnames, cleaned_wildcards
 
 @auto_now_timestamp
@@ -1310,6 +1331,7 @@ def user_delete_comment(
     #comment.save()
     comment.delete()
     comment.thread.invalidate_cached_data()
+    search_index.update_thread_search_index(comment.thread)
 
 @auto_now_timestamp
 def user_delete_answer(
@@ -1439,6 +1461,7 @@ def user_restore_post(
                     tag.deleted_by = None
                     tag.deleted_at = None
                     tag.save()
+        search_index.update_thread_search_index(post.thread)
     else:
         raise NotImplementedError()
 
@@ -1805,13 +1828,15 @@ def user_visit_question(self, question = None, timestamp = None):
         self.update_response_counts()
 
     #finally, mark admin memo objects if applicable
-    #the admin response counts are not denormalized b/c they are easy to obtain
+    #the admin response counts are not denormalized, they are cached
     if self.is_moderator() or self.is_administrator():
-        audit_records.filter(
+        cleared_flag_count = audit_records.filter(
                 activity__activity_type = const.TYPE_ACTIVITY_MARK_OFFENSIVE
         ).update(
             status=ActivityAuditStatus.STATUS_SEEN
         )
+        if cleared_flag_count > 0:
+            ActivityAuditStatus.invalidate_moderation_items_cache([self.id])
 
 
 def user_is_username_taken(cls,username):
@@ -1839,6 +1864,9 @@ def user_set_admin_status(self):
     self.is_superuser = True
 
 def user_add_missing_askbot_subscriptions(self):
+    """adds email feed settings with the default frequencies
+    for the feed types the user does not have,
+    returns True if any were added"""
     from askbot import forms#need to avoid circular dependency
     form = forms.EditUserEmailFeedsForm()
     need_feed_types = form.get_db_model_subscription_type_names()
@@ -1857,6 +1885,7 @@ def user_add_missing_askbot_subscriptions(self):
                             frequency = freq
                         )
         feed_setting.save()
+    return len(missing_feed_types) > 0
 
 def user_is_moderator(self):
     return (self.status == 'm' and self.is_administrator() == False)
@@ -2462,6 +2491,22 @@ def user_update_response_counts(user):
     user.save()
 
 
+def increment_response_counts(users):
+    """adds one new response to the counts of the users,
+    with one update statement, instead of recounting
+    the responses of each user"""
+    user_ids = set([user.id for user in users])
+    if len(user_ids) == 0:
+        return
+    User.objects.filter(
+                id__in = user_ids
+            ).update(
+                new_response_count = F('new_response_count') + 1
+            )
+    for user in dict([(user.id, user) for user in users]).values():
+        user.new_response_count += 1
+
+
 def user_receive_reputation(self, num_points):
     new_points = self.reputation + num_points
     if new_points > 0:
@@ -2513,6 +2558,7 @@ def user_update_wildcard_tag_selections(
     self.ignored_tags = ' '.join(ignored)
     self.subscribed_tags = ' '.join(subscribed)
     self.save()
+    subscriber_index.invalidate_index()
     return new_tags
 
 
@@ -2561,6 +2607,7 @@ User.add_to_class('get_foreign_groups', user_get_foreign_groups)
 User.add_to_class('strip_email_signature', user_strip_email_signature)
 User.add_to_class('get_groups_membership_info', user_get_groups_membership_info)
 User.add_to_class('get_anonymous_name', user_get_anonymous_name)
+User.add_to_class('get_avatar_type', user_get_avatar_type)
 User.add_to_class('update_avatar_type', user_update_avatar_type)
 User.add_to_class('post_question', user_post_question)
 User.add_to_class('edit_question', user_edit_question)
@@ -2886,7 +2933,10 @@ def send_instant_notifications_about_activity_in_post(
                             origin_post,
                             update_activity.activity_type
                         )
-    #send email for all recipients
+    template = get_template('instant_notification.html')
+
+    #render messages for all recipients, then send them together
+    messages = list()
     for user in recipients:
         reply_address, alt_reply_address = get_reply_to_addresses(user, post)
 
@@ -2897,18 +2947,24 @@ def send_instant_notifications_about_activity_in_post(
                             reply_address = reply_address,
                             alt_reply_address = alt_reply_address,
                             update_type = update_type,
-                            template = get_template('instant_notification.html')
+                            template = template
                         )
-      
-        headers['Reply-To'] = reply_address
-        mail.send_mail(
-            subject_line = subject_line,
-            body_text = body_text,
-            recipient_list = [user.email],
-            related_object = origin_post,
-            activity_type = const.TYPE_ACTIVITY_EMAIL_UPDATE_SENT,
-            headers = headers
-        )
+
+        message_headers = dict(headers)
+        message_headers['Reply-To'] = reply_address
+        try:
+            messages.append(
+                mail.create_message(
+                    subject_line = subject_line,
+                    body_text = body_text,
+                    recipient_list = [user.email],
+                    headers = message_headers
+                )
+            )
+        except Exception, error:
+            logging.critical(unicode(error))
+
+    mail.send_messages(messages)
 
 def notify_author_of_published_revision(
     revision = None, was_approved = None, **kwargs
@@ -3312,6 +3368,11 @@ def make_admin_if_first_user(instance, **kwargs):
     cache.cache.set('admin-created', True)
 
 
+def invalidate_moderation_items_cache(instance, **kwargs):
+    """called when audit records are saved or deleted"""
+    ActivityAuditStatus.invalidate_moderation_items_cache([instance.user_id])
+
+
 #signal for User model save changes
 django_signals.pre_save.connect(make_admin_if_first_user, sender=User)
 django_signals.pre_save.connect(calculate_gravatar_hash, sender=User)
@@ -3328,6 +3389,20 @@ if 'avatar' in django_settings.INSTALLED_APPS:
     django_signals.post_delete.connect(update_user_avatar_type_flag, sender=Avatar)
 
 django_signals.post_delete.connect(record_cancel_vote, sender=Vote)
+django_signals.post_save.connect(
+    subscriber_index.invalidate_index, sender=MarkedTag
+)
+django_signals.post_delete.connect(
+    subscriber_index.invalidate_index, sender=MarkedTag
+)
+django_signals.post_save.connect(tag_index.invalidate_index, sender=Tag)
+django_signals.post_delete.connect(tag_index.invalidate_index, sender=Tag)
+django_signals.post_save.connect(
+    invalidate_moderation_items_cache, sender=ActivityAuditStatus
+)
+django_signals.post_delete.connect(
+    invalidate_moderation_items_cache, sender=ActivityAuditStatus
+)
 
 #change this to real m2m_changed with Django1.2
 signals.delete_question_or_answer.connect(record_delete_question, sender=Post)
@@ -3339,6 +3414,19 @@ signals.user_updated.connect(record_user_full_updated, sender=User)
 signals.user_logged_in.connect(complete_pending_tag_subscriptions)#todo: add this to fake onlogin middleware
 signals.user_logged_in.connect(post_anonymous_askbot_content)
 signals.post_updated.connect(record_post_update_activity)
+signals.post_updated.connect(
+    search_index.update_search_index_on_post_update
+)
+signals.tags_updated.connect(search_index.update_search_index_on_tags_update)
+signals.tags_updated.connect(update_thread_similarity)
+signals.delete_question_or_answer.connect(
+    search_index.update_search_index_on_post_delete,
+    sender=Post
+)
+signals.delete_question_or_answer.connect(
+    invalidate_similar_threads_on_post_delete,
+    sender=Post
+)
 
 #probably we cannot use post-save here the point of this is
 #to tell when the revision becomes publicly visible, not when it is saved
@@ -3374,6 +3462,7 @@ __all__ = [
         'BadgeData',
         'Award',
         'Repute',
+        'DailyUpvoteReputation',
 
         'Activity',
         'ActivityAuditStatus',
@@ -3385,6 +3474,9 @@ __all__ = [
 
         'ReplyAddress',
 
+        'SearchToken',
+        'ThreadSimilarity',
+
         'get_model',
         'get_admins_and_moderators',
         'get_group_names',
@@ -18,6 +18,8 @@ corresponding event name, actor (user object), context_object and optionally
 - timestamp
 """
 import datetime
+import logging
+import time
 from django.template.defaultfilters import slugify
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext as _
@@ -40,7 +42,14 @@ class Badge(object):
     consider_award assumes that the function is called
     upon correct event, i.e. it is the responsibility of
     the caller to try awarding badges at appropriate times
+
+    badges that are always awarded to the actor and run
+    a counting query in consider_award set ``awarded_to_actor = True``,
+    then the event dispatcher skips the non-multiple badge
+    without calling consider_award, if the actor already has it
     """
+    awarded_to_actor = False
+
     def __init__(self,
                 key = '',
                 name = '', 
@@ -55,10 +64,17 @@ class Badge(object):
         self.description = description
         self.multiple = multiple
         self.css_class = const.BADGE_CSS_CLASSES[self.level]
+        #set by the event dispatcher, see award_badges()
+        self.stored_data = None
+        self.awards = None
 
     def get_stored_data(self):
-        data, created = BadgeData.objects.get_or_create(slug = self.key)
-        return data
+        if self.stored_data is None and self.awards is not None:
+            self.stored_data = self.awards.get_badge_data(self)
+        if self.stored_data is None:
+            data, created = BadgeData.objects.get_or_create(slug = self.key)
+            self.stored_data = data
+        return self.stored_data
 
     @property
     def awarded_count(self):
@@ -87,7 +103,10 @@ class Badge(object):
     def award(self, recipient = None, context_object = None, timestamp = None):
         """do award, the recipient was proven to deserve"""
 
-        if self.multiple == False:
+        if self.awards is not None:
+            if self.awards.has_award(self, recipient, context_object):
+                return False
+        elif self.multiple == False:
             if recipient.badges.filter(slug = self.key).count() != 0:
                 return False
         else:
@@ -110,6 +129,8 @@ class Badge(object):
                     content_object = context_object
                 )
         award.save()#note: there are signals that listen to saving the Award
+        if self.awards is not None:
+            self.awards.add_award(self, recipient, context_object)
         return True
 
     def consider_award(self, actor = None,
@@ -195,6 +216,8 @@ class FirstVote(Badge):
     Supporter and Critic, which must provide
     * key, name and description properties through __new__ call
     """
+    awarded_to_actor = True
+
     def __init__(self):
         super(FirstVote, self).__init__(
             key = self.key,
@@ -230,6 +253,8 @@ class Critic(FirstVote):
 
 class CivicDuty(Badge):
     """awarded once after a certain number of votes"""
+    awarded_to_actor = True
+
     def __init__(self):
         min_votes = askbot_settings.CIVIC_DUTY_BADGE_MIN_VOTES
         super(CivicDuty, self).__init__(
@@ -585,6 +610,8 @@ class EditorTypeBadge(Badge):
     must provide usual parameters + min_edits
     via __new__ function
     """
+    awarded_to_actor = True
+
     def __init__(self):
         super(EditorTypeBadge, self).__init__(
             key = self.key,
@@ -726,6 +753,8 @@ class Commentator(Badge):
     """Commentator is a bronze badge that is 
     awarded once when user posts a certain number of
     comments"""
+    awarded_to_actor = True
+
     def __init__(self):
         super(Commentator, self).__init__(
             key = 'commentator',
@@ -884,6 +913,94 @@ def init_badges():
         slug__in = map(slugify, BADGES.keys())
     ).delete()
 
+class AwardedBadges(object):
+    """badge rows, awards of the users and awards for the context
+    object of one event, shared by all badges considered on the event,
+    each is loaded from the database on the first use, so that
+    the events on which nothing is awarded run no queries
+    """
+    def __init__(self, context_object, badge_keys = None):
+        self.context_object = context_object
+        self.badge_keys = badge_keys or list()
+        self.badge_data = None
+        self.user_badges = dict()
+        self.object_awards = None
+
+    def get_badge_data(self, badge):
+        """returns BadgeData of the badge or None if it is not stored,
+        rows of all badges of the event are loaded with one query"""
+        if self.badge_data is None:
+            self.badge_data = dict(
+                [
+                    (data.slug, data) for data in BadgeData.objects.filter(
+                        slug__in = self.badge_keys
+                    )
+                ]
+            )
+        return self.badge_data.get(badge.key)
+
+    def get_user_badges(self, user):
+        """returns set of slugs of badges awarded to the user"""
+        if user.id not in self.user_badges:
+            self.user_badges[user.id] = set(
+                Award.objects.filter(
+                            user = user
+                        ).values_list('badge__slug', flat = True)
+            )
+        return self.user_badges[user.id]
+
+    def get_object_awards(self):
+        """returns set of (user id, badge slug) tuples
+        of the awards given for the context object"""
+        if self.object_awards is None:
+            content_type = ContentType.objects.get_for_model(
+                                                    self.context_object
+                                                )
+            self.object_awards = set(
+                Award.objects.filter(
+                            content_type = content_type,
+                            object_id = self.context_object.id
+                        ).values_list('user', 'badge__slug')
+            )
+        return self.object_awards
+
+    def has_award(self, badge, user, context_object):
+        if badge.multiple == False:
+            return badge.key in self.get_user_badges(user)
+        elif context_object == self.context_object:
+            return (user.id, badge.key) in self.get_object_awards()
+        else:
+            content_type = ContentType.objects.get_for_model(context_object)
+            return Award.objects.filter(
+                                user = user,
+                                object_id = context_object.id,
+                                content_type = content_type,
+                                badge__slug = badge.key
+                            ).count() != 0
+
+    def add_award(self, badge, user, context_object):
+        if user.id in self.user_badges:
+            self.user_badges[user.id].add(badge.key)
+        if context_object == self.context_object \
+            and self.object_awards is not None:
+            self.object_awards.add((user.id, badge.key))
+
+
+#badge key -> [number of evaluations, total time in seconds]
+EVALUATION_STATS = dict()
+
+def get_evaluation_stats():
+    """returns list of tuples
+    (badge key, number of evaluations, average time in milliseconds)
+    for the badges evaluated by this process, slowest first
+    """
+    stats = [
+        (key, count, 1000 * total / count)
+        for key, (count, total) in EVALUATION_STATS.items()
+    ]
+    stats.sort(key = lambda item: item[2], reverse = True)
+    return stats
+
 award_badges_signal = Signal(
                         providing_args=[
                             'actor', 'event', 'context_object', 'timestamp'
@@ -903,8 +1020,30 @@ def award_badges(event = None, actor = None,
     except KeyError:
         raise NotImplementedError('event "%s" is not implemented' % event)
 
-    for badge in consider_badges:
-        badge_instance = badge()
-        badge_instance.consider_award(actor, context_object, timestamp)
+    badges = [badge() for badge in consider_badges]
+    if len(badges) == 0:
+        return
+
+    #rows of the badges and the awards are loaded once for all badges
+    awards = AwardedBadges(
+                    context_object,
+                    badge_keys = [badge.key for badge in badges]
+                )
+
+    for badge in badges:
+        badge.awards = awards
+        if badge.awarded_to_actor and badge.multiple == False:
+            if badge.key in awards.get_user_badges(actor):
+                continue
+        start = time.time()
+        badge.consider_award(actor, context_object, timestamp)
+        elapsed = time.time() - start
+        stats = EVALUATION_STATS.setdefault(badge.key, [0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        logging.debug(
+            'badge %s evaluated on %s in %.2fms',
+            badge.key, event, 1000 * elapsed
+        )
 
 award_badges_signal.connect(award_badges)
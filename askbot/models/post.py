@@ -2,10 +2,8 @@ from collections import defaultdict
 import datetime
 import operator
 import cgi
-import logging
 
 from django.utils.html import strip_tags
-from django.contrib.sitemaps import ping_google
 from django.utils import html
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -26,6 +24,7 @@ from askbot import const
 from askbot.models.user import EmailFeedSetting
 from askbot.models.tag import Tag, MarkedTag
 from askbot.models.tag import get_groups, tags_match_some_wildcard
+from askbot.models import subscriber_index
 from askbot.conf import settings as askbot_settings
 from askbot import exceptions
 from askbot.utils import markup
@@ -48,6 +47,13 @@ class PostQuerySet(models.query.QuerySet):
         """returns a query set of questions,
         matching the full text query
         """
+        from askbot.models import search_index
+        if search_index.search_index_enabled():
+            from askbot.models.question import Thread
+            threads = search_index.SearchToken.objects.filter_threads(
+                                            Thread.objects.all(), search_query
+                                        )
+            return self.filter(thread__id__in = threads.values('id'))
         return self.filter(
             models.Q(thread__title__icontains = search_query)\
             | models.Q(text__icontains = search_query)\
@@ -514,12 +520,9 @@ class Post(models.Model):
             sender = self.__class__
         )
 
-        try:
-            from askbot.conf import settings as askbot_settings
-            if askbot_settings.GOOGLE_SITEMAP_CODE != '':
-                ping_google()
-        except Exception:
-            logging.debug('cannot ping google - did you register with them?')
+        #ping is sent in the background with a delay
+        from askbot import tasks
+        tasks.schedule_sitemap_ping()
 
     def is_question(self):
         return self.post_type == 'question'
@@ -811,8 +814,33 @@ class Post(models.Model):
         else:
             raise ValueError('Uknown value of tag mark reason %s' % tag_mark_reason)
 
-        #part 1 - find users who follow or not ignore the set of tags
         tag_names = self.get_tag_names()
+
+        if subscriber_index.subscriber_index_enabled():
+            #candidates are selected with one query, the tag
+            #and wildcard selections are looked up in the index
+            candidate_ids = set(
+                User.objects.filter(
+                    notification_subscriptions__in = subscription_records
+                ).filter(
+                    email_tag_filter_strategy = email_tag_filter_strategy
+                ).values_list('id', flat = True)
+            )
+            index = subscriber_index.get_index()
+            marked_ids = index.get_user_ids(
+                                tag_names,
+                                tag_mark_reason,
+                                use_wildcards = askbot_settings.USE_WILDCARD_TAGS
+                            )
+            if tag_mark_reason == 'good':
+                subscriber_ids = candidate_ids & marked_ids
+            else:
+                subscriber_ids = candidate_ids - marked_ids
+            if len(subscriber_ids) == 0:
+                return set()
+            return set(User.objects.filter(id__in = subscriber_ids))
+
+        #part 1 - find users who follow or not ignore the set of tags
         tag_selections = MarkedTag.objects.filter(
             tag__name__in = tag_names,
             reason = tag_mark_reason
@@ -1139,6 +1167,16 @@ class Post(models.Model):
             authors -= set(exclude_list)
         return list(authors)
 
+    def get_answer_authors(self):
+        """returns list of authors of the revisions
+        of all answers in the thread, loaded with one query,
+        the same users as ``get_author_list()`` of each answer
+        """
+        answers = self.thread.posts.get_answers()
+        return list(
+            User.objects.filter(postrevisions__post__in = answers).distinct()
+        )
+
     def passes_tag_filter_for_user(self, user):
 
         question = self.get_origin_post()
@@ -1637,8 +1675,7 @@ class Post(models.Model):
                 include_comments = True
             )
         )
-        for answer in question.thread.posts.get_answers().all():
-            recipients.update(answer.get_author_list())
+        recipients.update(question.get_answer_authors())
 
         recipients -= set(exclude_list)
 
@@ -1660,8 +1697,7 @@ class Post(models.Model):
             )
         )
         #do not include answer commenters here
-        for a in self.thread.posts.get_answers().all():
-            recipients.update(a.get_author_list())
+        recipients.update(self.get_answer_authors())
 
         recipients -= set(exclude_list)
         return recipients
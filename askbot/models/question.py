@@ -1,6 +1,10 @@
 import datetime
+import heapq
+import math
 import operator
 import re
+import uuid
+from collections import defaultdict
 
 from django.conf import settings
 from django.db import models
@@ -29,6 +33,54 @@ from askbot.utils.slug import slugify
 from askbot.skins.loaders import get_template #jinja2 template loading enviroment
 from askbot.search.state_manager import DummySearchState
 
+#use `<<<` and `>>>` because they cannot be confused with user input
+#- if user accidentialy types <<<tag-name>>> into question title or body,
+#then in html it'll become escaped like this: &lt;&lt;&lt;tag-name&gt;&gt;&gt;
+SUMMARY_TAG_PLACEHOLDER_RE = re.compile(
+    r'<<<(%s)>>>' % const.TAG_REGEX_BARE,
+    re.UNICODE
+)
+
+def fill_summary_tag_urls(html, search_state):
+    """replaces tag placeholders in the cached question summary
+    with the tag urls matching the search state
+    """
+    # todo: this work may be pushed onto javascript we post-process tag names
+    # in the snippet so that tag urls match the search state
+    urls = dict()
+    def get_tag_url(match):
+        tag = match.group(1)  # e.g "my-tag"
+        if tag not in urls:
+            urls[tag] = search_state.add_tag(tag).full_url()
+        return urls[tag]
+    return SUMMARY_TAG_PLACEHOLDER_RE.sub(get_tag_url, html)
+
+def get_group_set_key(user):
+    """returns a hash of the set of groups whose posts
+    are hidden from the user, to be used as a part of cache keys
+    for the data that depends on the user's group memberships
+
+    for the authenticated and anonymous users the hash is
+    memoized on the user object
+    """
+    if user is not None:
+        group_set_key = getattr(user, '_askbot_group_set_key', None)
+        if group_set_key:
+            return group_set_key
+
+    if user is None or user.is_anonymous():
+        groups = get_groups()
+    else:
+        groups = user.get_foreign_groups()
+    group_ids = sorted(groups.values_list('id', flat = True))
+    group_set_key = md5_constructor(
+                        ','.join([str(group_id) for group_id in group_ids])
+                    ).hexdigest()
+
+    if user is not None:
+        user._askbot_group_set_key = group_set_key
+    return group_set_key
+
 class ThreadQuerySet(models.query.QuerySet):
     def exclude_group_private(self, user):
         """filters out threads not belonging to the user groups"""
@@ -77,6 +129,127 @@ class ThreadManager(BaseQuerySetManager):
 
         return '"' + '", "'.join(tag_list) + last_topic
 
+    VIEW_COUNT_KEY_TPL = 'thread-view-count-buffer-%d'
+    VIEW_COUNT_SLOT_KEY_TPL = 'thread-view-count-buffer-slot-%d'
+    VIEW_COUNT_SEQUENCE_KEY = 'thread-view-count-buffer-sequence'
+    VIEW_COUNT_FLUSHED_KEY = 'thread-view-count-buffer-flushed'
+
+    def buffer_view_count(self, thread_id, increment = 1):
+        """accumulates views of the thread in the cache,
+        the counts are written to the database by
+        :meth:`flush_buffered_view_counts`, which is run
+        periodically by the management command ``flush_view_counts``
+
+        each time the buffered count of the thread goes up from zero,
+        the thread id is appended to the list of slots
+        numbered by the sequence counter, so that the flush
+        does not need to look at the threads without new views
+        """
+        key = self.VIEW_COUNT_KEY_TPL % thread_id
+        cache.cache.add(key, 0, const.LONG_TIME)
+        try:
+            count = cache.cache.incr(key, increment)
+        except ValueError:
+            #key was evicted between the two calls
+            cache.cache.set(key, increment, const.LONG_TIME)
+            count = increment
+
+        if count == increment:
+            self._add_view_count_slot(thread_id)
+
+    def _add_view_count_slot(self, thread_id):
+        """marks thread as having buffered views"""
+        cache.cache.add(self.VIEW_COUNT_SEQUENCE_KEY, 0, const.LONG_TIME)
+        try:
+            slot = cache.cache.incr(self.VIEW_COUNT_SEQUENCE_KEY)
+        except ValueError:
+            #key was evicted between the two calls, the flush
+            #notices that the sequence has started over
+            cache.cache.set(self.VIEW_COUNT_SEQUENCE_KEY, 1, const.LONG_TIME)
+            slot = 1
+        cache.cache.set(
+            self.VIEW_COUNT_SLOT_KEY_TPL % slot,
+            thread_id,
+            const.LONG_TIME
+        )
+
+    def flush_buffered_view_counts(self, batch_size = 100):
+        """writes view counts accumulated by :meth:`buffer_view_count`
+        to the database, with one ``UPDATE`` per distinct increment
+        within each batch of threads, then regenerates the
+        summary html of the updated threads and awards
+        the badges for the question views against the new totals
+
+        returns number of the threads that were updated
+        """
+        last_slot = cache.cache.get(self.VIEW_COUNT_SEQUENCE_KEY, 0)
+        flushed_slot = cache.cache.get(self.VIEW_COUNT_FLUSHED_KEY, 0)
+        if flushed_slot > last_slot:
+            #the sequence counter was evicted and started over
+            flushed_slot = 0
+
+        updated_count = 0
+        while flushed_slot < last_slot:
+            batch_end = min(flushed_slot + batch_size, last_slot)
+            slot_keys = [
+                self.VIEW_COUNT_SLOT_KEY_TPL % slot
+                for slot in range(flushed_slot + 1, batch_end + 1)
+            ]
+            thread_ids = set(cache.cache.get_many(slot_keys).values())
+            updated_count += self._flush_view_count_batch(thread_ids)
+            cache.cache.delete_many(slot_keys)
+            cache.cache.set(
+                self.VIEW_COUNT_FLUSHED_KEY, batch_end, const.LONG_TIME
+            )
+            flushed_slot = batch_end
+
+        return updated_count
+
+    def _flush_view_count_batch(self, thread_ids):
+        """moves buffered view counts of the given threads
+        to the database"""
+        increments = dict()
+        for thread_id in thread_ids:
+            key = self.VIEW_COUNT_KEY_TPL % thread_id
+            count = cache.cache.get(key, 0)
+            if count <= 0:
+                continue
+            try:
+                remaining = cache.cache.decr(key, count)
+            except ValueError:
+                #evicted, the views counted after the get are lost
+                remaining = 0
+            if remaining > 0:
+                #new views came in since the get, they will be
+                #picked up by the next flush
+                self._add_view_count_slot(thread_id)
+            increments.setdefault(count, list()).append(thread_id)
+
+        if len(increments) == 0:
+            return 0
+
+        updated_ids = list()
+        for increment, ids in increments.items():
+            self.filter(id__in = ids).update(
+                view_count = models.F('view_count') + increment
+            )
+            updated_ids.extend(ids)
+
+        from askbot.models.badges import award_badges_signal
+        questions = Post.objects.filter(
+                                post_type = 'question',
+                                thread__id__in = updated_ids
+                            ).select_related('thread', 'author')
+        for question in questions:
+            thread = question.thread
+            thread.update_summary_html()
+            award_badges_signal.send(None,
+                            event = 'view_question',
+                            actor = question.author,
+                            context_object = question
+                        )
+        return len(updated_ids)
+
     def create(self, *args, **kwargs):
         raise NotImplementedError
 
@@ -169,6 +342,11 @@ class ThreadManager(BaseQuerySetManager):
             from askbot.search import postgresql
             return postgresql.run_full_text_search(qs, search_query)
         else:
+            from askbot.models import search_index
+            if search_index.search_index_enabled():
+                return search_index.SearchToken.objects.filter_threads(
+                                                            qs, search_query
+                                                        )
             return qs.filter(
                 models.Q(title__icontains=search_query) |
                 models.Q(tagnames__icontains=search_query) |
@@ -388,6 +566,56 @@ class ThreadManager(BaseQuerySetManager):
             thread._last_activity_by_cache = user_map[thread.last_activity_by_id]
 
 
+    def precache_summary_html(self, threads, visitor = None):
+        """loads summary html snippets of all the ``threads``
+        with one ``get_many`` call to the cache, renders the snippets
+        missing in the cache and saves them with one ``set_many`` call.
+
+        The snippets are stored on the thread objects, so that
+        :meth:`Thread.get_summary_html` does not go to the cache again.
+        Question posts of the threads are expected to be precached
+        with :meth:`precache_view_data_hack`.
+        """
+        if len(threads) == 0:
+            return
+
+        if askbot_settings.GROUPS_ENABLED:
+            self.precache_cache_generations(threads)
+
+        keys = dict()
+        for thread in threads:
+            keys[thread.id] = thread.get_summary_cache_key(visitor)
+
+        cached = cache.cache.get_many(keys.values())
+
+        rendered = dict()
+        for thread in threads:
+            key = keys[thread.id]
+            html = cached.get(key)
+            if not html:
+                html = thread.render_summary_html(
+                            visitor,
+                            question = getattr(thread, '_question_cache', None)
+                        )
+                rendered[key] = html
+            thread._summary_html_cache = html
+
+        if rendered:
+            cache.cache.set_many(rendered, timeout = const.LONG_TIME)
+
+    def precache_cache_generations(self, threads):
+        """loads cache generations of the ``threads``
+        with one ``get_many`` call, see :meth:`Thread.get_cache_generation`
+        """
+        keys = dict()
+        for thread in threads:
+            keys[thread.id] = Thread.CACHE_GENERATION_KEY_TPL % thread.id
+        generations = cache.cache.get_many(keys.values())
+        for thread in threads:
+            generation = generations.get(keys[thread.id])
+            if generation is not None:
+                thread._cache_generation = generation
+
     #todo: this function is similar to get_response_receivers - profile this function against the other one
     def get_thread_contributors(self, thread_list):
         """Returns query set of Thread contributors"""
@@ -421,6 +649,9 @@ class ThreadManager(BaseQuerySetManager):
 
 class Thread(models.Model):
     SUMMARY_CACHE_KEY_TPL = 'thread-question-summary-%d'
+    GROUP_SUMMARY_CACHE_KEY_TPL = 'thread-question-summary-%d-%s-%s'
+    SIMILAR_THREADS_CACHE_KEY_TPL = 'similar-threads-%s'
+    CACHE_GENERATION_KEY_TPL = 'thread-cache-generation-%d'
     ANSWER_LIST_KEY_TPL = 'thread-answer-list-%d'
 
     title = models.CharField(max_length=300)
@@ -478,14 +709,24 @@ class Thread(models.Model):
         #question_id = self._question_post().id
         #return reverse('question', args = [question_id]) + slugify(self.title)
 
-    def get_answer_count(self, user = None):
+    def get_answer_count(self, user = None, count_own_deleted = True):
         """returns answer count depending on who the user is.
         When user groups are enabled and some answers are hidden,
-        the answer count to show must be reflected accordingly"""
+        the answer count to show must be reflected accordingly
+
+        with ``count_own_deleted=False`` deleted answers
+        that a regular user sees because they wrote or deleted them
+        are not counted, so that the count is the same
+        for all users of the same groups
+        """
         if askbot_settings.GROUPS_ENABLED == False or user is None:
             return self.answer_count
         else:
-            return self.get_answers(user).count()
+            answers = self.get_answers(user)
+            if count_own_deleted == False and user.is_authenticated() \
+                and not (user.is_administrator() or user.is_moderator()):
+                answers = answers.filter(deleted = False)
+            return answers.count()
 
     def update_favorite_count(self):
         self.favourite_count = FavoriteQuestion.objects.filter(thread=self).count()
@@ -500,6 +741,8 @@ class Thread(models.Model):
         qset.update(view_count=models.F('view_count') + increment)
         self.view_count = qset.values('view_count')[0]['view_count'] # get the new view_count back because other pieces of code relies on such behaviour
         ####################################################################
+        #only the anonymous variant is refreshed, the view count
+        #alone does not invalidate summaries of the groups
         self.update_summary_html() # regenerate question/thread summary html
         ####################################################################
 
@@ -523,7 +766,7 @@ class Thread(models.Model):
         self.last_activity_by = last_activity_by
         self.save()
         ####################################################################
-        self.update_summary_html() # regenerate question/thread summary html
+        self.invalidate_summary_html() # regenerate question/thread summary html
         ####################################################################
 
     def get_tag_names(self):
@@ -586,10 +829,68 @@ class Thread(models.Model):
                             | models.Q(deleted_by = user)
                         )
 
+    def get_cache_generation(self):
+        """returns token that is a part of the cache keys
+        of the group-dependent data of the thread, when
+        groups are enabled - replacing the token invalidates
+        cached data for all group variants at once
+
+        the token is random, so that the keys are not reused
+        if the token is evicted from the cache
+        """
+        generation = getattr(self, '_cache_generation', None)
+        if generation is None:
+            key = self.CACHE_GENERATION_KEY_TPL % self.id
+            generation = cache.cache.get(key)
+            if generation is None:
+                cache.cache.add(key, uuid.uuid4().hex[:8], const.LONG_TIME)
+                generation = cache.cache.get(key)
+            self._cache_generation = generation
+        return generation
+
+    def invalidate_cache_generation(self):
+        """invalidates all group variants of the cached data"""
+        generation = uuid.uuid4().hex[:8]
+        cache.cache.set(
+            self.CACHE_GENERATION_KEY_TPL % self.id,
+            generation,
+            const.LONG_TIME
+        )
+        self._cache_generation = generation
+
+    def get_summary_cache_key(self, visitor = None):
+        """returns cache key for the summary html,
+        when groups are enabled, the key depends on the
+        groups visible to the visitor, and on whether
+        the visitor can see deleted answers of others,
+        own deleted answers are not counted in the summary"""
+        if askbot_settings.GROUPS_ENABLED == False:
+            return self.SUMMARY_CACHE_KEY_TPL % self.id
+
+        if visitor is None:
+            variant = 'default'
+        else:
+            variant = get_group_set_key(visitor)
+            if visitor.is_authenticated() and \
+                (visitor.is_administrator() or visitor.is_moderator()):
+                variant += '-m'
+        return self.GROUP_SUMMARY_CACHE_KEY_TPL % (
+                                self.id, self.get_cache_generation(), variant
+                            )
+
     def invalidate_cached_thread_content_fragment(self):
         cache.cache.delete(self.SUMMARY_CACHE_KEY_TPL % self.id)
+        if askbot_settings.GROUPS_ENABLED:
+            self.invalidate_cache_generation()
 
-    def get_post_data_cache_key(self, sort_method = None):
+    def get_post_data_cache_key(self, sort_method = None, user = None):
+        if askbot_settings.GROUPS_ENABLED:
+            return 'thread-data-%s-%s-%s-%s' % (
+                                self.id,
+                                self.get_cache_generation(),
+                                get_group_set_key(user),
+                                sort_method
+                            )
         return 'thread-data-%s-%s' % (self.id, sort_method)
 
     def invalidate_cached_post_data(self):
@@ -598,7 +899,9 @@ class Thread(models.Model):
         deleting, editing content"""
         #we can call delete_many() here if using Django > 1.2
         for sort_method in const.ANSWER_SORT_METHODS:
-            cache.cache.delete(self.get_post_data_cache_key(sort_method))
+            cache.cache.delete('thread-data-%s-%s' % (self.id, sort_method))
+        if askbot_settings.GROUPS_ENABLED:
+            self.invalidate_cache_generation()
 
     def invalidate_cached_data(self):
         self.invalidate_cached_post_data()
@@ -608,13 +911,10 @@ class Thread(models.Model):
     def get_cached_post_data(self, user = None, sort_method = 'votes'):
         """returns cached post data, as calculated by
         the method get_post_data()"""
-        if askbot_settings.GROUPS_ENABLED:
-            #temporary plug: bypass cache where groups are enabled
-            return self.get_post_data(sort_method = sort_method, user = user)
-        key = self.get_post_data_cache_key(sort_method)
+        key = self.get_post_data_cache_key(sort_method, user)
         post_data = cache.cache.get(key)
         if not post_data:
-            post_data = self.get_post_data(sort_method)
+            post_data = self.get_post_data(sort_method, user)
             cache.cache.set(key, post_data, const.LONG_TIME)
         return post_data
 
@@ -710,7 +1010,28 @@ class Thread(models.Model):
         some sort of optimization
         """
 
+        def get_indexed_data():
+            """reads the precomputed neighbours
+            together with their questions in one query"""
+            questions = Post.objects.get_questions().filter(
+                                    deleted = False,
+                                    thread__similar_to__thread = self
+                                ).select_related(
+                                    'thread'
+                                ).order_by(
+                                    '-thread__similar_to__score'
+                                )[:SIMILAR_THREADS_NUMBER]
+            return [
+                {
+                    'url': question.get_absolute_url(thread = question.thread),
+                    'title': question.thread.get_title(question)
+                } for question in questions
+            ]
+
         def get_data():
+            if thread_similarity_enabled():
+                return get_indexed_data()
+
             tags_list = self.get_tag_names()
             similar_threads = Thread.objects.filter(
                                         tags__name__in=tags_list
@@ -748,7 +1069,7 @@ class Thread(models.Model):
             """similar thread data will expire
             with the default expiration delay
             """
-            key = 'similar-threads-%s' % self.id
+            key = self.SIMILAR_THREADS_CACHE_KEY_TPL % self.id
             data = cache.cache.get(key)
             if data is None:
                 data = get_data()
@@ -880,7 +1201,7 @@ class Thread(models.Model):
             user.message_set.create(message = msg)
 
         ####################################################################
-        self.update_summary_html() # regenerate question/thread summary html
+        self.invalidate_summary_html() # regenerate question/thread summary html
         ####################################################################
 
         #if there are any modified tags, update their use counts
@@ -965,55 +1286,52 @@ class Thread(models.Model):
         return last_updated_at, last_updated_by
 
     def get_summary_html(self, search_state, visitor = None):
-        html = self.get_cached_summary_html(visitor)
+        html = getattr(self, '_summary_html_cache', None)
+        if html is None:
+            html = self.get_cached_summary_html(visitor)
         if not html:
             html = self.update_summary_html(visitor)
-
-        # todo: this work may be pushed onto javascript we post-process tag names
-        # in the snippet so that tag urls match the search state
-        # use `<<<` and `>>>` because they cannot be confused with user input
-        # - if user accidentialy types <<<tag-name>>> into question title or body,
-        # then in html it'll become escaped like this: &lt;&lt;&lt;tag-name&gt;&gt;&gt;
-        regex = re.compile(
-            r'<<<(%s)>>>' % const.TAG_REGEX_BARE,
-            re.UNICODE
-        )
-
-        while True:
-            match = regex.search(html)
-            if not match:
-                break
-            seq = match.group(0)  # e.g "<<<my-tag>>>"
-            tag = match.group(1)  # e.g "my-tag"
-            full_url = search_state.add_tag(tag).full_url()
-            html = html.replace(seq, full_url)
-
-        return html
+        return fill_summary_tag_urls(html, search_state)
 
     def get_cached_summary_html(self, visitor = None):
-        #todo: remove this plug by adding cached foreign user group
-        #parameter to the key. Now with groups on caching is turned off
         #parameter visitor is there to get summary out by the user groups
-        if askbot_settings.GROUPS_ENABLED:
-            return None
-        return cache.cache.get(self.SUMMARY_CACHE_KEY_TPL % self.id)
+        return cache.cache.get(self.get_summary_cache_key(visitor))
 
-    def update_summary_html(self, visitor = None):
+    def render_summary_html(self, visitor = None, question = None):
+        """renders the summary snippet without touching the cache,
+        ``question`` must be the question post of the thread,
+        if not given, it will be fetched from the database
+        """
+        if question is None:
+            #fetch new question post to make sure we're up-to-date
+            question = self._question_post(refresh=True)
         context = {
             'thread': self,
-            #fetch new question post to make sure we're up-to-date
-            'question': self._question_post(refresh=True),
+            'question': question,
             'search_state': DummySearchState(),
             'visitor': visitor
         }
-        html = get_template('widgets/question_summary.html').render(context)
+        return get_template('widgets/question_summary.html').render(context)
+
+    def invalidate_summary_html(self):
+        """regenerates the summary when the thread content has changed,
+        variants of the summary for all groups are invalidated"""
+        if askbot_settings.GROUPS_ENABLED:
+            self.invalidate_cache_generation()
+        return self.update_summary_html()
+
+    def update_summary_html(self, visitor = None):
+        """renders and caches the summary variant
+        for the visitor, the anonymous one by default,
+        other variants are not touched"""
+        html = self.render_summary_html(visitor)
         # INFO: Timeout is set to 30 days:
         # * timeout=0/None is not a reliable cross-backend way to set infinite timeout
         # * We probably don't need to pollute the cache with threads older than 30 days
         # * Additionally, Memcached treats timeouts > 30day as dates (https://code.djangoproject.com/browser/django/tags/releases/1.3/django/core/cache/backends/memcached.py#L36),
         #   which probably doesn't break anything but if we can stick to 30 days then let's stick to it
         cache.cache.set(
-            self.SUMMARY_CACHE_KEY_TPL % self.id,
+            self.get_summary_cache_key(visitor),
             html,
             timeout=const.LONG_TIME
         )
@@ -1022,6 +1340,186 @@ class Thread(models.Model):
     def summary_html_cached(self):
         return cache.cache.has_key(self.SUMMARY_CACHE_KEY_TPL % self.id)
 
+SIMILAR_THREADS_NUMBER = 10
+#at most this many most recent threads are considered per shared tag
+SIMILARITY_CANDIDATES_PER_TAG = 500
+THREAD_COUNT_CACHE_KEY = 'askbot-thread-count'
+THREAD_COUNT_TIMEOUT = 3600
+
+def thread_similarity_enabled():
+    return getattr(settings, 'ASKBOT_USE_THREAD_SIMILARITY_INDEX', False)
+
+
+class ThreadSimilarityManager(BaseQuerySetManager):
+
+    def get_tag_weights(self, thread):
+        """returns dictionary of the thread's tag ids to their weights,
+        rare tags weigh more than the frequently used ones
+        (inverse document frequency over ``Tag.used_count``)
+        """
+        thread_count = cache.cache.get(THREAD_COUNT_CACHE_KEY)
+        if thread_count is None:
+            #the weights do not need the exact count
+            thread_count = Thread.objects.count()
+            cache.cache.set(
+                THREAD_COUNT_CACHE_KEY, thread_count, THREAD_COUNT_TIMEOUT
+            )
+        thread_count = float(max(thread_count, 1))
+        weights = dict()
+        for tag_id, used_count in thread.tags.values_list('id', 'used_count'):
+            weights[tag_id] = math.log(1 + thread_count / max(used_count, 1))
+        return weights
+
+    def get_thread_scores(self, thread):
+        """returns dictionary of ids of the threads which share
+        tags with the given thread to the similarity scores -
+        sums of weights of the shared tags
+
+        candidates are the ``SIMILARITY_CANDIDATES_PER_TAG``
+        most recent threads of each tag, so that popular
+        tags do not load most of the thread-tag table
+        """
+        weights = self.get_tag_weights(thread)
+        scores = defaultdict(float)
+        for tag_id, weight in weights.items():
+            thread_ids = Thread.tags.through.objects.filter(
+                                    tag = tag_id
+                                ).exclude(
+                                    thread = thread
+                                ).order_by(
+                                    '-thread'
+                                ).values_list(
+                                    'thread', flat = True
+                                )[:SIMILARITY_CANDIDATES_PER_TAG]
+            for thread_id in thread_ids:
+                scores[thread_id] += weight
+        return scores
+
+    def trim_records(self, thread_id):
+        """deletes records of the thread beyond
+        the top ``SIMILAR_THREADS_NUMBER`` by score"""
+        extra_ids = list(
+            self.filter(
+                thread = thread_id
+            ).order_by(
+                '-score'
+            ).values_list(
+                'id', flat = True
+            )[SIMILAR_THREADS_NUMBER:]
+        )
+        if extra_ids:
+            self.filter(id__in = extra_ids).delete()
+
+    def update_thread(self, thread):
+        """recalculates the neighbours of the thread and
+        updates the records of the threads, which have this
+        thread among their neighbours
+        """
+        scores = self.get_thread_scores(thread)
+        top_scores = heapq.nlargest(
+                            SIMILAR_THREADS_NUMBER,
+                            scores.iteritems(),
+                            key = operator.itemgetter(1)
+                        )
+
+        self.filter(thread = thread).delete()
+        for similar_thread_id, score in top_scores:
+            self.create(
+                thread = thread,
+                similar_thread_id = similar_thread_id,
+                score = score
+            )
+
+        #records of the other threads pointing to this one
+        #(the score is symmetric)
+        reverse_records = dict(
+            self.filter(
+                similar_thread = thread
+            ).values_list('thread', 'id')
+        )
+        missing_ids = set(reverse_records.keys()) - set(scores.keys())
+        if missing_ids:
+            #threads beyond the candidate limit may still share tags,
+            #their records are kept with the old score
+            sharing_ids = set(
+                Thread.tags.through.objects.filter(
+                    thread__in = missing_ids,
+                    tag__in = thread.tags.all()
+                ).values_list('thread', flat = True)
+            )
+        else:
+            sharing_ids = set()
+        for other_thread_id, record_id in reverse_records.items():
+            if other_thread_id in scores:
+                self.filter(id = record_id).update(
+                                        score = scores[other_thread_id]
+                                    )
+            elif other_thread_id not in sharing_ids:
+                self.filter(id = record_id).delete()
+
+        for other_thread_id, score in top_scores:
+            if other_thread_id not in reverse_records:
+                self.create(
+                    thread_id = other_thread_id,
+                    similar_thread = thread,
+                    score = score
+                )
+                #the neighbour keeps only its best records
+                self.trim_records(other_thread_id)
+
+        affected_thread_ids = set(reverse_records.keys())
+        affected_thread_ids.update([item[0] for item in top_scores])
+        affected_thread_ids.add(thread.id)
+        cache.cache.delete_many([
+            Thread.SIMILAR_THREADS_CACHE_KEY_TPL % thread_id
+            for thread_id in affected_thread_ids
+        ])
+
+    def rebuild(self, threads = None):
+        """recalculates similarity records for the ``threads``,
+        which is a query set or a list, or all threads if not given
+        """
+        if threads is None:
+            threads = Thread.objects.all()
+        for thread in threads:
+            self.update_thread(thread)
+
+
+class ThreadSimilarity(models.Model):
+    """a precomputed neighbour of the thread,
+    the score is the sum of weights of the shared tags"""
+    thread = models.ForeignKey(Thread, related_name = 'similarity_records')
+    similar_thread = models.ForeignKey(Thread, related_name = 'similar_to')
+    score = models.FloatField(default = 0)
+
+    objects = ThreadSimilarityManager()
+
+    class Meta:
+        app_label = 'askbot'
+        unique_together = ('thread', 'similar_thread')
+
+
+def update_thread_similarity(thread, **kwargs):
+    """called on signal ``tags_updated``,
+    the records are recalculated by a celery task"""
+    if thread_similarity_enabled():
+        from askbot import tasks#avoid circular import
+        tasks.update_thread_similarity_celery_task.delay(thread.id)
+
+def invalidate_similar_threads_on_post_delete(instance, **kwargs):
+    """called on signal ``delete_question_or_answer``,
+    the deleted question disappears from the cached lists
+    of similar threads of its neighbours"""
+    if thread_similarity_enabled() and instance.is_question():
+        thread_ids = ThreadSimilarity.objects.filter(
+                                    similar_thread = instance.thread_id
+                                ).values_list('thread', flat = True)
+        cache.cache.delete_many([
+            Thread.SIMILAR_THREADS_CACHE_KEY_TPL % thread_id
+            for thread_id in thread_ids
+        ])
+
+
 class QuestionView(models.Model):
     question = models.ForeignKey(Post, related_name='viewed')
     who = models.ForeignKey(User, related_name='question_views')
@@ -0,0 +1,168 @@
+"""Recomputation of the denormalized counters:
+
+* ``Thread.answer_count``
+* ``Thread.favourite_count``
+* ``Tag.used_count``
+* ``Post.comment_count``
+* ``User.new_response_count`` and ``User.seen_response_count``
+
+Each counter is recounted with one aggregate query
+and only the rows where the stored value differs are written,
+with one update per distinct new value.
+The ``recount_*`` functions take an optional list of ids
+to limit the recount and return the number of corrected rows.
+
+Counters are recounted by the management command
+``recount_denormalized``.
+"""
+from collections import defaultdict
+from django.contrib.auth.models import User
+from django.db.models import Count
+from django.utils.datastructures import SortedDict
+from askbot import const
+from askbot.models.post import Post
+from askbot.models.question import Thread, FavoriteQuestion
+from askbot.models.tag import Tag
+from askbot.models.user import ActivityAuditStatus
+
+UPDATE_CHUNK_SIZE = 500
+
+def get_counts(query_set, group_field):
+    """returns dictionary of item counts in the ``query_set``
+    grouped by value of the ``group_field``"""
+    rows = query_set.values_list(group_field).annotate(
+                                                Count('id')
+                                            ).order_by()
+    return dict(rows)
+
+def write_changed_counts(query_set, field_name, counts):
+    """writes values from ``counts`` - a dictionary by the object id -
+    into the ``field_name`` of objects in the ``query_set``
+    whose value is different, objects missing in ``counts``
+    get 0, returns number of changed objects"""
+    ids_by_value = defaultdict(list)
+    for object_id, value in query_set.values_list('id', field_name):
+        new_value = counts.get(object_id, 0)
+        if value != new_value:
+            ids_by_value[new_value].append(object_id)
+
+    model = query_set.model
+    changed_count = 0
+    for value, object_ids in ids_by_value.items():
+        for start in range(0, len(object_ids), UPDATE_CHUNK_SIZE):
+            chunk = object_ids[start:start + UPDATE_CHUNK_SIZE]
+            model.objects.filter(id__in = chunk).update(**{field_name: value})
+        changed_count += len(object_ids)
+    return changed_count
+
+def filter_ids(query_set, ids, field_name = 'id'):
+    if ids is None:
+        return query_set
+    return query_set.filter(**{field_name + '__in': ids})
+
+def get_answer_counts(thread_ids = None):
+    #same as Thread.get_answers() for the anonymous user
+    answers = Post.objects.get_answers().filter(deleted = False)
+    return get_counts(filter_ids(answers, thread_ids, 'thread'), 'thread')
+
+def recount_answer_counts(thread_ids = None):
+    return write_changed_counts(
+                    filter_ids(Thread.objects.all(), thread_ids),
+                    'answer_count',
+                    get_answer_counts(thread_ids)
+                )
+
+def get_favourite_counts(thread_ids = None):
+    favorites = filter_ids(FavoriteQuestion.objects.all(), thread_ids, 'thread')
+    return get_counts(favorites, 'thread')
+
+def recount_favourite_counts(thread_ids = None):
+    return write_changed_counts(
+                    filter_ids(Thread.objects.all(), thread_ids),
+                    'favourite_count',
+                    get_favourite_counts(thread_ids)
+                )
+
+def get_tag_used_counts(tag_ids = None):
+    thread_tags = filter_ids(Thread.tags.through.objects.all(), tag_ids, 'tag')
+    return get_counts(thread_tags, 'tag')
+
+def recount_tag_used_counts(tag_ids = None):
+    return write_changed_counts(
+                    filter_ids(Tag.objects.all(), tag_ids),
+                    'used_count',
+                    get_tag_used_counts(tag_ids)
+                )
+
+def get_comment_counts(post_ids = None):
+    comments = filter_ids(Post.objects.get_comments(), post_ids, 'parent')
+    return get_counts(comments, 'parent')
+
+def recount_comment_counts(post_ids = None):
+    return write_changed_counts(
+                    filter_ids(Post.objects.all(), post_ids),
+                    'comment_count',
+                    get_comment_counts(post_ids)
+                )
+
+def get_response_counts(user_ids = None):
+    """returns dictionary by status (``ActivityAuditStatus.STATUS_NEW``
+    and ``STATUS_SEEN``) of dictionaries of response counts by user id,
+    same as counted by ``User.update_response_counts()``
+    """
+    activity_types = const.RESPONSE_ACTIVITY_TYPES_FOR_DISPLAY
+    activity_types += (const.TYPE_ACTIVITY_MENTION,)
+    statuses = filter_ids(
+                    ActivityAuditStatus.objects.filter(
+                        activity__activity_type__in = activity_types
+                    ),
+                    user_ids,
+                    'user'
+                )
+    rows = statuses.values_list('user', 'status').annotate(
+                                                        Count('id')
+                                                    ).order_by()
+    counts = {
+        ActivityAuditStatus.STATUS_NEW: dict(),
+        ActivityAuditStatus.STATUS_SEEN: dict()
+    }
+    for user_id, status, count in rows:
+        if status in counts:
+            counts[status][user_id] = count
+    return counts
+
+def recount_response_counts(user_ids = None):
+    """recounts new and seen response counts,
+    returns number of corrected counts"""
+    counts = get_response_counts(user_ids)
+    users = filter_ids(User.objects.all(), user_ids)
+    changed_count = write_changed_counts(
+                    users,
+                    'new_response_count',
+                    counts[ActivityAuditStatus.STATUS_NEW]
+                )
+    changed_count += write_changed_counts(
+                    users,
+                    'seen_response_count',
+                    counts[ActivityAuditStatus.STATUS_SEEN]
+                )
+    return changed_count
+
+COUNTERS = SortedDict((
+    ('answer_count', recount_answer_counts),
+    ('favourite_count', recount_favourite_counts),
+    ('used_count', recount_tag_used_counts),
+    ('comment_count', recount_comment_counts),
+    ('response_count', recount_response_counts),
+))
+
+def recount_all(counter_names = None):
+    """recounts the counters with names from the ``COUNTERS``,
+    all by default, returns dictionary of the numbers of
+    corrected rows by the counter name"""
+    if counter_names is None:
+        counter_names = COUNTERS.keys()
+    results = SortedDict()
+    for name in counter_names:
+        results[name] = COUNTERS[name]()
+    return results
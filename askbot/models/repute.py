@@ -157,33 +157,47 @@ class Award(models.Model):
         app_label = 'askbot'
         db_table = u'award'
 
+#reputation types which count towards the daily limit
+#of the reputation gained from the upvotes
+UPVOTE_REPUTATION_TYPES = (1, -8)
+
 class ReputeManager(models.Manager):
     def get_reputation_by_upvoted_today(self, user):
         """
         For one user in one day, he can only earn rep till certain score (ep. +200)
         by upvoted(also subtracted from upvoted canceled). This is because we need
         to prohibit gaming system by upvoting/cancel again and again.
+
+        the value is read from the daily ledger,
+        see :class:`DailyUpvoteReputation`
         """
         if user is None:
             return 0
         else:
-            today = datetime.date.today()
-            tomorrow = today + datetime.timedelta(1)
-            rep_types = (1,-8)
-            sums = self.filter(models.Q(reputation_type__in=rep_types),
-                                user=user, 
-                                reputed_at__range=(today, tomorrow),
-                      ).aggregate(models.Sum('positive'), models.Sum('negative'))            
-            if sums:
-                pos = sums['positive__sum']
-                neg = sums['negative__sum']
-                if pos is None:
-                    pos = 0
-                if neg is None:
-                    neg = 0
-                return pos + neg
-            else:
-                return 0
+            return DailyUpvoteReputation.objects.get_reputation(user)
+
+    def get_reputation_by_upvoted_on(self, day, user = None):
+        """returns dictionary with the reputation gained
+        from upvotes on the ``day`` by user id,
+        summed over the reputation history,
+        only of the ``user`` if given"""
+        tomorrow = day + datetime.timedelta(1)
+        reputes = self.filter(
+                        reputation_type__in = UPVOTE_REPUTATION_TYPES,
+                        reputed_at__range = (day, tomorrow)
+                    )
+        if user is not None:
+            reputes = reputes.filter(user = user)
+        sums = reputes.values('user').annotate(
+                        models.Sum('positive'), models.Sum('negative')
+                    ).order_by()
+        reputation = dict()
+        for row in sums:
+            pos = row['positive__sum'] or 0
+            neg = row['negative__sum'] or 0
+            reputation[row['user']] = pos + neg
+        return reputation
+
 
 class Repute(models.Model):
     """The reputation histories for user"""
@@ -247,3 +261,92 @@ class Repute(models.Model):
                                'link_title': escape(link_title)
                             }
 
+
+
+def get_upvote_reputation_from_history(user, day):
+    """returns reputation gained by the user from
+    the upvotes on the ``day``, summed over the :class:`Repute` records"""
+    reputation = Repute.objects.get_reputation_by_upvoted_on(day, user = user)
+    return reputation.get(user.id, 0)
+
+
+class DailyUpvoteReputationManager(models.Manager):
+
+    def get_reputation(self, user, day = None):
+        """returns reputation gained by the user
+        from the upvotes on the ``day``, today by default,
+        summed over the reputation history if there is no
+        ledger record yet - e.g. on the day the ledger was deployed"""
+        day = day or datetime.date.today()
+        values = self.filter(user = user, day = day).values_list(
+                                                    'reputation', flat = True
+                                                )
+        if len(values) == 0:
+            return get_upvote_reputation_from_history(user, day)
+        return values[0]
+
+    def add_reputation(self, user, points, day = None):
+        """adds ``points`` to the reputation of the user
+        for the ``day``, the increment is done by the database,
+        so that concurrent votes do not overwrite each other
+
+        the first record of the day starts from the reputation
+        history, which must already include the ``points``
+        """
+        day = day or datetime.date.today()
+        updated = self.filter(user = user, day = day).update(
+                            reputation = models.F('reputation') + points
+                        )
+        if updated == 0:
+            self.get_or_create(
+                user = user,
+                day = day,
+                defaults = {
+                    'reputation': get_upvote_reputation_from_history(user, day)
+                }
+            )
+
+    def reconcile(self, day):
+        """rewrites the ledger for the ``day``
+        from the reputation history, returns number of users
+        whose ledger records were changed"""
+        reputation = Repute.objects.get_reputation_by_upvoted_on(day)
+        records = dict(
+            self.filter(day = day).values_list('user', 'reputation')
+        )
+        changed = 0
+        for user_id, value in records.items():
+            if user_id not in reputation:
+                self.filter(user = user_id, day = day).delete()
+                changed += 1
+        for user_id, value in reputation.items():
+            if user_id not in records:
+                self.create(user_id = user_id, day = day, reputation = value)
+                changed += 1
+            elif records[user_id] != value:
+                self.filter(user = user_id, day = day).update(
+                                                    reputation = value
+                                                )
+                changed += 1
+        return changed
+
+
+class DailyUpvoteReputation(models.Model):
+    """reputation gained by the user from the upvotes
+    (less the canceled upvotes) per day - a ledger,
+    that allows to check the daily limit
+    ``MAX_REP_GAIN_PER_USER_PER_DAY`` without summing
+    the :class:`Repute` records on each vote.
+
+    Can be rebuilt with the management command
+    ``reconcile_daily_reputation``
+    """
+    user = models.ForeignKey(User)
+    day = models.DateField()
+    reputation = models.IntegerField(default = 0)
+
+    objects = DailyUpvoteReputationManager()
+
+    class Meta:
+        app_label = 'askbot'
+        unique_together = ('user', 'day')
@@ -0,0 +1,124 @@
+"""Inverted index of words in the threads, used by the
+text search on the databases without the full text search
+(all but postgresql and mysql with full text search enabled)
+
+The index is used when setting ``ASKBOT_USE_SEARCH_INDEX``
+is ``True``, it is updated when posts are saved, retagged, deleted or restored,
+and can be rebuilt with the management command ``rebuild_search_index``
+"""
+import re
+from django.conf import settings as django_settings
+from django.db import models
+from askbot.models.base import BaseQuerySetManager
+from askbot.models.question import Thread
+
+MAX_TOKEN_LENGTH = 64
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def search_index_enabled():
+    return getattr(django_settings, 'ASKBOT_USE_SEARCH_INDEX', False)
+
+def tokenize(text):
+    """returns set of lowercased words in the text,
+    words longer than ``MAX_TOKEN_LENGTH`` are truncated
+    """
+    if not text:
+        return set()
+    return set([
+        token[:MAX_TOKEN_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+    ])
+
+
+class SearchTokenManager(BaseQuerySetManager):
+
+    def get_thread_tokens(self, thread):
+        """returns set of tokens for the thread title, tags and
+        the texts of all not deleted posts in the thread"""
+        tokens = tokenize(thread.title)
+        tokens.update(tokenize(thread.tagnames))
+        texts = thread.posts.filter(deleted = False).values_list(
+                                                        'text', flat = True
+                                                    )
+        for text in texts:
+            tokens.update(tokenize(text))
+        return tokens
+
+    def index_thread(self, thread):
+        """brings index entries of the thread up to date,
+        only the difference with the stored tokens is written
+        """
+        new_tokens = self.get_thread_tokens(thread)
+        old_tokens = set(
+            self.filter(thread = thread).values_list('token', flat = True)
+        )
+        removed_tokens = old_tokens - new_tokens
+        if removed_tokens:
+            self.filter(
+                thread = thread, token__in = list(removed_tokens)
+            ).delete()
+        for token in new_tokens - old_tokens:
+            self.create(thread = thread, token = token)
+
+    def rebuild(self, threads = None):
+        """reindexes all the ``threads``, which is a query set
+        or a list of threads, or all threads if not given"""
+        if threads is None:
+            threads = Thread.objects.all()
+        for thread in threads:
+            self.index_thread(thread)
+
+    def filter_threads(self, qs, search_query):
+        """narrows down the thread query set ``qs`` to the threads
+        that contain words starting with each of the words in the
+        ``search_query``
+
+        the filters are subqueries against the index,
+        so the thread ids are not loaded into the memory
+        """
+        tokens = tokenize(search_query)
+        if len(tokens) == 0:
+            return qs
+        for token in tokens:
+            thread_ids = self.filter(
+                                token__startswith = token
+                            ).values('thread_id')
+            qs = qs.filter(id__in = thread_ids)
+        return qs
+
+
+class SearchToken(models.Model):
+    """a posting in the inverted index -
+    word ``token`` occurs in the ``thread``
+    """
+    token = models.CharField(max_length = MAX_TOKEN_LENGTH, db_index = True)
+    thread = models.ForeignKey(Thread, related_name = 'search_tokens')
+
+    objects = SearchTokenManager()
+
+    class Meta:
+        app_label = 'askbot'
+        unique_together = ('token', 'thread')
+
+
+def update_thread_search_index(thread):
+    """reindexes the thread when its posts change without
+    sending any of the signals below - on restoring of
+    the deleted posts and deleting of the comments"""
+    if search_index_enabled():
+        SearchToken.objects.index_thread(thread)
+
+def update_search_index_on_post_update(post, **kwargs):
+    """called on signal ``post_updated``"""
+    if search_index_enabled() and post.thread_id:
+        SearchToken.objects.index_thread(post.thread)
+
+def update_search_index_on_tags_update(thread, **kwargs):
+    """called on signal ``tags_updated``"""
+    if search_index_enabled():
+        SearchToken.objects.index_thread(thread)
+
+def update_search_index_on_post_delete(instance, **kwargs):
+    """called on signal ``delete_question_or_answer``"""
+    if search_index_enabled() and instance.thread_id:
+        SearchToken.objects.index_thread(instance.thread)
@@ -0,0 +1,131 @@
+"""Index of the tag selections of users, used to find
+subscribers of the instant email notifications
+about the new posts by the tags of the posts.
+
+The index maps names of the "interesting" and "ignored" tags
+to ids of the users who selected them and keeps wildcard tag
+selections in a prefix trie, so that users with the wildcards
+matching a tag are found in time proportional to the length
+of the tag name, instead of testing each user against each tag.
+
+The index is held in memory of each process and is
+reloaded when version token stored in the cache changes,
+the token is replaced when any user changes the tag selections.
+
+The index is used when setting ``ASKBOT_USE_TAG_SUBSCRIBER_INDEX``
+is ``True``.
+"""
+import threading
+import uuid
+from django.conf import settings as django_settings
+from django.contrib.auth.models import User
+from django.core import cache
+from askbot.models.tag import MarkedTag
+
+VERSION_CACHE_KEY = 'askbot-tag-subscriber-index-version'
+
+def subscriber_index_enabled():
+    return getattr(django_settings, 'ASKBOT_USE_TAG_SUBSCRIBER_INDEX', False)
+
+
+class PrefixTrie(object):
+    """a trie of prefixes, each node contains
+    ids of users whose wildcard ends at that node"""
+
+    def __init__(self):
+        self.root = dict()
+
+    def add(self, prefix, user_id):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, dict())
+        node.setdefault(None, set()).add(user_id)
+
+    def get_matching_ids(self, tag_name):
+        """returns set of ids of users whose wildcards
+        are prefixes of the ``tag_name``
+        """
+        user_ids = set()
+        node = self.root
+        for char in tag_name:
+            node = node.get(char)
+            if node is None:
+                break
+            user_ids.update(node.get(None, ()))
+        return user_ids
+
+
+class TagSubscriberIndex(object):
+    """tag names and wildcards selected by users
+    for the reasons 'good' and 'bad'
+    """
+    def __init__(self, version = None):
+        self.version = version
+        self.tags = {'good': dict(), 'bad': dict()}
+        self.wildcards = {'good': PrefixTrie(), 'bad': PrefixTrie()}
+
+    def load(self):
+        """loads selections of all users from the database"""
+        tag_selections = MarkedTag.objects.filter(
+                                    reason__in = ('good', 'bad')
+                                ).values_list('reason', 'tag__name', 'user')
+        for reason, tag_name, user_id in tag_selections:
+            self.tags[reason].setdefault(tag_name, set()).add(user_id)
+
+        wildcard_selections = User.objects.exclude(
+                                    interesting_tags = '', ignored_tags = ''
+                                ).values_list(
+                                    'id', 'interesting_tags', 'ignored_tags'
+                                )
+        for user_id, interesting_tags, ignored_tags in wildcard_selections:
+            for wildcard in interesting_tags.split():
+                self.wildcards['good'].add(wildcard[:-1], user_id)
+            for wildcard in ignored_tags.split():
+                self.wildcards['bad'].add(wildcard[:-1], user_id)
+
+    def get_user_ids(self, tag_names, reason, use_wildcards = True):
+        """returns set of ids of users who marked any of the
+        ``tag_names`` for the ``reason``, directly or via wildcards
+        """
+        user_ids = set()
+        tags = self.tags[reason]
+        wildcards = self.wildcards[reason]
+        for tag_name in tag_names:
+            user_ids.update(tags.get(tag_name, ()))
+            if use_wildcards:
+                user_ids.update(wildcards.get_matching_ids(tag_name))
+        return user_ids
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_index():
+    """returns the up to date index,
+    loads it if the version token has changed"""
+    global _INDEX
+    version = cache.cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex)
+        version = cache.cache.get(VERSION_CACHE_KEY)
+    index = _INDEX
+    #version is None when the cache does not keep values,
+    #then the index cannot be trusted and is always reloaded
+    if index is None or version is None or index.version != version:
+        _INDEX_LOCK.acquire()
+        try:
+            index = TagSubscriberIndex(version)
+            index.load()
+            _INDEX = index
+        finally:
+            _INDEX_LOCK.release()
+    return index
+
+def invalidate_index(**kwargs):
+    """must be called whenever tag selections of users change,
+    can be used as a signal handler"""
+    global _INDEX
+    if not subscriber_index_enabled():
+        return
+    _INDEX = None
+    cache.cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex)
@@ -109,17 +109,27 @@ class TagQuerySet(models.query.QuerySet):
 
     def update_use_counts(self, tags):
         """Updates the given Tags with their current use counts."""
+        from askbot.models import recount#avoid circular import
+        tag_ids = [tag.id for tag in tags]
+        counts = recount.get_tag_used_counts(tag_ids)
         for tag in tags:
-            tag.used_count = tag.threads.count()
-            tag.save()
+            tag.used_count = counts.get(tag.id, 0)
+        recount.write_changed_counts(
+                        self.filter(id__in = tag_ids),
+                        'used_count',
+                        counts
+                    )
 
     def mark_undeleted(self):
         """removes deleted(+at/by) marks"""
-        self.update(#undelete them
+        undeleted_count = self.filter(deleted = True).update(#undelete them
             deleted = False,
             deleted_by = None,
             deleted_at = None
         )
+        if undeleted_count:
+            from askbot.models import tag_index#avoid circular import
+            tag_index.invalidate_index()
 
     def tags_match_some_wildcard(self, wildcard_tags = None):
         """True if any one of the tags in the query set
@@ -225,7 +235,12 @@ class TagManager(BaseQuerySetManager):
         #deal with suggested tags
         if user.can_create_tags():
             #turn previously suggested tags into accepted
-            pre_suggested_tags.update(status = Tag.STATUS_ACCEPTED)
+            accepted_count = pre_suggested_tags.update(
+                                            status = Tag.STATUS_ACCEPTED
+                                        )
+            if accepted_count:
+                from askbot.models import tag_index#avoid circular import
+                tag_index.invalidate_index()
         else:
             #increment use count and add user to "suggested_by"
             for tag in pre_suggested_tags:
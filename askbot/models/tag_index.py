@@ -0,0 +1,123 @@
+"""In-memory index of the accepted tags, used by the tag autocomplete.
+
+Tag names are kept sorted, so that the tags starting with a prefix
+are found with a binary search, and the most used of them are returned.
+
+The index is held in memory of each process and is reloaded
+when the version token stored in the cache changes. The token
+is replaced when tags are added, deleted or accepted, and it expires
+after ``VERSION_TIMEOUT`` seconds, so that the use counts
+of the tags are refreshed periodically.
+
+The token and the time of its creation are also used as the
+ETag and Last-Modified headers of the full tag list.
+"""
+import bisect
+import datetime
+import heapq
+import sys
+import threading
+import uuid
+from django.core import cache
+from askbot.models.tag import Tag
+
+VERSION_CACHE_KEY = 'askbot-tag-index-version'
+VERSION_TIMEOUT = 3600
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+def get_version():
+    """returns tuple (version token, utc time of the version)"""
+    version = cache.cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.cache.add(
+            VERSION_CACHE_KEY,
+            (uuid.uuid4().hex, datetime.datetime.utcnow()),
+            VERSION_TIMEOUT
+        )
+        version = cache.cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def get_prefix_end(prefix):
+    """returns the prefix with the last character incremented -
+    the first string sorting after all names starting with the prefix,
+    or None if there is no such string"""
+    while prefix:
+        last_char = ord(prefix[-1])
+        if last_char < sys.maxunicode:
+            return prefix[:-1] + unichr(last_char + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+class TagIndex(object):
+    """sorted names and use counts of the accepted tags"""
+
+    def __init__(self, version = None):
+        self.version = version
+        self.names = list()
+        self.used_counts = list()
+
+    def load(self):
+        tags = Tag.objects.filter(
+                            deleted = False,
+                            status = Tag.STATUS_ACCEPTED
+                        ).values_list(
+                            'name', 'used_count'
+                        )
+        #sorted here, because the database collation
+        #may order the names differently from python
+        for name, used_count in sorted(tags):
+            self.names.append(name)
+            self.used_counts.append(used_count)
+
+    def get_tag_names(self, prefix = '', limit = DEFAULT_LIMIT):
+        """returns names of at most ``limit`` most used tags
+        starting with the ``prefix``, the most used first
+        """
+        start = bisect.bisect_left(self.names, prefix)
+        prefix_end = get_prefix_end(prefix)
+        if prefix_end is None:
+            end = len(self.names)
+        else:
+            end = bisect.bisect_left(self.names, prefix_end, start)
+        top = heapq.nlargest(
+                    limit,
+                    xrange(start, end),
+                    key = lambda position: self.used_counts[position]
+                )
+        return [self.names[position] for position in top]
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_index():
+    """returns the up to date index,
+    loads it if the version token has changed"""
+    global _INDEX
+    version = get_version()
+    index = _INDEX
+    #version is None when the cache does not keep values,
+    #then the index cannot be trusted and is always reloaded
+    if index is None or version is None or index.version != version:
+        _INDEX_LOCK.acquire()
+        try:
+            index = TagIndex(version)
+            index.load()
+            _INDEX = index
+        finally:
+            _INDEX_LOCK.release()
+    return index
+
+def invalidate_index(**kwargs):
+    """must be called when tags are added, deleted
+    or accepted, can be used as a signal handler"""
+    global _INDEX
+    _INDEX = None
+    cache.cache.set(
+        VERSION_CACHE_KEY,
+        (uuid.uuid4().hex, datetime.datetime.utcnow()),
+        VERSION_TIMEOUT
+    )
@@ -2,10 +2,12 @@ import datetime
 import logging
 import re
 from django.db import models
+from django.db import connection, transaction
 from django.db.backends.dummy.base import IntegrityError
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.contrib.auth.models import User
+from django.core import cache  # import cache, not from cache import cache, to be able to monkey-patch cache.cache in test cases
 from django.core import exceptions
 from django.forms import EmailField, URLField
 from django.utils.translation import ugettext as _
@@ -155,6 +157,19 @@ class ActivityAuditStatus(models.Model):
     def is_new(self):
         return (self.status == self.STATUS_NEW)
 
+    #counts of the moderation items per user, see
+    #:func:`askbot.api.get_info_on_moderation_items`
+    MODERATION_ITEMS_CACHE_KEY_TPL = 'moderation-items-%d'
+
+    @classmethod
+    def invalidate_moderation_items_cache(cls, user_ids):
+        """must be called when the audit records of
+        the users are created, deleted or change status"""
+        cache.cache.delete_many([
+            cls.MODERATION_ITEMS_CACHE_KEY_TPL % user_id
+            for user_id in set(user_ids)
+        ])
+
 
 class Activity(models.Model):
     """
@@ -189,11 +204,27 @@ class Activity(models.Model):
     def add_recipients(self, recipients):
         """have to use a special method, because django does not allow
         auto-adding to M2M with "through" model
+
+        the audit records for all recipients
+        are inserted with one statement
         """
-        for recipient in recipients:
-            #todo: may optimize for bulk addition
-            aas = ActivityAuditStatus(user = recipient, activity = self)
-            aas.save()
+        user_ids = set([recipient.id for recipient in recipients])
+        if len(user_ids) == 0:
+            return
+        qn = connection.ops.quote_name
+        sql = 'INSERT INTO %s (%s, %s, %s) VALUES (%%s, %%s, %%s)' % (
+            qn(ActivityAuditStatus._meta.db_table),
+            qn('user_id'),
+            qn('activity_id'),
+            qn('status')
+        )
+        params = [
+            (user_id, self.id, ActivityAuditStatus.STATUS_NEW)
+            for user_id in user_ids
+        ]
+        connection.cursor().executemany(sql, params)
+        transaction.commit_unless_managed()
+        ActivityAuditStatus.invalidate_moderation_items_cache(user_ids)
 
     def get_mentioned_user(self):
         assert(self.activity_type == const.TYPE_ACTIVITY_MENTION)
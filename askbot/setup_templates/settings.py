@@ -137,6 +137,20 @@ DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
 
 #TEMPLATE_DIRS = (,) #template have no effect in askbot, use the variable below
 #ASKBOT_EXTRA_SKINS_DIR = #path to your private skin collection
+#ASKBOT_BUFFER_VIEW_COUNTS = True #accumulate question views in the cache
+#and save them with the flush_view_counts command run by the cron job
+#ASKBOT_USE_SEARCH_INDEX = True #use inverted index for the text search
+#on databases without full text search, run rebuild_search_index after enabling
+#ASKBOT_USE_TAG_SUBSCRIBER_INDEX = True #keep tag selections of users in memory
+#to find subscribers of instant email alerts by the tags
+#ASKBOT_USE_THREAD_SIMILARITY_INDEX = True #precompute similar questions by tags
+#run rebuild_thread_similarity after enabling
+#ASKBOT_JINJA_BYTECODE_CACHE = 'filesystem' #or 'cache' - keep compiled templates
+#between restarts, run precompile_templates on deploy
+#ASKBOT_JINJA_BYTECODE_CACHE_DIR = '/var/cache/askbot' #for the 'filesystem' cache
+#ASKBOT_INSTRUMENTATION_SAMPLE_RATE = 0.01 #fraction of requests sampled by
+#askbot.middleware.instrumentation.InstrumentationMiddleware - put it first
+#into MIDDLEWARE_CLASSES and see the results with dump_view_stats
 #take a look here http://askbot.org/en/question/207/
 
 TEMPLATE_CONTEXT_PROCESSORS = (
@@ -217,7 +231,10 @@ ASKBOT_USE_STACKEXCHANGE_URLS = False #mimic url scheme of stackexchange
 
 #Celery Settings
 BROKER_TRANSPORT = "djkombu.transport.DatabaseTransport"
-CELERY_ALWAYS_EAGER = True
+CELERY_ALWAYS_EAGER = True #with eager celery google is not pinged on post
+#updates and gravatars are probed only by threads caching the results,
+#run "python manage.py ping_google" and "update_avatar_data" from cron,
+#see askbot/cron/askbot_cron_job
 
 import djcelery
 djcelery.setup_loader()
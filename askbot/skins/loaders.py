@@ -1,15 +1,22 @@
 import os.path
+import threading
+import time
 from django.template.loaders import filesystem
 from django.template import RequestContext
 from django.http import HttpResponse
 from django.utils import translation
 from django.conf import settings as django_settings
+from django.core import cache
 from coffin.common import CoffinEnvironment
 from jinja2 import loaders as jinja_loaders
+from jinja2.bccache import BytecodeCache, FileSystemBytecodeCache
+from jinja2.bccache import MemcachedBytecodeCache
 from jinja2.exceptions import TemplateNotFound
 from jinja2.utils import open_if_exists
+from askbot import const
 from askbot.conf import settings as askbot_settings
 from askbot.skins import utils
+from askbot.utils import instrumentation
 
 from coffin import template
 template.add_to_builtins('askbot.templatetags.extra_filters_jinja')
@@ -21,6 +28,9 @@ template.add_to_builtins('askbot.templatetags.extra_filters_jinja')
 #to work on unicode file paths
 #here it is ignored because it is assumed that we won't use unicode paths
 ASKBOT_SKIN_COLLECTION_DIR = os.path.dirname(__file__)
+#templates precompiled into the django cache must outlive
+#the default timeout of the cache
+BYTECODE_CACHE_TIMEOUT = const.LONG_TIME
 
 #changed the name from load_template_source
 def filesystem_load_template_source(name, dirs=None):
@@ -69,7 +79,9 @@ class SkinEnvironment(CoffinEnvironment):
     def set_language(self, language_code):
         """hooks up translation objects from django to jinja2
         environment.
-        note: not so sure about thread safety here
+        note: environments are shared between threads,
+        so this must be called only once on a new environment,
+        see get_skin_environment()
         """
         trans = translation.trans_real.translation(language_code)
         self.install_gettext_translations(trans)
@@ -84,24 +96,120 @@ class SkinEnvironment(CoffinEnvironment):
             return '<link href="%s" rel="stylesheet" type="text/css" />' % url
         return ''
 
+class MemoryBytecodeCache(BytecodeCache):
+    """keeps compiled templates in the memory of the process,
+    shared by the environments of all languages of the skin -
+    compiled templates do not depend on the language,
+    because translations are looked up at the rendering time
+    """
+    def __init__(self):
+        self.cache = dict()
+
+    def load_bytecode(self, bucket):
+        code = self.cache.get(bucket.key)
+        if code is not None:
+            bucket.bytecode_from_string(code)
+
+    def dump_bytecode(self, bucket):
+        self.cache[bucket.key] = bucket.bytecode_to_string()
+
+    def clear(self):
+        self.cache.clear()
+
+class DjangoCacheClient(object):
+    """memcache-like client of the django cache for the
+    ``MemcachedBytecodeCache``, the cache is looked up on each call,
+    so that replacements of ``cache.cache`` are respected
+    """
+    def get(self, key):
+        return cache.cache.get(key)
+
+    def set(self, key, value, timeout = None):
+        cache.cache.set(key, value, timeout)
+
+def get_bytecode_cache():
+    """returns cache of the compiled templates,
+    selected with the setting ``ASKBOT_JINJA_BYTECODE_CACHE``:
+
+    * 'filesystem' - files in the directory
+      ``ASKBOT_JINJA_BYTECODE_CACHE_DIR`` (system temp dir by default)
+    * 'cache' - the django cache, e.g. memcached
+    * not set - memory of the process
+
+    the first two survive restarts of the processes and are
+    shared between them, cached templates are keyed by the
+    template file path, which includes the skin directory,
+    and are recompiled when the template source changes
+    """
+    cache_type = getattr(django_settings, 'ASKBOT_JINJA_BYTECODE_CACHE', None)
+    if cache_type == 'filesystem':
+        directory = getattr(
+                        django_settings,
+                        'ASKBOT_JINJA_BYTECODE_CACHE_DIR',
+                        None
+                    )
+        return FileSystemBytecodeCache(directory, '__askbot_jinja2_%s.cache')
+    elif cache_type == 'cache':
+        return MemcachedBytecodeCache(
+                                DjangoCacheClient(),
+                                prefix = 'askbot-jinja2/',
+                                timeout = BYTECODE_CACHE_TIMEOUT
+                            )
+    elif cache_type is None:
+        return MemoryBytecodeCache()
+    else:
+        raise ValueError(
+            'ASKBOT_JINJA_BYTECODE_CACHE must be "filesystem" or "cache"'
+        )
+
+BYTECODE_CACHE = get_bytecode_cache()
+
+#(skin name, language code) -> SkinEnvironment
+ENVIRONMENTS = dict()
+ENVIRONMENTS_LOCK = threading.Lock()
+
+def get_skin_environment(skin_name, language_code):
+    """returns environment of the skin with the translations
+    for the language, the environment is created on the first use
+    """
+    key = (skin_name, language_code)
+    skin = ENVIRONMENTS.get(key)
+    if skin is None:
+        ENVIRONMENTS_LOCK.acquire()
+        try:
+            skin = ENVIRONMENTS.get(key)
+            if skin is None:
+                skin = SkinEnvironment(
+                            skin = skin_name,
+                            extensions = ['jinja2.ext.i18n',],
+                            bytecode_cache = BYTECODE_CACHE
+                        )
+                skin.set_language(language_code)
+                ENVIRONMENTS[key] = skin
+        finally:
+            ENVIRONMENTS_LOCK.release()
+    return skin
+
 def load_skins():
-    skins = dict()
+    """creates environments of all skins
+    for the default language"""
     for skin_name in utils.get_available_skins():
-        skins[skin_name] = SkinEnvironment(
-                                skin = skin_name,
-                                extensions=['jinja2.ext.i18n',]
-                            )
-        skins[skin_name].set_language(django_settings.LANGUAGE_CODE)
-        #from askbot.templatetags import extra_filters_jinja as filters
-        #skins[skin_name].filters['media'] = filters.media
-    return skins
+        get_skin_environment(skin_name, django_settings.LANGUAGE_CODE)
 
-SKINS = load_skins()
+load_skins()
 
 def get_skin(request = None):
     """retreives the skin environment
-    for a given request (request var is not used at this time)"""
-    return SKINS[askbot_settings.ASKBOT_DEFAULT_SKIN]
+    for a given request, localized to the language of the request,
+    or to the currently active language
+    """
+    language_code = getattr(request, 'LANGUAGE_CODE', None)
+    if language_code is None:
+        language_code = translation.get_language() \
+                            or django_settings.LANGUAGE_CODE
+    return get_skin_environment(
+                    askbot_settings.ASKBOT_DEFAULT_SKIN, language_code
+                )
 
 def get_template(template, request = None):
     """retreives template for the skin
@@ -111,8 +219,6 @@ def get_template(template, request = None):
     request variable is used to localize the skin if possible
     """
     skin = get_skin(request)
-    if hasattr(request,'LANGUAGE_CODE'):
-        skin.set_language(request.LANGUAGE_CODE)
     return skin.get_template(template)
 
 def render_into_skin(template, data, request, mimetype = 'text/html'):
@@ -122,10 +228,18 @@ def render_into_skin(template, data, request, mimetype = 'text/html'):
     """
     context = RequestContext(request, data)
     template = get_template(template, request)
-    return HttpResponse(template.render(context), mimetype = mimetype)
+    return HttpResponse(render_template(template, context), mimetype = mimetype)
 
 def render_text_into_skin(text, data, request):
     context = RequestContext(request, data)
     skin = get_skin(request)
     template = skin.from_string(text)
-    return template.render(context)
+    return render_template(template, context)
+
+def render_template(template, context):
+    """renders the template and adds the render time
+    to the instrumentation sample of the request"""
+    start_time = time.time()
+    output = template.render(context)
+    instrumentation.add_template_time(time.time() - start_time)
+    return output
@@ -86,6 +86,51 @@ def resolve_skin_for_media(media=None, preferred_skin = None):
             return skin_name
     raise MediaNotFound(media)
 
+def get_skin_media_url(skin, url, resource_revision = None):
+    """returns url of the media file in the given skin"""
+    url = django_settings.STATIC_URL + skin + '/media/' + url
+    url = os.path.normpath(url).replace('\\', '/')
+    if resource_revision:
+        url +=  '?v=%d' % resource_revision
+    return url
+
+def build_media_manifest(skin = None, resource_revision = None):
+    """returns dictionary of relative paths of all media files
+    to their urls, media of the ``skin`` override the files
+    with the same paths in the 'default' and 'common' skins
+    """
+    manifest = dict()
+    skins = get_available_skins(selected = skin).items()
+    #the first skin has priority, so it is added the last
+    for skin_name, skin_dir in reversed(skins):
+        media_dir = os.path.join(skin_dir, 'media')
+        for dir_path, dir_names, file_names in os.walk(media_dir):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                media_path = os.path.relpath(file_path, media_dir)
+                media_path = media_path.replace(os.sep, '/')
+                manifest[media_path] = get_skin_media_url(
+                                                skin_name,
+                                                media_path,
+                                                resource_revision
+                                            )
+    return manifest
+
+#the manifest is rebuilt when the skin or the media revision change
+_MEDIA_MANIFEST = {'key': None, 'urls': {}}
+
+def get_media_manifest(skin = None, resource_revision = None):
+    """returns the media manifest for the skin and media revision,
+    the manifest is held in memory of the process"""
+    global _MEDIA_MANIFEST
+    key = (skin, resource_revision)
+    manifest = _MEDIA_MANIFEST
+    if manifest['key'] != key:
+        urls = build_media_manifest(skin, resource_revision)
+        manifest = {'key': key, 'urls': urls}
+        _MEDIA_MANIFEST = manifest
+    return manifest['urls']
+
 def get_media_url(url, ignore_missing = False):
     """returns url prefixed with the skin name
     of the first skin that contains the file
@@ -146,6 +191,11 @@ def get_media_url(url, ignore_missing = False):
         use_skin = 'default'
         resource_revision = None
 
+    #most of the files are found in the manifest
+    media_manifest = get_media_manifest(use_skin, resource_revision)
+    if url in media_manifest:
+        return media_manifest[url]
+
     #determine from which skin take the media file
     try:
         use_skin = resolve_skin_for_media(media=url, preferred_skin = use_skin)
@@ -156,15 +206,9 @@ def get_media_url(url, ignore_missing = False):
             logging.critical(log_message)
         return None
 
-    url = django_settings.STATIC_URL + use_skin + '/media/' + url
-    url = os.path.normpath(url).replace('\\', '/')
-
-    if resource_revision:
-        url +=  '?v=%d' % resource_revision
-
     #after = datetime.datetime.now()
     #print after - before
-    return url
+    return get_skin_media_url(use_skin, url, resource_revision)
 
 def update_media_revision(skin = None):
     """update skin media revision number based on the contents
@@ -197,3 +241,9 @@ def update_media_revision(skin = None):
         askbot_settings.update('MEDIA_RESOURCE_REVISION', resource_revision + 1)
         askbot_settings.update('MEDIA_RESOURCE_REVISION_HASH', current_hash)
         logging.debug('MEDIA_RESOURCE_REVISION changed')
+
+    #build the manifest of media urls ahead of the first request
+    get_media_manifest(
+        askbot_settings.ASKBOT_DEFAULT_SKIN,
+        askbot_settings.MEDIA_RESOURCE_REVISION
+    )
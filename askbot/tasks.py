@@ -17,10 +17,16 @@ That is the reason for having two types of methods here:
 * celery tasks - shells that reconstitute the necessary ORM
   objects and call the base methods
 """
+import logging
 import sys
+import threading
 import traceback
+import uuid
 
+from django.conf import settings as django_settings
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.sitemaps import ping_google
+from django.core import cache # import cache, not from cache import cache, to be able to monkey-patch cache.cache in test cases
 from django.template import Context
 from django.utils.translation import ugettext as _
 from celery.decorators import task
@@ -28,13 +34,19 @@ from askbot.conf import settings as askbot_settings
 from askbot import const
 from askbot import mail
 from askbot.models import Activity, Post, Thread, User, ReplyAddress
+from askbot.models import ThreadSimilarity
 from askbot.models import send_instant_notifications_about_activity_in_post
+from askbot.models import increment_response_counts
 from askbot.models.badges import award_badges_signal
+from askbot.utils import gravatar as gravatar_utils
 
 # TODO: Make exceptions raised inside record_post_update_celery_task() ...
 #       ... propagate upwards to test runner, if only CELERY_ALWAYS_EAGER = True
 #       (i.e. if Celery tasks are not deferred but executed straight away)
 
+SITEMAP_PING_SCHEDULED_KEY = 'askbot-sitemap-ping-scheduled'
+SITEMAP_PING_SCHEDULED_TIMEOUT_FACTOR = 2
+
 @task(ignore_result = True)
 def notify_author_of_published_revision_celery_task(revision):
     #todo: move this to ``askbot.mail`` module
@@ -190,8 +202,12 @@ def record_post_update(
 
     assert(updated_by not in recipients)
 
-    for user in (set(recipients) | set(newly_mentioned_users)):
-        user.update_response_counts()
+    #each recipient has received exactly one new response, so
+    #the counts are incremented with one query, instead of recounting
+    #the responses of each user; counts of the mentioned users
+    #were updated in the create_new_mention() above
+    if activity_type in const.RESPONSE_ACTIVITY_TYPES_FOR_DISPLAY:
+        increment_response_counts(recipients)
 
     #shortcircuit if the email alerts are disabled
     if askbot_settings.ENABLE_EMAIL_ALERTS == False:
@@ -232,8 +248,18 @@ def record_question_visit(
     #question_post = Post.objects.filter(
     #    id = question_post_id
     #).select_related('thread')[0]
+    buffer_view_count = getattr(
+                            django_settings,
+                            'ASKBOT_BUFFER_VIEW_COUNTS',
+                            False
+                        )
     if update_view_count:
-        question_post.thread.increase_view_count()
+        if buffer_view_count:
+            #the count is written and badges are awarded
+            #by the management command flush_view_counts
+            Thread.objects.buffer_view_count(question_post.thread_id)
+        else:
+            question_post.thread.increase_view_count()
 
     if user.is_anonymous():
         return
@@ -246,8 +272,120 @@ def record_question_visit(
 
     #3) send award badges signal for any badges
     #that are awarded for question views
+    if buffer_view_count:
+        return
     award_badges_signal.send(None,
                     event = 'view_question',
                     actor = user,
                     context_object = question_post,
                 )
+
+@task(ignore_result = True)
+def update_thread_similarity_celery_task(thread_id):
+    """recalculates similar threads of the thread
+    and of its neighbours after the thread was retagged"""
+    try:
+        thread = Thread.objects.get(id = thread_id)
+    except Thread.DoesNotExist:
+        return
+    ThreadSimilarity.objects.update_thread(thread)
+
+@task(ignore_result = True)
+def update_avatar_type_celery_task(user_id):
+    """probes the gravatar of the user in the background,
+    so that the request does not wait for the gravatar server,
+    only the avatar type is written, because other fields of
+    the user may change while the gravatar is probed"""
+    try:
+        user = User.objects.get(id = user_id)
+    except User.DoesNotExist:
+        return
+    avatar_type = user.get_avatar_type()
+    if avatar_type != user.avatar_type:
+        User.objects.filter(id = user_id).update(avatar_type = avatar_type)
+
+def update_avatar_type(user):
+    """updates the avatar type of the user without waiting
+    for the gravatar server - with the celery workers the gravatar
+    is probed by the task, otherwise the type known from
+    a recent probe is written and if there is none, the gravatar
+    is probed in a thread, which only caches the result for
+    the next update"""
+    if not celery_is_eager():
+        update_avatar_type_celery_task.delay(user.id)
+        return
+    gravatar_type = gravatar_utils.get_cached_avatar_type(user.gravatar)
+    if gravatar_type is None:
+        probe = threading.Thread(
+                    target = gravatar_utils.probe_gravatar,
+                    args = (user.gravatar,)
+                )
+        probe.daemon = True
+        probe.start()
+        return
+    avatar_type = user.get_avatar_type(gravatar_type = gravatar_type)
+    if avatar_type != user.avatar_type:
+        User.objects.filter(id = user.id).update(avatar_type = avatar_type)
+
+def celery_is_eager():
+    """True if the tasks run within the calling process,
+    then slow tasks should not be started from the requests"""
+    return getattr(django_settings, 'CELERY_ALWAYS_EAGER', False)
+
+def schedule_sitemap_ping():
+    """schedules notification of google about the sitemap update
+    to run in the background at the end of the interval
+    ``GOOGLE_SITEMAP_PING_INTERVAL``, updates that happen
+    before the scheduled ping are covered by that ping.
+
+    with ``CELERY_ALWAYS_EAGER`` there is no background worker,
+    and the ping would run within the request, so it is not
+    scheduled - run ``python manage.py ping_google`` periodically instead
+    (see askbot/cron/askbot_cron_job)
+
+    returns True if the new ping was scheduled
+    """
+    if askbot_settings.GOOGLE_SITEMAP_CODE == '':
+        return False
+    if celery_is_eager():
+        return False
+    interval = askbot_settings.GOOGLE_SITEMAP_PING_INTERVAL
+    run_id = uuid.uuid4().hex
+    #the key is cleared by the scheduled run, the timeout only
+    #lets the pings be scheduled again if the task was lost
+    timeout = SITEMAP_PING_SCHEDULED_TIMEOUT_FACTOR * interval
+    if cache.cache.add(SITEMAP_PING_SCHEDULED_KEY, run_id, timeout) == False:
+        return False
+    ping_sitemap_celery_task.apply_async(args = (run_id,), countdown = interval)
+    return True
+
+@task(ignore_result = True)
+def ping_sitemap_celery_task(run_id = None):
+    """pings google for the scheduled run ``run_id``
+
+    the scheduled key is cleared before the ping, so that the updates
+    made from now on schedule the next ping. The run is skipped
+    if another one was scheduled after the key was evicted
+    from the cache, that run covers the updates of this one
+    """
+    scheduled_run_id = cache.cache.get(SITEMAP_PING_SCHEDULED_KEY)
+    if scheduled_run_id is not None:
+        if scheduled_run_id != run_id:
+            return
+        cache.cache.delete(SITEMAP_PING_SCHEDULED_KEY)
+    ping_sitemap()
+
+def ping_sitemap():
+    """notifies google about the sitemap update,
+    setting ``ASKBOT_SITEMAP_PING_URL`` overrides the address
+    of the ping service, e.g. with a local stub endpoint
+    to test this without the network access
+    """
+    ping_url = getattr(django_settings, 'ASKBOT_SITEMAP_PING_URL', None)
+    try:
+        if ping_url:
+            ping_google(ping_url = ping_url)
+        else:
+            ping_google()
+    except Exception:
+        logging.debug('cannot ping google - did you register with them?')
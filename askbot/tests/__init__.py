@@ -16,3 +16,6 @@ from askbot.tests.post_model_tests import *
 from askbot.tests.thread_model_tests import *
 from askbot.tests.reply_by_email_tests import *
 from askbot.tests.category_tree_tests import CategoryTreeTests
+from askbot.tests.stackexchange_loader_tests import *
+from askbot.tests.gravatar_tests import *
+from askbot.tests.instrumentation_tests import *
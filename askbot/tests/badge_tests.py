@@ -4,6 +4,7 @@ from django.test.client import Client
 from askbot.tests.utils import AskbotTestCase
 from askbot.conf import settings
 from askbot import models
+from askbot.models import badges
 from askbot.models.badges import award_badges_signal
 
 class BadgeTests(AskbotTestCase):
@@ -503,3 +504,35 @@ class BadgeTests(AskbotTestCase):
         self.client.get('/' + django_settings.ASKBOT_URL)
         self.assert_have_badge('enthusiast', self.u1, 1)
 
+
+    def test_awarded_badge_is_not_evaluated_again(self):
+        question = self.post_question(user = self.u1)
+        answer = self.post_answer(user = self.u1, question = question)
+        badges.EVALUATION_STATS.clear()
+        self.u2.upvote(question)
+        self.assert_have_badge('supporter', recipient = self.u2)
+        self.assertEqual(badges.EVALUATION_STATS['supporter'][0], 1)
+        self.u2.upvote(answer)
+        #supporter is awarded once, so it was skipped on the second vote
+        self.assertEqual(badges.EVALUATION_STATS['supporter'][0], 1)
+        self.assertEqual(badges.EVALUATION_STATS['nice-answer'][0], 1)
+        keys = [key for key, count, time in badges.get_evaluation_stats()]
+        self.assertTrue('nice-answer' in keys)
+
+    def test_events_awarding_nothing_run_no_queries(self):
+        question = self.post_question(user = self.u1)
+        question.thread#the thread is loaded outside of the counted block
+        timestamp = datetime.datetime.now()
+        with self.assertNumQueries(0):
+            award_badges_signal.send(None,
+                event = 'view_question',
+                actor = self.u2,
+                context_object = question,
+                timestamp = timestamp
+            )
+            award_badges_signal.send(None,
+                event = 'site_visit',
+                actor = self.u2,
+                context_object = self.u2,
+                timestamp = timestamp
+            )
@@ -1,6 +1,10 @@
+import sys
 from django.db import connection
 from django.core.urlresolvers import reverse
 from django.conf import settings
+from django.utils import simplejson
+from askbot import models
+from askbot.conf import settings as askbot_settings
 from askbot.tests.utils import AskbotTestCase
 
 
@@ -41,3 +45,157 @@ class CacheTests(AskbotTestCase):
         settings.DEBUG = False
 
 
+
+class LivesettingsSnapshotTests(AskbotTestCase):
+    def setUp(self):
+        self.backup = askbot_settings.EMAIL_SUBJECT_PREFIX
+
+    def tearDown(self):
+        askbot_settings.update('EMAIL_SUBJECT_PREFIX', self.backup)
+
+    def test_update_is_visible_immediately(self):
+        askbot_settings.update('EMAIL_SUBJECT_PREFIX', 'snapshot test')
+        self.assertEqual(askbot_settings.EMAIL_SUBJECT_PREFIX, 'snapshot test')
+
+    def test_snapshot_is_reloaded_when_version_changes(self):
+        askbot_settings.EMAIL_SUBJECT_PREFIX
+        reloads = askbot_settings.get_snapshot_reload_count()
+        askbot_settings.EMAIL_SUBJECT_PREFIX
+        self.assertEqual(askbot_settings.get_snapshot_reload_count(), reloads)
+        cache.delete(askbot_settings.VERSION_CACHE_KEY)
+        askbot_settings.EMAIL_SUBJECT_PREFIX
+        self.assertEqual(askbot_settings.get_snapshot_reload_count(), reloads + 1)
+
+
+class ContentObjectCacheTests(AskbotTestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.question = self.post_question(user = self.user)
+        self.answer = self.post_answer(user = self.user, question = self.question)
+        self.comment = self.post_comment(
+                            user = self.user,
+                            parent_post = self.answer
+                        )
+
+    def test_populate_content_object_caches(self):
+        from askbot import models
+        from askbot.utils.cache import populate_content_object_caches
+        from askbot.utils.cache import populate_post_caches
+        from askbot import const
+        activities = list(
+            models.Activity.objects.filter(
+                user = self.user,
+                activity_type__in = (
+                    const.TYPE_ACTIVITY_ASK_QUESTION,
+                    const.TYPE_ACTIVITY_ANSWER,
+                    const.TYPE_ACTIVITY_COMMENT_ANSWER
+                )
+            )
+        )
+        self.assertTrue(len(activities) > 0)
+        populate_content_object_caches(activities)
+        posts = [activity.content_object for activity in activities]
+        populate_post_caches(posts)
+
+        settings.DEBUG = True
+        query_count = len(connection.queries)
+        for post in posts:
+            post.thread._question_post()
+            if post.is_comment():
+                post.parent.thread.title
+        self.assertEqual(len(connection.queries), query_count)
+        settings.DEBUG = False
+
+
+class ModerationItemsCacheTests(AskbotTestCase):
+    def setUp(self):
+        self.use_local_memory_cache()
+        self.admin = self.create_user('admin', status = 'd')
+        self.user = self.create_user('user', reputation = 10000)
+        self.question = self.post_question(user = self.admin)
+
+    def test_counts_follow_audit_records(self):
+        from askbot import api
+        info = api.get_info_on_moderation_items(self.admin)
+        self.assertEqual(info, {'new_count': 0, 'seen_count': 0})
+
+        self.user.flag_post(self.question)
+        info = api.get_info_on_moderation_items(self.admin)
+        self.assertEqual(info, {'new_count': 1, 'seen_count': 0})
+
+        self.admin.visit_question(self.question)
+        info = api.get_info_on_moderation_items(self.admin)
+        self.assertEqual(info, {'new_count': 0, 'seen_count': 1})
+
+        self.user.flag_post(self.question, cancel = True)
+        info = api.get_info_on_moderation_items(self.admin)
+        self.assertEqual(info, {'new_count': 0, 'seen_count': 0})
+
+
+class TagIndexTests(AskbotTestCase):
+    def setUp(self):
+        self.use_local_memory_cache()
+        for name, used_count in (('pyramid', 1), ('python', 5), ('pypy', 3)):
+            tag = self.create_tag(name)
+            tag.used_count = used_count
+            tag.save()
+        self.create_tag('ruby')
+
+    def get_completions(self, prefix, limit = 10):
+        response = self.client.get(
+                        reverse('get_tag_completions'),
+                        {'prefix': prefix, 'limit': limit}
+                    )
+        self.assertEqual(response.status_code, 200)
+        return simplejson.loads(response.content)['tag_names']
+
+    def test_completions_are_ordered_by_use(self):
+        self.assertEqual(
+            self.get_completions('py'),
+            ['python', 'pypy', 'pyramid']
+        )
+        self.assertEqual(self.get_completions('py', limit = 2), ['python', 'pypy'])
+        self.assertEqual(self.get_completions('rub'), ['ruby'])
+        self.assertEqual(self.get_completions('x'), [])
+
+    def test_prefix_end(self):
+        from askbot.models import tag_index
+        self.assertEqual(tag_index.get_prefix_end(u'py'), u'pz')
+        self.assertEqual(tag_index.get_prefix_end(u''), None)
+        max_char = unichr(sys.maxunicode)
+        self.assertEqual(tag_index.get_prefix_end(u'a' + max_char), u'b')
+        self.assertEqual(tag_index.get_prefix_end(max_char), None)
+
+    def test_undeleting_live_tags_keeps_the_index(self):
+        from askbot.models import tag_index
+        version = tag_index.get_version()
+        models.Tag.objects.filter(name = 'ruby').mark_undeleted()
+        self.assertEqual(tag_index.get_version(), version)
+        models.Tag.objects.filter(name = 'ruby').update(deleted = True)
+        models.Tag.objects.filter(name = 'ruby').mark_undeleted()
+        self.assertNotEqual(tag_index.get_version(), version)
+
+    def test_index_is_refreshed_when_tags_change(self):
+        self.assertEqual(self.get_completions('rub'), ['ruby'])
+        self.create_tag('rubinius')
+        #ties are ordered by name
+        self.assertEqual(self.get_completions('rub'), ['rubinius', 'ruby'])
+        models.Tag.objects.filter(name = 'ruby').delete()
+        self.assertEqual(self.get_completions('rub'), ['rubinius'])
+
+    def test_tag_list_is_revalidated(self):
+        response = self.client.get(reverse('get_tag_list'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(
+                        reverse('get_tag_list'),
+                        HTTP_IF_NONE_MATCH = etag
+                    )
+        self.assertEqual(response.status_code, 304)
+        self.create_tag('rubinius')
+        response = self.client.get(
+                        reverse('get_tag_list'),
+                        HTTP_IF_NONE_MATCH = etag
+                    )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('rubinius' in response.content.split('\n'))
@@ -164,6 +164,112 @@ class DBApiTests(AskbotTestCase):
         matches = models.Post.objects.get_questions().get_by_text_query("database'")
         self.assertTrue(len(matches) == 1)
 
+class SearchIndexTests(AskbotTestCase):
+    def setUp(self):
+        settings.ASKBOT_USE_SEARCH_INDEX = True
+        self.create_user()
+
+    def tearDown(self):
+        settings.ASKBOT_USE_SEARCH_INDEX = False
+
+    def search(self, query):
+        return list(models.Thread.objects.get_for_query(query))
+
+    def test_search_finds_words_and_prefixes(self):
+        question = self.post_question(
+                        title = 'Crocodiles in the river',
+                        body_text = 'how many teeth do they have?'
+                    )
+        thread = question.thread
+        self.assertEqual(self.search('crocodiles'), [thread])
+        self.assertEqual(self.search('croc TEETH'), [thread])
+        self.assertEqual(self.search('crocodiles elephants'), [])
+
+    def test_index_follows_edits(self):
+        question = self.post_question(body_text = 'original body')
+        self.user.edit_question(
+                        question = question,
+                        title = question.thread.title,
+                        body_text = 'changed body',
+                        revision_comment = 'edit',
+                        tags = question.thread.tagnames
+                    )
+        self.assertEqual(self.search('original'), [])
+        self.assertEqual(self.search('changed'), [question.thread])
+
+    def test_index_follows_restored_posts(self):
+        moderator = self.create_user(username = 'moderator', status = 'm')
+        question = self.post_question(body_text = 'question body')
+        answer = self.post_answer(
+                        question = question,
+                        body_text = 'restored answer'
+                    )
+        moderator.delete_answer(answer)
+        self.assertEqual(self.search('restored'), [])
+        moderator.restore_post(answer)
+        self.assertEqual(self.search('restored'), [question.thread])
+
+    def test_index_follows_deleted_comments(self):
+        question = self.post_question(body_text = 'question body')
+        comment = self.post_comment(
+                        parent_post = question,
+                        body_text = 'deleted comment'
+                    )
+        self.assertEqual(self.search('deleted'), [question.thread])
+        self.user.delete_comment(comment)
+        self.assertEqual(self.search('deleted'), [])
+
+    def test_rebuild(self):
+        question = self.post_question(body_text = 'indexed words')
+        models.SearchToken.objects.all().delete()
+        self.assertEqual(self.search('indexed'), [])
+        models.SearchToken.objects.rebuild()
+        self.assertEqual(self.search('indexed'), [question.thread])
+
+
+class DailyUpvoteReputationTests(AskbotTestCase):
+    def setUp(self):
+        self.create_user()
+        self.create_user(username = 'voter1', status = 'm')
+        self.create_user(username = 'voter2', status = 'm')
+        self.question = self.post_question()
+
+    def get_ledger_reputation(self):
+        return models.Repute.objects.get_reputation_by_upvoted_today(self.user)
+
+    def test_ledger_follows_votes(self):
+        gain = askbot_settings.REP_GAIN_FOR_RECEIVING_UPVOTE
+        loss = askbot_settings.REP_LOSS_FOR_RECEIVING_UPVOTE_CANCELATION
+        self.voter1.upvote(self.question)
+        self.voter2.upvote(self.question)
+        self.assertEqual(self.get_ledger_reputation(), 2 * gain)
+        self.voter2.upvote(self.question, cancel = True)
+        self.assertEqual(self.get_ledger_reputation(), 2 * gain + loss)
+
+    def test_ledger_starts_from_history(self):
+        gain = askbot_settings.REP_GAIN_FOR_RECEIVING_UPVOTE
+        self.voter1.upvote(self.question)
+        #the upvote was made before the ledger was deployed
+        models.DailyUpvoteReputation.objects.all().delete()
+        self.voter2.upvote(self.question)
+        self.assertEqual(self.get_ledger_reputation(), 2 * gain)
+        ledger = models.DailyUpvoteReputation.objects.get(user = self.user)
+        self.assertEqual(ledger.reputation, 2 * gain)
+
+    def test_reconcile(self):
+        self.voter1.upvote(self.question)
+        expected = self.get_ledger_reputation()
+        models.DailyUpvoteReputation.objects.all().delete()
+        #without the ledger record the history is summed
+        self.assertEqual(self.get_ledger_reputation(), expected)
+        today = datetime.date.today()
+        changed = models.DailyUpvoteReputation.objects.reconcile(today)
+        self.assertEqual(changed, 1)
+        self.assertEqual(self.get_ledger_reputation(), expected)
+        changed = models.DailyUpvoteReputation.objects.reconcile(today)
+        self.assertEqual(changed, 0)
+
+
 class UserLikeTagTests(AskbotTestCase):
     """tests for user liking and disliking tags"""
     def setUp(self):
@@ -360,6 +466,26 @@ class GlobalTagSubscriberGetterTests(AskbotTestCase):
             reason = 'bad'
         )
 
+class IndexedGlobalTagSubscriberGetterTests(GlobalTagSubscriberGetterTests):
+    """same tests, run against the tag subscriber index"""
+    def setUp(self):
+        settings.ASKBOT_USE_TAG_SUBSCRIBER_INDEX = True
+        #the index may be left from the rolled back tests
+        models.subscriber_index.invalidate_index()
+        super(IndexedGlobalTagSubscriberGetterTests, self).setUp()
+
+    def tearDown(self):
+        settings.ASKBOT_USE_TAG_SUBSCRIBER_INDEX = False
+
+    def test_prefix_trie(self):
+        trie = models.subscriber_index.PrefixTrie()
+        trie.add('da', 1)
+        trie.add('d', 2)
+        trie.add('night', 3)
+        self.assertEqual(trie.get_matching_ids('day'), set([1, 2]))
+        self.assertEqual(trie.get_matching_ids('d'), set([2]))
+        self.assertEqual(trie.get_matching_ids('nigh'), set())
+
 class CommentTests(AskbotTestCase):
     """unfortunately, not very useful tests,
     as assertions of type "user can" are not inside
@@ -2,16 +2,19 @@ import datetime
 import functools
 import copy
 import time
+import smtplib
 from django.conf import settings as django_settings
 from django.core import management
 from django.core import serializers
 import django.core.mail
+from django.core.mail.backends import locmem
 from django.core.urlresolvers import reverse
 from django.test import TestCase
 from django.test.client import Client
 from askbot.tests import utils
 from askbot import models
 from askbot import mail
+from askbot import exceptions
 from askbot.conf import settings as askbot_settings
 from askbot import const
 from askbot.models.question import Thread
@@ -106,6 +109,68 @@ class SubjectLineTests(TestCase):
         subj = mail.prefix_the_subject_line('hahah')
         self.assertEquals(subj, 'hahah')
 
+class FlakyEmailBackend(locmem.EmailBackend):
+    """fails to send messages with "flaky" in the
+    subject line on the first attempt"""
+    failed_subjects = set()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if 'flaky' in message.subject \
+                and message.subject not in self.failed_subjects:
+                self.failed_subjects.add(message.subject)
+                raise smtplib.SMTPException('temporary failure')
+        return super(FlakyEmailBackend, self).send_messages(messages)
+
+class SendMessagesTests(TestCase):
+    """tests for the batched email sending"""
+    def setUp(self):
+        askbot_settings.update('EMAIL_SUBJECT_PREFIX', '')
+        self.backend_backup = django_settings.EMAIL_BACKEND
+
+    def tearDown(self):
+        django_settings.EMAIL_BACKEND = self.backend_backup
+
+    def create_messages(self, subjects):
+        return [
+            mail.create_message(
+                subject_line = subject,
+                body_text = 'text',
+                recipient_list = ['user@example.com']
+            ) for subject in subjects
+        ]
+
+    def test_messages_are_sent_in_batches(self):
+        messages = self.create_messages(['one', 'two', 'three'])
+        sent_count = mail.send_messages(messages, batch_size = 2)
+        self.assertEqual(sent_count, 3)
+        outbox = django.core.mail.outbox
+        self.assertEqual([msg.subject for msg in outbox], ['one', 'two', 'three'])
+        self.assertEqual(outbox[0].content_subtype, 'html')
+
+    def test_failed_messages_are_retried(self):
+        django_settings.EMAIL_BACKEND = \
+            'askbot.tests.email_alert_tests.FlakyEmailBackend'
+        FlakyEmailBackend.failed_subjects = set()
+        messages = self.create_messages(['one', 'flaky', 'three'])
+        sent_count = mail.send_messages(messages)
+        self.assertEqual(sent_count, 3)
+        subjects = [msg.subject for msg in django.core.mail.outbox]
+        self.assertEqual(subjects, ['one', 'three', 'flaky'])
+
+    def test_failure_is_raised_after_retries(self):
+        django_settings.EMAIL_BACKEND = \
+            'askbot.tests.email_alert_tests.FlakyEmailBackend'
+        FlakyEmailBackend.failed_subjects = set()
+        messages = self.create_messages(['flaky'])
+        self.assertRaises(
+            exceptions.EmailNotSent,
+            mail.send_messages,
+            messages,
+            max_retries = 0,
+            raise_on_failure = True
+        )
+
 class EmailAlertTests(TestCase):
     """Base class for testing delayed Email notifications 
     that are triggered by the send_email_alerts
@@ -1013,3 +1078,83 @@ class MailMessagesTests(utils.AskbotTestCase):
         user = self.create_user('user')
         message = messages.ask_for_signature(user, footer_code = 'nothing')
         self.assertTrue(user.username in message)
+
+
+class DigestUserChunkTests(utils.AskbotTestCase):
+    def setUp(self):
+        for number in range(5):
+            self.create_user('user%d' % number)
+
+    def test_user_chunks_cover_id_ranges(self):
+        from askbot.management.commands import send_email_alerts
+        all_ids = list(
+            models.User.objects.order_by('id').values_list('id', flat = True)
+        )
+        id_ranges = send_email_alerts.get_user_id_ranges(2)
+        self.assertEqual(len(id_ranges), 2)
+        chunked_ids = list()
+        for id_range in id_ranges:
+            for chunk in send_email_alerts.get_user_chunks(id_range, 2):
+                self.assertTrue(len(chunk) <= 2)
+                chunked_ids.extend([user.id for user in chunk])
+        self.assertEqual(chunked_ids, all_ids)
+
+    def test_feed_candidates_skip_seen_questions(self):
+        from askbot.management.commands import send_email_alerts
+        asker1 = models.User.objects.get(username = 'user1')
+        asker2 = models.User.objects.get(username = 'user2')
+        answerer = models.User.objects.get(username = 'user3')
+        question1 = self.post_question(user = asker1)
+        question2 = self.post_question(user = asker2)
+        self.post_answer(user = answerer, question = question1)
+        self.post_answer(user = answerer, question = question2)
+        #asker1 has seen the answer
+        asker1.visit_question(
+            question1,
+            timestamp = datetime.datetime.now() + datetime.timedelta(hours = 1)
+        )
+
+        users = [asker1, asker2]
+        feeds_by_user = dict()
+        for user in users:
+            feed = models.EmailFeedSetting(
+                                subscriber = user,
+                                feed_type = 'q_ask',
+                                frequency = 'd'
+                            )
+            feeds_by_user[user.id] = [feed]
+
+        candidates = send_email_alerts.get_feed_candidates(users, feeds_by_user)
+        self.assertFalse('q_ask' in candidates.get(asker1.id, {}))
+        self.assertEqual(
+            [q.id for q in candidates[asker2.id]['q_ask']],
+            [question2.id]
+        )
+
+    def test_feed_candidates_skip_threads_reported_before(self):
+        from askbot.management.commands import send_email_alerts
+        asker = models.User.objects.get(username = 'user1')
+        answerer = models.User.objects.get(username = 'user2')
+        asker.date_joined = datetime.datetime.now() - datetime.timedelta(20)
+        asker.save()
+        long_ago = datetime.datetime.now() - datetime.timedelta(10)
+        old_question = self.post_question(user = asker, timestamp = long_ago)
+        self.post_answer(
+            user = answerer, question = old_question, timestamp = long_ago
+        )
+        new_question = self.post_question(user = asker)
+        self.post_answer(user = answerer, question = new_question)
+
+        feed = models.EmailFeedSetting(
+                            subscriber = asker,
+                            feed_type = 'q_ask',
+                            frequency = 'w',
+                            reported_at = long_ago + datetime.timedelta(1)
+                        )
+        candidates = send_email_alerts.get_feed_candidates(
+                                                [asker], {asker.id: [feed]}
+                                            )
+        self.assertEqual(
+            [q.id for q in candidates[asker.id]['q_ask']],
+            [new_question.id]
+        )
@@ -0,0 +1,100 @@
+import threading
+import time
+import BaseHTTPServer
+from django.conf import settings
+from askbot import tasks
+from askbot.tests.utils import AskbotTestCase
+from askbot.utils import gravatar
+
+class GravatarProbeTests(AskbotTestCase):
+    """gravatar probes against a local stub server,
+    which has only the gravatar 'found'"""
+
+    def setUp(self):
+        self.requested = requested = list()
+        class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                gravatar = self.path.split('/')[-1]
+                requested.append(gravatar)
+                if gravatar == 'found':
+                    self.send_response(200)
+                else:
+                    self.send_response(404)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), StubHandler)
+        thread = threading.Thread(target = self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.old_probe_url = getattr(settings, 'ASKBOT_GRAVATAR_PROBE_URL', None)
+        settings.ASKBOT_GRAVATAR_PROBE_URL = \
+            'http://127.0.0.1:%d/avatar/%%s' % self.server.server_port
+        self.use_local_memory_cache()
+
+    def tearDown(self):
+        self.server.shutdown()
+        if self.old_probe_url is None:
+            del settings.ASKBOT_GRAVATAR_PROBE_URL
+        else:
+            settings.ASKBOT_GRAVATAR_PROBE_URL = self.old_probe_url
+
+    def test_probes_are_parallel_and_cached(self):
+        gravatars = ['found', 'missing1', 'missing2', 'found']
+        avatar_types = gravatar.probe_gravatars(gravatars, workers = 2)
+        self.assertEqual(
+            avatar_types,
+            {'found': 'g', 'missing1': 'n', 'missing2': 'n'}
+        )
+        self.assertEqual(len(self.requested), 3)
+        #recently probed gravatars are not requested again
+        gravatar.probe_gravatars(gravatars, workers = 2)
+        self.assertEqual(len(self.requested), 3)
+        self.assertEqual(gravatar.get_cached_avatar_type('found'), 'g')
+
+    def test_update_avatar_type(self):
+        user = self.create_user()
+        user.gravatar = 'found'
+        user.update_avatar_type()
+        self.assertEqual(self.reload_object(user).avatar_type, 'g')
+
+    def test_task_writes_only_avatar_type(self):
+        user = self.create_user()
+        user.gravatar = 'found'
+        user.save()
+        #reputation changes while the gravatar is probed
+        probe_gravatar = gravatar.probe_gravatar
+        def probe_and_change_user(gravatar_hash):
+            user.__class__.objects.filter(id = user.id).update(reputation = 77)
+            return probe_gravatar(gravatar_hash)
+        gravatar.probe_gravatar = probe_and_change_user
+        try:
+            tasks.update_avatar_type_celery_task(user.id)
+        finally:
+            gravatar.probe_gravatar = probe_gravatar
+        user = self.reload_object(user)
+        self.assertEqual(user.avatar_type, 'g')
+        self.assertEqual(user.reputation, 77)
+
+    def test_update_without_celery_workers(self):
+        eager_backup = getattr(settings, 'CELERY_ALWAYS_EAGER', False)
+        settings.CELERY_ALWAYS_EAGER = True
+        try:
+            user = self.create_user()
+            user.gravatar = 'found'
+            user.save()
+            #the first update only probes the gravatar in a thread
+            tasks.update_avatar_type(user)
+            for attempt in range(50):
+                if gravatar.get_cached_avatar_type('found') is not None:
+                    break
+                time.sleep(0.1)
+            self.assertEqual(gravatar.get_cached_avatar_type('found'), 'g')
+            #the next one writes the result of the probe
+            tasks.update_avatar_type(user)
+            self.assertEqual(self.reload_object(user).avatar_type, 'g')
+        finally:
+            settings.CELERY_ALWAYS_EAGER = eager_backup
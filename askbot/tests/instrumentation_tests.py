@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core import cache
+from django.db import connection
+from askbot import models
+from askbot.tests.utils import AskbotTestCase
+from askbot.utils import instrumentation
+
+class InstrumentationMiddlewareTests(AskbotTestCase):
+    def setUp(self):
+        self.use_local_memory_cache()
+        self.old_sample_rate = getattr(
+                                settings,
+                                'ASKBOT_INSTRUMENTATION_SAMPLE_RATE',
+                                None
+                            )
+        settings.ASKBOT_INSTRUMENTATION_SAMPLE_RATE = 1
+
+    def tearDown(self):
+        if self.old_sample_rate is None:
+            del settings.ASKBOT_INSTRUMENTATION_SAMPLE_RATE
+        else:
+            settings.ASKBOT_INSTRUMENTATION_SAMPLE_RATE = self.old_sample_rate
+
+    def run_request(self, middleware, view_func):
+        from django.http import HttpResponse
+        from django.test.client import RequestFactory
+        request = RequestFactory().get('/')
+        middleware.process_request(request)
+        middleware.process_view(request, view_func, (), {})
+        view_func(request)
+        middleware.process_response(request, HttpResponse(''))
+
+    def test_samples_are_aggregated_per_view(self):
+        from django.core.management import call_command
+        from askbot.middleware.instrumentation import InstrumentationMiddleware
+
+        def test_view(request):
+            models.User.objects.count()
+            #the middleware wraps the cache, look it up at the call time
+            cache.cache.get('missing-key')
+
+        use_debug_cursor = connection.use_debug_cursor
+        middleware = InstrumentationMiddleware()
+        self.run_request(middleware, test_view)
+        self.run_request(middleware, test_view)
+
+        all_stats = instrumentation.get_all_stats()
+        self.assertEqual(len(all_stats), 1)
+        stats = all_stats[0]
+        self.assertEqual(stats['view_name'], __name__ + '.test_view')
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(sum(stats['time_histogram']), 2)
+        self.assertTrue(stats['query_count'] >= 2)
+        self.assertEqual(stats['cache_gets'], 2)
+        self.assertEqual(stats['cache_hits'], 0)
+        #the debug cursor is on only for the sampled requests
+        self.assertEqual(instrumentation.get_sample(), None)
+        self.assertEqual(connection.use_debug_cursor, use_debug_cursor)
+
+        call_command('dump_view_stats', reset = True)
+        self.assertEqual(instrumentation.get_all_stats(), [])
+
+
+class CountingCacheTests(AskbotTestCase):
+    def setUp(self):
+        self.cache = instrumentation.CountingCache(
+                                    self.use_local_memory_cache()
+                                )
+        instrumentation.start()
+        self.addCleanup(instrumentation.stop)
+
+    def test_miss_with_default_is_not_a_hit(self):
+        self.cache.set('cached-none', None)
+        self.assertEqual(self.cache.get('missing-key', 'default'), 'default')
+        self.assertEqual(self.cache.get('missing-key', default = 0), 0)
+        self.assertEqual(self.cache.get('cached-none', 'default'), None)
+        sample = instrumentation.get_sample()
+        self.assertEqual(sample['cache_gets'], 3)
+        self.assertEqual(sample['cache_hits'], 1)
+        self.assertEqual(sample['cache_sets'], 1)
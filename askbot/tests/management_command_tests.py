@@ -1,7 +1,13 @@
+import os
+import tempfile
 from django.core import management
 from django.contrib import auth
 from askbot.tests.utils import AskbotTestCase
 from askbot import models
+import Queue
+from django.db import connection
+from askbot.management import NoArgsJob, read_checkpoint, write_checkpoint
+from askbot.management import write_pk_ranges
 
 class ManagementCommandTests(AskbotTestCase):
     def test_add_askbot_user(self):
@@ -49,3 +55,127 @@ class ManagementCommandTests(AskbotTestCase):
         user_two = models.User.objects.get(pk=2)
         self.assertEqual(user_two.gold, number_of_gold) 
         self.assertEqual(user_two.reputation, reputation)
+
+    def test_job_runs_in_chunks_and_resumes_from_checkpoint(self):
+        for i in range(5):
+            self.create_user(username = 'user%d' % i)
+        user_ids = list(
+            models.User.objects.order_by('id').values_list('id', flat = True)
+        )
+        seen_ids = list()
+        def record_user(user):
+            seen_ids.append(user.id)
+            return user.id % 2 == 0
+
+        job = NoArgsJob()
+        job.batches = ({
+            'title': 'Checking users: ',
+            'query_set': models.User.objects.all(),
+            'function': record_user,
+            'changed_count_message': 'Changed %d users',
+            'nothing_changed_message': 'No users changed'
+        },)
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'job')
+        #pretend that the previous run has processed two users
+        write_checkpoint(checkpoint + '.0', user_ids[1])
+        job.run_command(chunk_size = 2, checkpoint = checkpoint)
+        self.assertEqual(seen_ids, user_ids[2:])
+        #checkpoint is removed when the job is complete
+        self.assertFalse(os.path.exists(checkpoint + '.0'))
+
+    def get_user_job(self, function):
+        job = NoArgsJob()
+        job.batches = ({
+            'title': 'Checking users: ',
+            'query_set': models.User.objects.all(),
+            'function': function,
+            'changed_count_message': 'Changed %d users',
+            'nothing_changed_message': 'No users changed'
+        },)
+        return job
+
+    def test_failed_worker_reports_error(self):
+        self.create_user()
+        def fail(user):
+            raise ValueError('broken item')
+        job = self.get_user_job(fail)
+        job.chunk_size = 10
+        job.checkpoint = None
+        #the worker closes the connection of the child process,
+        #here it would end the transaction of the test
+        connection.close = lambda: None
+        self.addCleanup(delattr, connection, 'close')
+        results = Queue.Queue()
+        job.run_worker(job.batches[0], 0, 3, None, results)
+        worker_index, counts, error = results.get_nowait()
+        self.assertEqual(worker_index, 3)
+        self.assertEqual(counts, (0, 0))
+        self.assertTrue('broken item' in error)
+
+    def test_resumed_job_reuses_worker_ranges(self):
+        for i in range(3):
+            self.create_user(username = 'user%d' % i)
+        user_ids = list(
+            models.User.objects.order_by('id').values_list('id', flat = True)
+        )
+        job = self.get_user_job(lambda user: False)
+        job.workers = 2
+        job.checkpoint = os.path.join(tempfile.mkdtemp(), 'job')
+        #ranges saved by the interrupted run, before the last user was added
+        saved_ranges = [(user_ids[0], user_ids[0]), (user_ids[1], user_ids[1])]
+        write_pk_ranges(job.checkpoint + '.0.ranges', saved_ranges)
+        pk_ranges = job.get_pk_ranges(job.batches[0], 0)
+        self.assertEqual(
+            pk_ranges,
+            [(user_ids[0], user_ids[0]), (user_ids[1], user_ids[-1])]
+        )
+
+    def test_worker_keeps_checkpoint_of_completed_range(self):
+        for i in range(3):
+            self.create_user(username = 'user%d' % i)
+        user_ids = list(
+            models.User.objects.order_by('id').values_list('id', flat = True)
+        )
+        checked_ids = list()
+        def check(user):
+            checked_ids.append(user.id)
+            return False
+        job = self.get_user_job(check)
+        job.chunk_size = 10
+        job.checkpoint = os.path.join(tempfile.mkdtemp(), 'job')
+        pk_range = (user_ids[0], user_ids[-1] + 10)
+        job.run_items(job.batches[0], 0, pk_range, worker_index = 0)
+        self.assertEqual(checked_ids, user_ids)
+        #other workers may fail, so the completed range is remembered
+        self.assertEqual(read_checkpoint(job.checkpoint + '.0.0'), pk_range[1])
+        job.run_items(job.batches[0], 0, pk_range, worker_index = 0)
+        self.assertEqual(checked_ids, user_ids)
+
+    def test_recount_denormalized(self):
+        user = self.create_user()
+        other_user = self.create_user(username = 'other_user')
+        question = self.post_question(user = user, tags = 'one two')
+        answer = self.post_answer(user = other_user, question = question)
+        self.post_comment(user = user, parent_post = answer)
+        other_user.toggle_favorite_question(question)
+        thread = question.thread
+        expected_user = self.reload_object(user)
+
+        models.Thread.objects.all().update(answer_count = 7, favourite_count = 7)
+        models.Tag.objects.all().update(used_count = 7)
+        models.Post.objects.all().update(comment_count = 7)
+        models.User.objects.all().update(new_response_count = 7)
+
+        management.call_command('recount_denormalized', verbosity = 0)
+
+        thread = self.reload_object(thread)
+        self.assertEqual(thread.answer_count, 1)
+        self.assertEqual(thread.favourite_count, 1)
+        for tag in models.Tag.objects.filter(name__in = ('one', 'two')):
+            self.assertEqual(tag.used_count, 1)
+        self.assertEqual(self.reload_object(answer).comment_count, 1)
+        self.assertEqual(self.reload_object(question).comment_count, 0)
+        self.assertEqual(
+            self.reload_object(user).new_response_count,
+            expected_user.new_response_count
+        )
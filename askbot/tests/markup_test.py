@@ -1,4 +1,5 @@
 from django.conf import settings as django_settings
+from askbot.conf import settings as askbot_settings
 from askbot.tests.utils import AskbotTestCase
 from askbot.utils import markup
 
@@ -22,3 +23,13 @@ class MarkupTest(AskbotTestCase):
         text = "oh hai @user1 how are you?"
         output = markup.extract_mentioned_name_seeds(text)
         self.assertEquals(output, set(['user1']))
+
+    def test_parser_is_reused(self):
+        self.assertTrue(markup.get_parser() is markup.get_parser())
+
+    def test_parser_is_rebuilt_when_settings_change(self):
+        backup = askbot_settings.MARKUP_CODE_FRIENDLY
+        parser = markup.get_parser()
+        askbot_settings.update('MARKUP_CODE_FRIENDLY', not backup)
+        self.assertFalse(parser is markup.get_parser())
+        askbot_settings.update('MARKUP_CODE_FRIENDLY', backup)
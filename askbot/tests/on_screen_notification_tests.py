@@ -622,3 +622,59 @@ class OnScreenUpdateNotificationTests(TestCase):
         )
 
 
+
+
+class ResponseFanOutTests(TestCase):
+    """tests for the bulk addition of the
+    response recipients and the response counts"""
+
+    def setUp(self):
+        self.author = create_user('author', 'author@example.com')
+        self.u1 = create_user('user1', 'user1@example.com')
+        self.u2 = create_user('user2', 'user2@example.com')
+        thread = models.Thread.objects.create_new(
+                            title = 'test question',
+                            author = self.author,
+                            added_at = datetime.datetime.now(),
+                            wiki = False,
+                            tagnames = 'test',
+                            text = 'hey listen up',
+                        )
+        self.question = thread._question_post()
+
+    def test_add_recipients_inserts_one_record_per_user(self):
+        activity = models.Activity(
+                        user = self.author,
+                        content_object = self.question,
+                        activity_type = const.TYPE_ACTIVITY_ASK_QUESTION,
+                        question = self.question
+                    )
+        activity.save()
+        activity.add_recipients([self.u1, self.u2, self.u1])
+        self.assertEqual(
+            set(activity.recipients.all()),
+            set([self.u1, self.u2])
+        )
+        statuses = models.ActivityAuditStatus.objects.filter(
+                                                activity = activity
+                                            )
+        self.assertEqual(statuses.count(), 2)
+        for status in statuses:
+            self.assertEqual(
+                status.status,
+                models.ActivityAuditStatus.STATUS_NEW
+            )
+
+    def test_increment_response_counts(self):
+        models.User.objects.filter(
+                    id__in = (self.u1.id, self.u2.id)
+                ).update(new_response_count = 2)
+        u1 = models.User.objects.get(id = self.u1.id)
+        models.increment_response_counts([u1, self.u2, u1])
+        self.assertEqual(u1.new_response_count, 3)
+        self.assertEqual(
+            models.User.objects.get(id = self.u1.id).new_response_count, 3
+        )
+        self.assertEqual(
+            models.User.objects.get(id = self.u2.id).new_response_count, 3
+        )
@@ -4,6 +4,7 @@ from operator import attrgetter
 import time
 from askbot.search.state_manager import SearchState
 from askbot.skins.loaders import get_template
+from django.conf import settings as django_settings
 from django.contrib.auth.models import User
 from django.core import cache, urlresolvers
 from django.core.cache.backends.dummy import DummyCache
@@ -11,6 +12,8 @@ from django.core.cache.backends.locmem import LocMemCache
 
 from django.core.exceptions import ValidationError
 from askbot.tests.utils import AskbotTestCase
+from askbot import tasks
+from askbot.conf import settings as askbot_settings
 from askbot.models import Post, PostRevision, Thread, Tag
 from askbot.search.state_manager import DummySearchState
 from django.utils import simplejson
@@ -321,6 +324,26 @@ class ThreadRenderLowLevelCachingTests(AskbotTestCase):
         self.assertTrue(ss.add_tag('tag2').full_url() in test_html)
         self.assertTrue(ss.add_tag('tag3').full_url() in test_html)
 
+    def test_precache_summary_html(self):
+        self.use_local_memory_cache()
+
+        thread = self.q.thread
+        cache.cache.delete(Thread.SUMMARY_CACHE_KEY_TPL % thread.id)
+        self.assertFalse(thread.summary_html_cached())
+
+        threads = list(Thread.objects.filter(id=thread.id))
+        Thread.objects.precache_view_data_hack(threads=threads)
+        Thread.objects.precache_summary_html(threads=threads)
+        self.assertTrue(thread.summary_html_cached())
+
+        ss = SearchState.get_empty()
+        cache.cache.delete(Thread.SUMMARY_CACHE_KEY_TPL % thread.id)
+        #html is taken from the thread object, not from the cache
+        html = threads[0].get_summary_html(search_state=ss)
+        self.assertFalse(thread.summary_html_cached())
+        self.assertEqual(html, thread.get_summary_html(search_state=ss))
+        self.assertTrue(ss.add_tag('tag1').full_url() in html)
+
     def test_thread_summary_locmem_cache(self):
         cache.cache = LocMemCache('', {})  # Enable local caching
 
@@ -579,6 +602,35 @@ class ThreadRenderCacheUpdateTests(AskbotTestCase):
         html = self._html_for_question(thread._question_post())
         self.assertEqual(html, thread.get_cached_summary_html())
 
+    def test_buffered_view_count(self):
+        question = self.post_question()
+        buffer_backup = getattr(
+                            django_settings, 'ASKBOT_BUFFER_VIEW_COUNTS', False
+                        )
+        django_settings.ASKBOT_BUFFER_VIEW_COUNTS = True
+        try:
+            self.client.logout()
+            self.client.get(
+                urlresolvers.reverse('question', kwargs={'id': question.id}),
+                {},
+                follow=True,
+                HTTP_ACCEPT_LANGUAGE='en',
+                HTTP_USER_AGENT='Mozilla Gecko'
+            )
+        finally:
+            django_settings.ASKBOT_BUFFER_VIEW_COUNTS = buffer_backup
+        thread = Thread.objects.all()[0]
+        self.assertEqual(0, thread.view_count)
+
+        self.assertEqual(1, Thread.objects.flush_buffered_view_counts())
+        thread = Thread.objects.all()[0]
+        self.assertEqual(1, thread.view_count)
+        html = self._html_for_question(thread._question_post())
+        self.assertEqual(html, thread.get_cached_summary_html())
+
+        #nothing left to flush
+        self.assertEqual(0, Thread.objects.flush_buffered_view_counts())
+
     def test_question_upvote_downvote(self):
         question = self.post_question()
         question.score = 5
@@ -642,3 +694,65 @@ class ThreadRenderCacheUpdateTests(AskbotTestCase):
 # - Publishing anonymous questions / answers
 # - Re-posting question as answer and vice versa
 # - Management commands (like post_emailed_questions)
+
+
+class SitemapPingTests(AskbotTestCase):
+    def setUp(self):
+        self.sitemap_code_backup = askbot_settings.GOOGLE_SITEMAP_CODE
+        askbot_settings.update('GOOGLE_SITEMAP_CODE', 'test-code')
+        #a port with nothing listening, so that nothing leaves the machine
+        django_settings.ASKBOT_SITEMAP_PING_URL = 'http://127.0.0.1:9/ping'
+        self.use_local_memory_cache()
+        self.eager_backup = getattr(django_settings, 'CELERY_ALWAYS_EAGER', False)
+        #record the pings and scheduled tasks instead of making them
+        self.pings = list()
+        self.scheduled = list()
+        self.old_ping_google = tasks.ping_google
+        self.old_apply_async = tasks.ping_sitemap_celery_task.apply_async
+        tasks.ping_google = lambda *args, **kwargs: self.pings.append(kwargs)
+        tasks.ping_sitemap_celery_task.apply_async = \
+            lambda *args, **kwargs: self.scheduled.append(kwargs)
+
+    def tearDown(self):
+        askbot_settings.update('GOOGLE_SITEMAP_CODE', self.sitemap_code_backup)
+        del django_settings.ASKBOT_SITEMAP_PING_URL
+        django_settings.CELERY_ALWAYS_EAGER = self.eager_backup
+        tasks.ping_google = self.old_ping_google
+        tasks.ping_sitemap_celery_task.apply_async = self.old_apply_async
+
+    def test_pings_are_coalesced(self):
+        django_settings.CELERY_ALWAYS_EAGER = False
+        self.assertTrue(tasks.schedule_sitemap_ping())
+        self.assertFalse(tasks.schedule_sitemap_ping())
+        self.assertEqual(len(self.scheduled), 1)
+        self.assertEqual(self.pings, [])
+
+    def test_post_save_does_not_ping(self):
+        for eager in (True, False):
+            django_settings.CELERY_ALWAYS_EAGER = eager
+            user = self.create_user('user%s' % eager)
+            self.post_question(user = user)
+            self.assertEqual(self.pings, [])
+        #only the save without eager celery scheduled a ping
+        self.assertEqual(len(self.scheduled), 1)
+
+    def test_scheduled_run_pings_and_clears_the_key(self):
+        django_settings.CELERY_ALWAYS_EAGER = False
+        self.assertTrue(tasks.schedule_sitemap_ping())
+        run_id = self.scheduled[0]['args'][0]
+        tasks.ping_sitemap_celery_task(run_id)
+        self.assertEqual(len(self.pings), 1)
+        #an update right after the late ping schedules the next one
+        self.assertTrue(tasks.schedule_sitemap_ping())
+        tasks.ping_sitemap_celery_task(self.scheduled[1]['args'][0])
+        self.assertEqual(len(self.pings), 2)
+
+    def test_run_replaced_after_eviction_is_skipped(self):
+        django_settings.CELERY_ALWAYS_EAGER = False
+        tasks.schedule_sitemap_ping()
+        cache.cache.delete(tasks.SITEMAP_PING_SCHEDULED_KEY)
+        tasks.schedule_sitemap_ping()
+        tasks.ping_sitemap_celery_task(self.scheduled[0]['args'][0])
+        self.assertEqual(self.pings, [])
+        tasks.ping_sitemap_celery_task(self.scheduled[1]['args'][0])
+        self.assertEqual(len(self.pings), 1)
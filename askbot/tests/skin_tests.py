@@ -1,14 +1,15 @@
 import os
 import shutil
-from django.test import TestCase
 from django.core.files.uploadedfile import UploadedFile
 from django.conf import settings as django_settings
 from askbot.conf import settings as askbot_settings
 from askbot.utils.path import mkdir_p
+from askbot.skins import loaders
 from askbot.skins import utils as skin_utils
+from askbot.tests.utils import AskbotTestCase
 import askbot
 
-class SkinTests(TestCase):
+class SkinTests(AskbotTestCase):
 
     def setUp(self):
         #create dummy skin
@@ -64,3 +65,49 @@ class SkinTests(TestCase):
         self.assertTrue(logo_url.startswith(django_settings.MEDIA_URL))
         response = self.client.get(logo_url)
         self.assertTrue(response.status_code == 200)
+
+    def test_media_manifest_matches_file_lookup(self):
+        askbot_settings.update('ASKBOT_DEFAULT_SKIN', 'test_skin')
+        revision = askbot_settings.MEDIA_RESOURCE_REVISION
+        manifest = skin_utils.build_media_manifest('test_skin', revision)
+        for media_path in ('images/logo.gif', 'style/style.css'):
+            skin = skin_utils.resolve_skin_for_media(
+                                    media = media_path,
+                                    preferred_skin = 'test_skin'
+                                )
+            self.assertEqual(
+                manifest[media_path],
+                skin_utils.get_skin_media_url(skin, media_path, revision)
+            )
+        self.assertTrue('/test_skin/' in manifest['images/logo.gif'])
+
+    def test_skin_environments_are_per_language(self):
+        english = loaders.get_skin_environment('default', 'en')
+        german = loaders.get_skin_environment('default', 'de')
+        self.assertTrue(english is not german)
+        self.assertTrue(loaders.get_skin_environment('default', 'en') is english)
+        self.assertTrue(english.bytecode_cache is german.bytecode_cache)
+
+    def test_bytecode_cache_setting(self):
+        from jinja2.bccache import FileSystemBytecodeCache
+        backup = getattr(django_settings, 'ASKBOT_JINJA_BYTECODE_CACHE', None)
+        django_settings.ASKBOT_JINJA_BYTECODE_CACHE = 'filesystem'
+        try:
+            bytecode_cache = loaders.get_bytecode_cache()
+            self.assertTrue(isinstance(bytecode_cache, FileSystemBytecodeCache))
+            django_settings.ASKBOT_JINJA_BYTECODE_CACHE = None
+            bytecode_cache = loaders.get_bytecode_cache()
+            self.assertTrue(
+                isinstance(bytecode_cache, loaders.MemoryBytecodeCache)
+            )
+            django_settings.ASKBOT_JINJA_BYTECODE_CACHE = 'cache'
+            bytecode_cache = loaders.get_bytecode_cache()
+            self.assertEqual(
+                bytecode_cache.timeout, loaders.BYTECODE_CACHE_TIMEOUT
+            )
+            #the cache swapped after the bytecode cache was created is used
+            local_cache = self.use_local_memory_cache()
+            bytecode_cache.client.set('compiled', 'code')
+            self.assertEqual(local_cache.get('compiled'), 'code')
+        finally:
+            django_settings.ASKBOT_JINJA_BYTECODE_CACHE = backup
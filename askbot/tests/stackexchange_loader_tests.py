@@ -0,0 +1,86 @@
+import os
+import tempfile
+import zipfile
+from StringIO import StringIO
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.utils import simplejson
+from askbot.tests.utils import AskbotTestCase, skipIf
+
+VOTE_TYPES_XML = """<?xml version="1.0" encoding="utf-8"?>
+<VoteTypes>
+  <row><Id>1</Id><Name>AcceptedByOriginator</Name></row>
+  <row><Id>2</Id><Name>UpMod</Name></row>
+  <row><Id>3</Id><Name>DownMod</Name></row>
+</VoteTypes>
+"""
+
+@skipIf(
+    'askbot.importers.stackexchange' not in settings.INSTALLED_APPS,
+    'stackexchange importer is not installed'
+)
+class StackExchangeLoaderTests(AskbotTestCase):
+
+    def setUp(self):
+        from askbot.importers.stackexchange.management.commands import \
+            load_stackexchange
+        dump = StringIO()
+        dump_zip = zipfile.ZipFile(dump, 'w')
+        dump_zip.writestr('VoteTypes.xml', VOTE_TYPES_XML)
+        dump_zip.close()
+
+        checkpoint_file, self.checkpoint_path = tempfile.mkstemp()
+        os.close(checkpoint_file)
+        os.remove(self.checkpoint_path)
+
+        self.command = load_stackexchange.Command()
+        self.command.zipfile = zipfile.ZipFile(dump)
+        self.command.batch_size = 2
+        self.command.checkpoint_path = self.checkpoint_path
+        self.command.checkpoint = self.command.read_checkpoint()
+
+    def tearDown(self):
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def get_vote_type_ids(self):
+        from askbot.importers.stackexchange import models as se
+        return list(se.VoteType.objects.order_by('id').values_list('id', flat = True))
+
+    def test_load_small_dump(self):
+        self.command.load_xml_file('VoteTypes')
+        self.assertEqual(self.get_vote_type_ids(), [1, 2, 3])
+        checkpoint = simplejson.loads(open(self.checkpoint_path).read())
+        self.assertEqual(checkpoint['VoteTypes'], {'rows': 3, 'done': True})
+
+        #the loaded file is skipped by the next run
+        self.command.load_xml_file('VoteTypes')
+        self.assertEqual(self.get_vote_type_ids(), [1, 2, 3])
+
+        self.command.remove_checkpoint()
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_resume_from_checkpoint(self):
+        #the first batch was saved by the interrupted run
+        self.command.save_checkpoint('VoteTypes', 2)
+        self.command.checkpoint = self.command.read_checkpoint()
+        self.command.load_xml_file('VoteTypes')
+        self.assertEqual(self.get_vote_type_ids(), [3])
+
+    def test_checkpoint_of_flushed_rows_is_discarded(self):
+        from askbot.importers.stackexchange import models as se
+        self.command.load_xml_file('VoteTypes')
+        self.command.mark_transfer_started()
+        #the database is flushed after the failed transfer
+        se.VoteType.objects.all().delete()
+        self.command.checkpoint = self.command.read_checkpoint()
+        self.command.validate_checkpoint()
+        self.assertEqual(self.command.checkpoint, {})
+        self.command.load_xml_file('VoteTypes')
+        self.assertEqual(self.get_vote_type_ids(), [1, 2, 3])
+
+    def test_interrupted_transfer_is_not_repeated(self):
+        self.command.load_xml_file('VoteTypes')
+        self.command.mark_transfer_started()
+        self.command.checkpoint = self.command.read_checkpoint()
+        self.assertRaises(CommandError, self.command.validate_checkpoint)
@@ -2,6 +2,7 @@ from askbot.tests.utils import AskbotTestCase
 from askbot.conf import settings as askbot_settings
 from askbot import models
 import django.core.mail
+from django.conf import settings as django_settings
 
 class ThreadModelTestsWithGroupsEnabled(AskbotTestCase):
     
@@ -59,3 +60,99 @@ class ThreadModelTestsWithGroupsEnabled(AskbotTestCase):
         self.assertEqual(len(django.core.mail.outbox), 1)
         user = self.reload_object(self.user)
         self.assertEqual(user.new_response_count, 1)
+
+    def test_cached_post_data_depends_on_groups(self):
+        self.use_local_memory_cache()
+
+        self.question = self.post_question(self.user)
+        self.answer = self.post_answer(
+            user = self.admin,
+            question = self.question,
+            is_private = True
+        )
+        thread = models.Thread.objects.get(id = self.question.thread.id)
+
+        junk, answers, junk = thread.get_cached_post_data(user = self.admin)
+        self.assertEqual(len(answers), 1)
+        junk, answers, junk = thread.get_cached_post_data(user = self.user)
+        self.assertEqual(len(answers), 0)
+
+        #making the answer public invalidates all group variants
+        self.admin.edit_answer(self.answer, is_private = False)
+        thread = models.Thread.objects.get(id = self.question.thread.id)
+        junk, answers, junk = thread.get_cached_post_data(user = self.user)
+        self.assertEqual(len(answers), 1)
+
+    def test_views_keep_cached_group_variants(self):
+        self.use_local_memory_cache()
+
+        self.question = self.post_question(self.admin)
+        thread = models.Thread.objects.get(id = self.question.thread.id)
+        generation = thread.get_cache_generation()
+        thread.increase_view_count()
+        thread = models.Thread.objects.get(id = self.question.thread.id)
+        self.assertEqual(thread.get_cache_generation(), generation)
+
+        #new answer is a content change
+        answer = self.post_answer(user = self.user, question = self.question)
+        thread = models.Thread.objects.get(id = self.question.thread.id)
+        self.assertNotEqual(thread.get_cache_generation(), generation)
+
+        #own deleted answer is not counted in the shared summary
+        self.user.delete_answer(answer)
+        thread = models.Thread.objects.get(id = self.question.thread.id)
+        self.assertEqual(thread.get_answer_count(self.user), 1)
+        self.assertEqual(
+            thread.get_answer_count(self.user, count_own_deleted = False),
+            0
+        )
+
+
+class ThreadSimilarityTests(AskbotTestCase):
+
+    def setUp(self):
+        django_settings.ASKBOT_USE_THREAD_SIMILARITY_INDEX = True
+        self.use_local_memory_cache()
+        self.user = self.create_user()
+
+    def tearDown(self):
+        django_settings.ASKBOT_USE_THREAD_SIMILARITY_INDEX = False
+
+    def get_similar_titles(self, question):
+        thread = models.Thread.objects.get(id = question.thread.id)
+        return [item['title'] for item in thread.get_similar_threads().data()]
+
+    def test_rare_shared_tags_weigh_more(self):
+        q1 = self.post_question(title = 'first question', tags = 'common rare')
+        self.post_question(title = 'second question', tags = 'common')
+        self.post_question(title = 'third question', tags = 'common')
+        self.post_question(title = 'fourth question', tags = 'rare')
+        self.post_question(title = 'fifth question', tags = 'other')
+        titles = self.get_similar_titles(q1)
+        self.assertEqual(titles[0], 'fourth question')
+        self.assertEqual(
+            set(titles[1:]),
+            set(['second question', 'third question'])
+        )
+
+    def test_retag_updates_neighbours(self):
+        q1 = self.post_question(title = 'first question', tags = 'one')
+        q2 = self.post_question(title = 'second question', tags = 'two')
+        self.assertEqual(self.get_similar_titles(q1), [])
+        self.user.retag_question(question = q2, tags = 'one')
+        self.assertEqual(self.get_similar_titles(q1), ['second question'])
+        self.user.delete_question(q2)
+        self.assertEqual(self.get_similar_titles(q1), [])
+
+    def test_neighbours_keep_top_records(self):
+        from askbot.models import question as question_module
+        old_number = question_module.SIMILAR_THREADS_NUMBER
+        question_module.SIMILAR_THREADS_NUMBER = 1
+        try:
+            q1 = self.post_question(title = 'first question', tags = 'one')
+            self.post_question(title = 'second question', tags = 'one')
+            self.post_question(title = 'third question', tags = 'one two')
+            records = models.ThreadSimilarity.objects.filter(thread = q1.thread)
+            self.assertEqual(records.count(), 1)
+        finally:
+            question_module.SIMILAR_THREADS_NUMBER = old_number
@@ -1,5 +1,7 @@
 """utility functions used by Askbot test cases
 """
+from django.core import cache
+from django.core.cache.backends.locmem import LocMemCache
 from django.test import TestCase
 from functools import wraps
 from askbot import models
@@ -68,7 +70,8 @@ class AskbotTestCase(TestCase):
                 email = None,
                 notification_schedule = None,
                 date_joined = None,
-                status = 'a'
+                status = 'a',
+                reputation = 1
             ):
         """creates user with username, etc and
         makes the result accessible as
@@ -88,7 +91,8 @@ class AskbotTestCase(TestCase):
                     email = email,
                     notification_schedule = notification_schedule,
                     date_joined = date_joined,
-                    status = status
+                    status = status,
+                    reputation = reputation
                 )
 
         setattr(self, username, user_object)
@@ -153,6 +157,15 @@ class AskbotTestCase(TestCase):
         """reloads model object from the database
         """
         return obj.__class__.objects.get(id = obj.id)
+
+    def use_local_memory_cache(self):
+        """replaces the django cache with an empty local memory
+        cache, the old cache is restored after the test
+        """
+        old_cache = cache.cache
+        cache.cache = LocMemCache('', {})
+        self.addCleanup(setattr, cache, 'cache', old_cache)
+        return cache.cache
         
     def post_answer(
                     self,
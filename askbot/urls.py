@@ -209,6 +209,11 @@ urlpatterns = patterns('',
         views.commands.get_tag_list,
         name = 'get_tag_list'
     ),
+    url(
+        r'^get-tag-completions/',
+        views.commands.get_tag_completions,
+        name = 'get_tag_completions'
+    ),
     url(
         r'^load-tag-wiki-text/',
         views.commands.load_tag_wiki_text,
@@ -53,7 +53,11 @@ def populate_foreign_key_caches(model, objects_to_populate, fields=None):
                                                                for pk in related_ids_for_obj)):
                 setattr(obj, '_%s_cache' % attr, related_object)
 
-def populate_content_object_caches(generic_related_objects, model_fields=None):
+def populate_content_object_caches(
+                                generic_related_objects,
+                                model_fields=None,
+                                field_name='content_object'
+                            ):
     """
     Retrieves ``ContentType`` and content objects for the given list of
     items which use a generic relation, grouping the retrieval of content
@@ -67,10 +71,17 @@ def populate_content_object_caches(generic_related_objects, model_fields=None):
     given fields will be looked up for each model specified and the
     object cache will be populated with a dict of the specified fields.
     Otherwise, complete model instances will be retrieved.
+
+    ``field_name`` - name of the generic foreign key, content objects
+    that no longer exist are cached as ``None``.
     """
     if model_fields is None:
         model_fields = {}
 
+    generic_related_objects = list(generic_related_objects)
+    if len(generic_related_objects) == 0:
+        return
+
     # Group content object ids by their content type ids
     ids_by_content_type = {}
     for obj in generic_related_objects:
@@ -79,14 +90,54 @@ def populate_content_object_caches(generic_related_objects, model_fields=None):
 
     # Retrieve content types and content objects in bulk
     content_types = ContentType.objects.in_bulk(ids_by_content_type.keys())
+    objects = {}
     for content_type_id, ids in ids_by_content_type.iteritems():
         model = content_types[content_type_id].model_class()
         objects[content_type_id] = fetch_model_dict(
             model, tuple(set(ids)), model_fields.get(model, None))
 
     # Set content types and content objects in the appropriate cache
-    # attributes, so accessing the 'content_type' and 'object' attributes
-    # on each object won't result in further database hits.
+    # attributes, so accessing the generic foreign key and 'content_type'
+    # attributes on each object won't result in further database hits.
+    cache_attr = '_%s_cache' % field_name
     for obj in generic_related_objects:
-        obj._object_cache = objects[obj.content_type_id][obj.object_id]
+        content_object = objects[obj.content_type_id].get(obj.object_id, None)
+        setattr(obj, cache_attr, content_object)
         obj._content_type_cache = content_types[obj.content_type_id]
+
+def populate_post_caches(posts):
+    """
+    Populates caches of the parent posts, the threads and
+    the question posts of the threads for the given list of posts,
+    so that ``post.parent``, ``post.thread``, ``post.get_origin_post()``
+    and ``post.thread._question_post()`` do not hit the database.
+
+    Runs at most three queries for any number of posts.
+    """
+    from askbot.models import Post, Thread
+    posts = [post for post in posts if post is not None]
+    if len(posts) == 0:
+        return
+
+    populate_foreign_key_caches(Post, [(posts, ('parent',))])
+    parents = [post._parent_cache for post in posts if post._parent_cache]
+
+    all_posts = posts + parents
+    populate_foreign_key_caches(Thread, [(all_posts, ('thread',))])
+
+    threads = dict()
+    for post in all_posts:
+        if post._thread_cache is not None:
+            threads[post.thread_id] = post._thread_cache
+
+    if len(threads) == 0:
+        return
+
+    questions = Post.objects.filter(
+                            post_type='question',
+                            thread__in=threads.keys()
+                        )
+    for question in questions:
+        thread = threads[question.thread_id]
+        question._thread_cache = thread
+        thread._question_cache = question
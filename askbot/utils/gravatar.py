@@ -0,0 +1,83 @@
+"""probing of gravatar.com for the avatars of users
+
+the result of a probe is cached by the gravatar hash,
+hashes that were probed recently are not probed again,
+found gravatars are remembered for ``GRAVATAR_FOUND_TIMEOUT``,
+missing ones for ``GRAVATAR_MISSING_TIMEOUT`` seconds
+
+setting ``ASKBOT_GRAVATAR_PROBE_URL`` overrides the address,
+it must contain one %s placeholder for the gravatar hash
+"""
+import logging
+import urllib2
+from multiprocessing.dummy import Pool as ThreadPool
+from django.conf import settings as django_settings
+from django.core import cache
+
+PROBE_URL = 'http://www.gravatar.com/avatar/%s?d=404'
+PROBE_CACHE_KEY_TPL = 'gravatar-probe-%s'
+PROBE_TIMEOUT = 10#seconds to wait for the response
+GRAVATAR_FOUND_TIMEOUT = 7 * 24 * 3600
+GRAVATAR_MISSING_TIMEOUT = 24 * 3600
+DEFAULT_WORKERS = 10
+
+def get_probe_url(gravatar):
+    url = getattr(django_settings, 'ASKBOT_GRAVATAR_PROBE_URL', PROBE_URL)
+    return url % gravatar
+
+def get_cached_avatar_type(gravatar):
+    """returns 'g' or 'n' if the gravatar was probed recently,
+    None otherwise"""
+    return cache.cache.get(PROBE_CACHE_KEY_TPL % gravatar)
+
+def request_avatar_type(gravatar):
+    """makes the request to the gravatar server,
+    returns 'g' if the gravatar exists, 'n' if it does not
+    and None if the server could not be reached"""
+    try:
+        urllib2.urlopen(get_probe_url(gravatar), timeout = PROBE_TIMEOUT)
+        return 'g'
+    except urllib2.HTTPError, e:
+        if e.code == 404:
+            return 'n'
+        logging.warning('gravatar probe failed: %s' % e)
+    except Exception, e:
+        logging.warning('gravatar probe failed: %s' % e)
+    return None
+
+def probe_gravatar(gravatar):
+    """returns avatar type - 'g' for gravatar, 'n' for none,
+    or None when the probe failed, failures are not cached
+    """
+    avatar_type = get_cached_avatar_type(gravatar)
+    if avatar_type is not None:
+        return avatar_type
+    avatar_type = request_avatar_type(gravatar)
+    if avatar_type == 'g':
+        timeout = GRAVATAR_FOUND_TIMEOUT
+    elif avatar_type == 'n':
+        timeout = GRAVATAR_MISSING_TIMEOUT
+    else:
+        return None
+    cache.cache.set(PROBE_CACHE_KEY_TPL % gravatar, avatar_type, timeout)
+    return avatar_type
+
+def probe_gravatars(gravatars, workers = DEFAULT_WORKERS):
+    """probes the gravatars with at most ``workers``
+    concurrent requests, returns dictionary of avatar types
+    by the gravatar hash, failed probes are left out
+    """
+    gravatars = list(set(gravatars))
+    if len(gravatars) == 0:
+        return dict()
+    pool = ThreadPool(min(workers, len(gravatars)))
+    try:
+        avatar_types = pool.map(probe_gravatar, gravatars)
+    finally:
+        pool.close()
+        pool.join()
+    return dict([
+        (gravatar, avatar_type)
+        for gravatar, avatar_type in zip(gravatars, avatar_types)
+        if avatar_type is not None
+    ])
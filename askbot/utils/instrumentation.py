@@ -0,0 +1,221 @@
+"""sampled per-view instrumentation of requests
+
+for a sampled request the following is recorded:
+
+* wall time of the request
+* number and time of the sql queries
+* number of cache gets, hits and sets
+* time spent rendering the templates
+
+samples are aggregated per view in the django cache,
+wall times - into a histogram with ``TIME_BUCKETS`` bounds.
+Aggregation is a read-modify-write of the cache entry,
+so concurrent requests may occasionally lose a sample,
+which is acceptable for the statistics.
+
+Data is collected by ``askbot.middleware.instrumentation.InstrumentationMiddleware``
+and printed by the management command ``dump_view_stats``.
+"""
+import hashlib
+import threading
+import time
+from django.core import cache
+from django.db import connection
+
+STATS_TIMEOUT = 7 * 24 * 3600
+VIEW_NAMES_CACHE_KEY = 'askbot-view-stats-names'
+VIEW_STATS_CACHE_KEY_TPL = 'askbot-view-stats-%s'
+#upper bounds of the wall time histogram buckets in seconds,
+#the last bucket collects the slower requests
+TIME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_STATE = threading.local()
+#default of the wrapped cache get, distinguishes misses
+#from the cached values equal to the caller's default
+_MISSING = object()
+
+def get_sample():
+    """returns the sample dictionary of the current
+    request, or None if the request is not sampled"""
+    return getattr(_STATE, 'sample', None)
+
+def start():
+    """starts collecting the sample for the current thread,
+    queries are logged by the debug cursor for the duration
+    of the sample"""
+    _STATE.sample = {
+        'view_name': None,
+        'start_time': time.time(),
+        'first_query': len(connection.queries),
+        'cache_gets': 0,
+        'cache_hits': 0,
+        'cache_sets': 0,
+        'template_time': 0.0,
+    }
+    _STATE.use_debug_cursor = connection.use_debug_cursor
+    connection.use_debug_cursor = True
+
+def stop():
+    """stops collecting, returns the completed sample
+    or None if nothing was being collected"""
+    sample = get_sample()
+    if sample is None:
+        return None
+    _STATE.sample = None
+    connection.use_debug_cursor = _STATE.use_debug_cursor
+
+    queries = connection.queries[sample.pop('first_query'):]
+    sample['query_count'] = len(queries)
+    sample['query_time'] = sum([float(query['time']) for query in queries])
+    sample['time'] = time.time() - sample.pop('start_time')
+    return sample
+
+def set_view_name(view_name):
+    sample = get_sample()
+    if sample is not None:
+        sample['view_name'] = view_name
+
+def add_template_time(seconds):
+    sample = get_sample()
+    if sample is not None:
+        sample['template_time'] += seconds
+
+def get_view_name(view_func):
+    """returns dotted python path of the view function"""
+    name = getattr(view_func, '__name__', view_func.__class__.__name__)
+    return '%s.%s' % (view_func.__module__, name)
+
+
+class CountingCache(object):
+    """wrapper around the cache backend, which counts
+    gets, hits and sets into the sample of the current request
+    """
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def __contains__(self, key):
+        return key in self.backend
+
+    def count_gets(self, gets, hits):
+        sample = get_sample()
+        if sample is not None:
+            sample['cache_gets'] += gets
+            sample['cache_hits'] += hits
+
+    def count_sets(self, sets):
+        sample = get_sample()
+        if sample is not None:
+            sample['cache_sets'] += sets
+
+    def get(self, key, default = None, **kwargs):
+        value = self.backend.get(key, _MISSING, **kwargs)
+        if value is _MISSING:
+            self.count_gets(1, 0)
+            return default
+        self.count_gets(1, 1)
+        return value
+
+    def get_many(self, keys, *args, **kwargs):
+        values = self.backend.get_many(keys, *args, **kwargs)
+        self.count_gets(len(keys), len(values))
+        return values
+
+    def set(self, key, *args, **kwargs):
+        self.count_sets(1)
+        return self.backend.set(key, *args, **kwargs)
+
+    def add(self, key, *args, **kwargs):
+        self.count_sets(1)
+        return self.backend.add(key, *args, **kwargs)
+
+    def set_many(self, data, *args, **kwargs):
+        self.count_sets(len(data))
+        return self.backend.set_many(data, *args, **kwargs)
+
+
+def install_cache_counter():
+    """replaces ``django.core.cache.cache`` with the counting wrapper,
+    only the code that looks up ``cache.cache`` at the call time
+    is counted, not the modules that imported the cache object"""
+    if not isinstance(cache.cache, CountingCache):
+        cache.cache = CountingCache(cache.cache)
+
+def get_stats_cache_key(view_name):
+    return VIEW_STATS_CACHE_KEY_TPL % hashlib.md5(view_name).hexdigest()
+
+def get_empty_stats(view_name):
+    return {
+        'view_name': view_name,
+        'count': 0,
+        'time': 0.0,
+        'max_time': 0.0,
+        'time_histogram': [0] * (len(TIME_BUCKETS) + 1),
+        'query_count': 0,
+        'max_query_count': 0,
+        'query_time': 0.0,
+        'cache_gets': 0,
+        'cache_hits': 0,
+        'cache_sets': 0,
+        'template_time': 0.0,
+    }
+
+def add_sample(stats, sample):
+    """adds values of the ``sample`` to the aggregated ``stats``"""
+    stats['count'] += 1
+    for key in (
+        'time', 'query_count', 'query_time',
+        'cache_gets', 'cache_hits', 'cache_sets', 'template_time'
+    ):
+        stats[key] += sample[key]
+    stats['max_time'] = max(stats['max_time'], sample['time'])
+    stats['max_query_count'] = max(
+                                stats['max_query_count'],
+                                sample['query_count']
+                            )
+    bucket = len(TIME_BUCKETS)
+    for position, bound in enumerate(TIME_BUCKETS):
+        if sample['time'] <= bound:
+            bucket = position
+            break
+    stats['time_histogram'][bucket] += 1
+
+def record_sample(sample):
+    """adds the sample to the stats of its view in the cache"""
+    view_name = sample['view_name']
+    view_names = cache.cache.get(VIEW_NAMES_CACHE_KEY) or list()
+    if view_name not in view_names:
+        view_names.append(view_name)
+        cache.cache.set(VIEW_NAMES_CACHE_KEY, view_names, STATS_TIMEOUT)
+
+    key = get_stats_cache_key(view_name)
+    stats = cache.cache.get(key) or get_empty_stats(view_name)
+    add_sample(stats, sample)
+    cache.cache.set(key, stats, STATS_TIMEOUT)
+
+def get_all_stats():
+    """returns list of aggregated stats of all sampled views"""
+    view_names = cache.cache.get(VIEW_NAMES_CACHE_KEY) or list()
+    keys = [get_stats_cache_key(view_name) for view_name in view_names]
+    return cache.cache.get_many(keys).values()
+
+def reset_stats():
+    view_names = cache.cache.get(VIEW_NAMES_CACHE_KEY) or list()
+    cache.cache.delete_many(
+        [get_stats_cache_key(view_name) for view_name in view_names]
+    )
+    cache.cache.delete(VIEW_NAMES_CACHE_KEY)
+
+def get_time_percentile(stats, fraction):
+    """returns upper bound of the histogram bucket
+    containing the ``fraction`` of the requests,
+    None if it is in the last, unbounded bucket"""
+    threshold = stats['count'] * fraction
+    seen = 0
+    for position, count in enumerate(stats['time_histogram']):
+        seen += count
+        if seen >= threshold and position < len(TIME_BUCKETS):
+            return TIME_BUCKETS[position]
+    return None
@@ -5,26 +5,35 @@ Twitter-style @mentions"""
 
 import re
 import logging
+import threading
 from askbot import const
 from askbot.conf import settings as askbot_settings
 from markdown2 import Markdown
 #url taken from http://regexlib.com/REDetails.aspx?regexp_id=501 by Brian Bothwell
 URL_RE = re.compile("((?<!(href|.src|data)=['\"])((http|https|ftp)\://([a-zA-Z0-9\.\-]+(\:[a-zA-Z0-9\.&amp;%\$\-]+)*@)*((25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}[0-9]{1}|[1-9])\.(25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}[0-9]{1}|[1-9]|0)\.(25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}[0-9]{1}|[1-9]|0)\.(25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}[0-9]{1}|[0-9])|localhost|([a-zA-Z0-9\-]+\.)*[a-zA-Z0-9\-]+\.(com|edu|gov|int|mil|net|org|biz|arpa|info|name|pro|aero|coop|museum|[a-zA-Z]{2}))(\:[0-9]+)*(/($|[a-zA-Z0-9\.\,\?\'\\\+&amp;%\$#\=~_\-]+))*))")
 
-def get_parser():
-    """returns an instance of configured ``markdown2`` parser
+_PARSER_STORAGE = threading.local()
+_LINK_PATTERNS = {}
+
+def get_parser_settings_key():
+    """returns tuple of values of the settings
+    that affect configuration of the markdown parser"""
+    return (
+        askbot_settings.ENABLE_MATHJAX,
+        askbot_settings.MARKUP_CODE_FRIENDLY,
+        askbot_settings.ENABLE_VIDEO_EMBEDDING,
+        askbot_settings.ENABLE_AUTO_LINKING,
+        askbot_settings.AUTO_LINK_PATTERNS,
+        askbot_settings.AUTO_LINK_URLS,
+    )
+
+def get_link_patterns(settings_key):
+    """returns list of compiled link patterns,
+    compiled once per the combination of the settings values
     """
-    extras = ['link-patterns', 'video']  
-
-    if askbot_settings.ENABLE_MATHJAX or \
-        askbot_settings.MARKUP_CODE_FRIENDLY:
-        extras.append('code-friendly')
-
-    if askbot_settings.ENABLE_VIDEO_EMBEDDING:
-        #note: this requires a forked version of markdown2 module
-        #pip uninstall markdown2
-        #pip install -e git+git://github.com/andryuha/python-markdown2.git
-        extras.append('video')
+    link_patterns = _LINK_PATTERNS.get(settings_key)
+    if link_patterns is not None:
+        return link_patterns
 
     link_patterns = [
         (URL_RE, r'\1'),
@@ -54,13 +63,52 @@ def get_parser():
             logging.critical(
                 "Number of autolink patterns didn't match the number "
                 "of url templates, fix this by visiting" + settings_url) 
-            
+
+    #old combinations of settings are not needed any more
+    _LINK_PATTERNS.clear()
+    _LINK_PATTERNS[settings_key] = link_patterns
+    return link_patterns
+
+def create_parser(settings_key = None):
+    """returns a new instance of configured ``markdown2`` parser
+    """
+    if settings_key is None:
+        settings_key = get_parser_settings_key()
+
+    extras = ['link-patterns', 'video']  
+
+    if askbot_settings.ENABLE_MATHJAX or \
+        askbot_settings.MARKUP_CODE_FRIENDLY:
+        extras.append('code-friendly')
+
+    if askbot_settings.ENABLE_VIDEO_EMBEDDING:
+        #note: this requires a forked version of markdown2 module
+        #pip uninstall markdown2
+        #pip install -e git+git://github.com/andryuha/python-markdown2.git
+        extras.append('video')
+
     return Markdown(
                 html4tags=True,
                 extras=extras,
-                link_patterns = link_patterns
+                link_patterns = get_link_patterns(settings_key)
             )
 
+def get_parser():
+    """returns configured ``markdown2`` parser
+
+    the parser is reused within the thread,
+    until values of the markup settings change,
+    instances of the parser are not shared across threads,
+    because the parser keeps state during the conversion
+    """
+    settings_key = get_parser_settings_key()
+    parser = getattr(_PARSER_STORAGE, 'parser', None)
+    if parser is None or _PARSER_STORAGE.settings_key != settings_key:
+        parser = create_parser(settings_key)
+        _PARSER_STORAGE.parser = parser
+        _PARSER_STORAGE.settings_key = settings_key
+    return parser
+
 
 def format_mention_in_html(mentioned_user):
     """formats mention as url to the user profile"""
@@ -16,6 +16,7 @@ from django.http import HttpResponse, HttpResponseRedirect, Http404, HttpRespons
 from django.forms import ValidationError, IntegerField, CharField
 from django.shortcuts import get_object_or_404
 from django.views.decorators import csrf
+from django.views.decorators.http import condition
 from django.utils import simplejson
 from django.utils.html import escape
 from django.utils.translation import ugettext as _
@@ -24,6 +25,7 @@ from askbot import models
 from askbot import forms
 from askbot.conf import should_show_sort_by_relevance
 from askbot.conf import settings as askbot_settings
+from askbot.models import tag_index
 from askbot.utils import category_tree
 from askbot.utils import decorators
 from askbot.utils import url_utils
@@ -65,8 +67,10 @@ def manage_inbox(request):
                         memo_set.delete()
                     elif action_type == 'mark_new':
                         memo_set.update(status = models.ActivityAuditStatus.STATUS_NEW)
+                        models.ActivityAuditStatus.invalidate_moderation_items_cache([user.id])
                     elif action_type == 'mark_seen':
                         memo_set.update(status = models.ActivityAuditStatus.STATUS_SEEN)
+                        models.ActivityAuditStatus.invalidate_moderation_items_cache([user.id])
                     elif action_type == 'remove_flag':
                         for memo in memo_set:
                             activity_type = memo.activity.activity_type
@@ -266,7 +270,7 @@ def vote(request, id):
                     request.user.accept_best_answer(answer)
 
                 ####################################################################
-                answer.thread.update_summary_html() # regenerate question/thread summary html
+                answer.thread.invalidate_summary_html() # regenerate question/thread summary html
                 ####################################################################
 
             else:
@@ -488,20 +492,49 @@ def get_html_template(request):
         'html': get_template(template_name).render()
     }
 
+def get_tag_list_etag(request):
+    version = tag_index.get_version()
+    if version:
+        return version[0]
+    return None
+
+def get_tag_list_last_modified(request):
+    version = tag_index.get_version()
+    if version:
+        return version[1]
+    return None
+
 @decorators.get_only
+@condition(
+    etag_func = get_tag_list_etag,
+    last_modified_func = get_tag_list_last_modified
+)
 def get_tag_list(request):
     """returns tags to use in the autocomplete
-    function
+    function, the response carries ETag and Last-Modified
+    of the tag index version, so that browsers can
+    revalidate it instead of downloading again
     """
-    tag_names = models.Tag.objects.filter(
-                        deleted = False,
-                        status = models.Tag.STATUS_ACCEPTED
-                    ).values_list(
-                        'name', flat = True
-                    )
+    tag_names = tag_index.get_index().names
     output = '\n'.join(map(escape, tag_names))
     return HttpResponse(output, mimetype = 'text/plain')
 
+@decorators.get_only
+def get_tag_completions(request):
+    """returns json encoded list of at most ``limit``
+    names of the most used tags starting with the ``prefix``
+    """
+    prefix = request.GET.get('prefix', '').strip()
+    try:
+        limit = int(request.GET.get('limit', tag_index.DEFAULT_LIMIT))
+    except ValueError:
+        return HttpResponseBadRequest()
+    limit = max(0, min(limit, tag_index.MAX_LIMIT))
+
+    tag_names = tag_index.get_index().get_tag_names(prefix, limit)
+    re_data = simplejson.dumps({'tag_names': tag_names})
+    return HttpResponse(re_data, mimetype = 'application/json')
+
 @decorators.get_only
 def load_tag_wiki_text(request):
     """returns text of the tag wiki in markdown format"""
@@ -98,6 +98,10 @@ def questions(request, **kwargs):
     # INFO: Because for the time being we need question posts and thread authors
     #       down the pipeline, we have to precache them in thread objects
     models.Thread.objects.precache_view_data_hack(threads=page.object_list)
+    models.Thread.objects.precache_summary_html(
+                                threads = page.object_list,
+                                visitor = request.user
+                            )
 
     related_tags = Tag.objects.get_related_to_search(
                         threads=page.object_list,
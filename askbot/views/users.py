@@ -31,6 +31,9 @@ from askbot.utils.html import sanitize_html
 from askbot.mail import send_mail
 from askbot.utils.http import get_request_info
 from askbot.utils import functions
+from askbot.utils.cache import populate_content_object_caches
+from askbot.utils.cache import populate_foreign_key_caches
+from askbot.utils.cache import populate_post_caches
 from askbot import forms
 from askbot import const
 from askbot.conf import settings as askbot_settings
@@ -515,8 +518,24 @@ def user_recent(request, user, context):
 
     activities = []
 
-    # TODO: Don't process all activities here for the user, only a subset ([:const.USER_VIEW_DATA_SIZE])
-    for activity in models.Activity.objects.filter(user=user):
+    #only the latest activities of the displayed types are loaded,
+    #then their content objects, posts and threads are loaded in bulk
+    activity_list = list(
+        models.Activity.objects.filter(
+            user=user,
+            activity_type__in=const.USER_RECENT_ACTIVITY_TYPES
+        ).order_by('-active_at')[:const.USER_VIEW_DATA_SIZE]
+    )
+    populate_content_object_caches(activity_list)
+    content_objects = [activity.content_object for activity in activity_list]
+    populate_post_caches([
+        obj for obj in content_objects if isinstance(obj, models.Post)
+    ])
+    awards = [obj for obj in content_objects if isinstance(obj, models.Award)]
+    populate_content_object_caches(awards)
+    populate_foreign_key_caches(models.BadgeData, [(awards, ('badge',))])
+
+    for activity in activity_list:
 
         # TODO: multi-if means that we have here a construct for which a design pattern should be used
 
@@ -683,6 +702,14 @@ def user_responses(request, user, context):
                     '-activity__active_at'
                 )[:const.USER_VIEW_DATA_SIZE]
 
+    memo_set = list(memo_set)
+    activity_list = [memo.activity for memo in memo_set]
+    populate_content_object_caches(activity_list)
+    populate_post_caches([
+        activity.content_object for activity in activity_list
+        if isinstance(activity.content_object, models.Post)
+    ])
+
     #3) "package" data for the output
     response_list = list()
     for memo in memo_set:
@@ -749,7 +776,15 @@ def user_network(request, user, context):
 
 @owner_or_moderator_required
 def user_votes(request, user, context):
-    all_votes = list(models.Vote.objects.filter(user=user))
+    all_votes = list(
+        models.Vote.objects.filter(
+            user=user,
+            voted_post__post_type__in=('question', 'answer')
+        ).select_related(
+            'voted_post'
+        ).order_by('-id')[:const.USER_VIEW_DATA_SIZE]
+    )
+    populate_post_caches([vote.voted_post for vote in all_votes])
     votes = []
     for vote in all_votes:
         post = vote.voted_post
@@ -968,7 +1003,9 @@ def update_has_custom_avatar(request):
     """
     if request.is_ajax() and request.user.is_authenticated():
         if request.user.avatar_type in ('n', 'g'):
-            request.user.update_avatar_type()
+            from askbot import tasks
+            #the request does not wait for the gravatar server
+            tasks.update_avatar_type(request.user)
             request.session['avatar_data_updated_at'] = datetime.datetime.now()
             return HttpResponse(simplejson.dumps({'status':'ok'}), mimetype='application/json')
     return HttpResponseForbidden()